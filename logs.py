@@ -0,0 +1,111 @@
+# =============================================================================
+# This script merges the logs of any number of sessions and mirror PCs
+# into one time-ordered file, and queries the events by their type
+# =============================================================================
+import argparse
+import sys
+
+from typing import List, Optional
+
+from src.exp.logging import LOG_FOLDER
+from src.exp.log_reader import LogReader
+from src.exp.log_index import LogIndex
+
+INDEX_FILE = 'index.npz'
+
+class Settings:
+    def __init__(self) -> None:
+        args = self._make_args()
+
+        self.command: str = args.command
+        self.folders: List[str] = args.folders if args.folders else [LOG_FOLDER]
+        self.out: Optional[str] = args.out if args.command == 'merge' else None
+        self.with_traffic: bool = args.command == 'merge' and args.traffic == True
+        self.with_snapshots: bool = args.command == 'merge' and args.snapshots == True
+        self.event: str = args.event if args.command == 'query' else ''
+
+    def _make_args(self):
+        argparser = argparse.ArgumentParser(
+            description='Log merging and indexing')
+        commands = argparser.add_subparsers(dest='command', required=True)
+
+        merge = commands.add_parser(
+            'merge',
+            help='Merges the logs by their timestamps')
+        merge.add_argument(
+            'folders',
+            nargs='*',
+            help=f'Folders with logs, searched recursively (default: {LOG_FOLDER})')
+        merge.add_argument(
+            '--out',
+            default=None,
+            help='Output file (default: the standard output)')
+        merge.add_argument(
+            '--traffic',
+            action='store_true',
+            help='Includes the traffic logs, a row per frame')
+        merge.add_argument(
+            '--snapshots',
+            action='store_true',
+            help='Includes the mirror snapshots')
+
+        index = commands.add_parser(
+            'index',
+            help='Updates the index of event logs and lists the event types')
+        index.add_argument(
+            'folders',
+            nargs='*',
+            help=f'Folders with logs, searched recursively (default: {LOG_FOLDER})')
+
+        query = commands.add_parser(
+            'query',
+            help='Prints the events of the given type, for example "scenario car approached"')
+        query.add_argument(
+            'event',
+            help='Logger type and the first values of the event')
+        query.add_argument(
+            'folders',
+            nargs='*',
+            help=f'Folders with logs, searched recursively (default: {LOG_FOLDER})')
+
+        return argparser.parse_args()
+
+def merge(settings: Settings) -> None:
+    streams = LogReader.read_folders(settings.folders, settings.with_traffic, settings.with_snapshots)
+
+    out = open(settings.out, 'w') if settings.out else sys.stdout
+    try:
+        for timestamp, source, frame, text in LogReader.merge(streams):
+            out.write(f'{timestamp:.6f}\t{frame}\t{source}\t{text}\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+def update_index(folder: str) -> LogIndex:
+    event_logs, _, _ = LogReader.find(folder)
+
+    index_file = f'{folder}/{INDEX_FILE}'
+    index = LogIndex.build(event_logs, LogIndex.load(index_file))
+    index.save(index_file)
+
+    return index
+
+if __name__ == '__main__':
+    settings = Settings()
+
+    try:
+        if settings.command == 'merge':
+            merge(settings)
+        else:
+            for folder in settings.folders:
+                index = update_index(folder)
+                if settings.command == 'index':
+                    for key in index.get_keys():
+                        print(key)
+                else:
+                    for session, timestamp, frame, fields in index.query(settings.event):
+                        print(f'{session}\t{timestamp:.6f}\t{frame}\t' + '\t'.join(fields))
+    except KeyboardInterrupt:
+        print('Cancelled by user')
+    except BrokenPipeError:
+        pass
@@ -1,8 +1,17 @@
-from src.app import App
+import sys
+
+from src.utils import ImportProfiler
 
 if __name__ == '__main__':
+    # the option is checked before importing the app, so that the app imports are measured too
+    import_profiler = ImportProfiler() if '--startup-profile' in sys.argv else None
+    if import_profiler:
+        import_profiler.start()
+    
+    from src.app import App
+    
     try:
-        App().run()
+        App(import_profiler).run()
     except KeyboardInterrupt:
         print('APP: Cancelled by user')
     else:
@@ -11,6 +11,7 @@ from src.carla.utils import add_carla_path
 add_carla_path()
 
 from src.carla.environment import CarlaEnvironment
+from src.carla.map_cache import MapCache
 
 try:
     import carla
@@ -53,6 +54,7 @@ if __name__ == '__main__':
     try:
         environment = CarlaEnvironment(client)
         world = environment.load_world(settings.map)
+        MapCache.get(world.get_map())       # builds the geometry cache used by mirrors
     except KeyboardInterrupt:
         print('Cancelled by user')
     except:
@@ -0,0 +1,176 @@
+# =============================================================================
+# This script measures how long the commands sent by TcpServer (the primary
+# mirror) take to reach the clients (the secondary mirrors) over loopback,
+# and the CPU time a client uses to connect, to wait, and to send requests.
+# The requests are answered in the frame loop, as in the app, so their round
+# trip includes up to a frame of waiting in the IoRuntime inbox
+# =============================================================================
+import argparse
+import socket
+import threading
+import time
+
+from typing import List, Dict
+
+from src.net.framing import FrameParser
+from src.net.io_runtime import IoRuntime
+from src.net.tcp_client import TcpClient
+from src.net.tcp_server import TcpServer, PORT
+from src.utils import suppress_stdout
+
+IDLE_DURATION = 2.0     # seconds
+FPS = 30                # as CarlaEnvironment.FPS
+
+class Settings:
+    def __init__(self) -> None:
+        args = self._make_args()
+
+        self.clients: int = args.clients
+        self.messages: int = args.messages
+        self.burst: int = args.burst
+        self.interval: float = args.interval
+        self.requests: int = args.requests
+
+    def _make_args(self):
+        argparser = argparse.ArgumentParser(
+            description='Measures the command latency of the TCP server over loopback')
+        argparser.add_argument(
+            '-c', '--clients',
+            default=3,
+            type=int,
+            help='Number of clients (default: 3)')
+        argparser.add_argument(
+            '-n', '--messages',
+            default=1000,
+            type=int,
+            help='Number of messages (default: 1000)')
+        argparser.add_argument(
+            '--burst',
+            default=1,
+            type=int,
+            help='Number of messages sent at once (default: 1)')
+        argparser.add_argument(
+            '--interval',
+            default=0.01,
+            type=float,
+            help='Pause between the bursts, in seconds (default: 0.01)')
+        argparser.add_argument(
+            '--requests',
+            default=100,
+            type=int,
+            help='Number of requests sent by TcpClient (default: 100)')
+        return argparser.parse_args()
+
+class LoopbackClient:
+    '''Receives the command frames and records their arrival time'''
+    def __init__(self) -> None:
+        self.arrivals: Dict[int, float] = dict()
+
+        self._socket = socket.create_connection(('127.0.0.1', PORT))
+        self._thread = threading.Thread(target = self._run)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._socket.shutdown(socket.SHUT_RDWR)
+        self._thread.join()
+        self._socket.close()
+
+    # Internal
+
+    def _run(self) -> None:
+        parser = FrameParser()
+        while parser.receive(self._socket) > 0:
+            now = time.perf_counter()
+            for _, _, payload in parser.get_frames():
+                self.arrivals[int(bytes(payload))] = now
+
+class FrameLoop:
+    '''Dispatches the received messages once per frame, as the app does'''
+    def __init__(self) -> None:
+        self._is_running = True
+        self._thread = threading.Thread(target = self._run)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._is_running = False
+        self._thread.join()
+
+    # Internal
+
+    def _run(self) -> None:
+        runtime = IoRuntime.get()
+        while self._is_running:
+            runtime.dispatch()
+            time.sleep(1.0 / FPS)
+
+def percentile(values: List[float], q: float) -> float:
+    return values[int((len(values) - 1) * q)]
+
+def print_latencies(name: str, latencies: List[float]) -> None:
+    latencies = sorted(latencies)
+    if len(latencies) > 0:
+        print(f'{name}, ms: mean {sum(latencies) / len(latencies):.3f}, median {percentile(latencies, 0.5):.3f}, 90% {percentile(latencies, 0.9):.3f}, 99% {percentile(latencies, 0.99):.3f}, max {latencies[-1]:.3f}')
+
+def measure_commands(settings: Settings, server: TcpServer) -> None:
+    clients = [LoopbackClient() for _ in range(settings.clients)]
+    while server.get_client_count() < len(clients):
+        time.sleep(0.01)
+
+    sent: Dict[int, float] = dict()
+    for seq in range(settings.messages):
+        sent[seq] = time.perf_counter()
+        server.send(f'{seq}')
+
+        if (seq + 1) % settings.burst == 0:
+            time.sleep(settings.interval)
+
+    time.sleep(0.5)
+
+    for client in clients:
+        client.close()
+
+    latencies = [(client.arrivals[seq] - sent[seq]) * 1000 for client in clients for seq in client.arrivals]
+    lost = settings.messages * len(clients) - len(latencies)
+
+    print(f'{settings.messages} messages to {len(clients)} clients, {lost} lost')
+    print_latencies('latency', latencies)
+
+def measure_client(settings: Settings) -> None:
+    # the CPU time is measured for the whole process, so it includes the server
+    client = TcpClient('127.0.0.1')
+
+    cpu = time.process_time()
+    with suppress_stdout():
+        client.connect(lambda message: None)
+    print(f'client connect: CPU {(time.process_time() - cpu) * 1000:.1f} ms')
+
+    cpu = time.process_time()
+    time.sleep(IDLE_DURATION)
+    print(f'client idle for {IDLE_DURATION:.0f} s: CPU {(time.process_time() - cpu) * 1000:.1f} ms')
+
+    round_trips: List[float] = []
+    cpu = time.process_time()
+    with suppress_stdout():
+        for i in range(settings.requests):
+            start = time.perf_counter()
+            client.request(f'ping {i}')
+            round_trips.append((time.perf_counter() - start) * 1000)
+    print(f'{settings.requests} requests: CPU {(time.process_time() - cpu) * 1000 / max(1, settings.requests):.3f} ms per request')
+    print_latencies('round trip', round_trips)
+
+    with suppress_stdout():
+        client.close()
+
+if __name__ == '__main__':
+    settings = Settings()
+
+    server = TcpServer()
+    server.start(lambda request: request)       # echoes the requests
+    frame_loop = FrameLoop()
+
+    measure_commands(settings, server)
+    measure_client(settings)
+
+    frame_loop.close()
+    server.close()
+    IoRuntime.shutdown()
@@ -0,0 +1,340 @@
+# =============================================================================
+# This script load-tests the control plane over loopback: the primary mirror's
+# TcpServer and the task screen's WsServer run in this process, and the
+# secondary mirrors and the task screens are simulated by separate processes.
+# Each trial freezes the mirrors and shows the questionnaire, the task screens
+# answer it, and the first answer unfreezes the mirrors and shows the score;
+# the score is also updated while driving. The script prints the latency
+# percentiles of each kind of message, the throughput, and the CPU use of each
+# process, so that the transport changes can be compared.
+# All processes run on one PC, so the send and receive times are taken from
+# the same clock (time.perf_counter is system-wide on Windows and Linux)
+# =============================================================================
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import time
+
+from typing import Any, List, Tuple
+
+from net_latency import FrameLoop, print_latencies
+from src.exp.logging import LogFile
+from src.exp.mirror_status import MirrorStatus, NetCmd
+from src.exp.session_clock import SessionClock
+from src.exp.task_screen import TaskScreen, TaskScreenRequest, TaskScreenRequests
+from src.net.clock_sync import ClockSync
+from src.net.io_runtime import IoRuntime
+from src.net.tcp_client import TcpClient
+from src.net.tcp_server import TcpServer
+from src.utils import suppress_stdout
+
+FPS = 30                    # as CarlaEnvironment.FPS
+MIRROR_SYNC_DELAY = 0.1     # as Scenario.MIRROR_SYNC_DELAY
+CONNECT_TIMEOUT = 10.0      # seconds for the simulated processes to start and connect
+DRAIN_DURATION = 1.0        # seconds after the last trial for the last messages to arrive
+
+class Settings:
+    def __init__(self) -> None:
+        args = self._make_args()
+
+        self.mirrors: int = args.mirrors
+        self.screens: int = args.screens
+        self.trials: int = args.trials
+        self.interval: float = args.interval
+        self.think_time: float = args.think_time
+        self.score_rate: float = args.score_rate
+        self.burst: int = args.burst
+
+    def _make_args(self):
+        argparser = argparse.ArgumentParser(
+            description='Load-tests the mirror and task screen servers with simulated clients over loopback')
+        argparser.add_argument(
+            '-m', '--mirrors',
+            default=3,
+            type=int,
+            help='Number of secondary mirror processes (default: 3)')
+        argparser.add_argument(
+            '-s', '--screens',
+            default=1,
+            type=int,
+            help='Number of task screen processes (default: 1)')
+        argparser.add_argument(
+            '-n', '--trials',
+            default=20,
+            type=int,
+            help='Number of trials (default: 20)')
+        argparser.add_argument(
+            '--interval',
+            default=1.0,
+            type=float,
+            help='Driving time between the trials, in seconds (default: 1.0)')
+        argparser.add_argument(
+            '--think-time',
+            default=0.5,
+            type=float,
+            help='Longest time the task screens take to answer the questionnaire, in seconds (default: 0.5)')
+        argparser.add_argument(
+            '--score-rate',
+            default=10.0,
+            type=float,
+            help='Score updates per second while driving (default: 10)')
+        argparser.add_argument(
+            '--burst',
+            default=1,
+            type=int,
+            help='Number of copies of each mirror command, to add load (default: 1)')
+        return argparser.parse_args()
+
+class Report:
+    '''What a simulated process sends back: the arrival times of the messages in the order they were sent, and its CPU use'''
+    def __init__(self, name: str, arrivals: List[float], size: int, cpu: float, duration: float) -> None:
+        self.name = name
+        self.arrivals = arrivals
+        self.size = size                # bytes received
+        self.cpu = cpu                  # seconds
+        self.duration = duration        # seconds
+
+    def __str__(self) -> str:
+        return f'{self.name} CPU {self.cpu * 1000:.0f} ms ({self.cpu / max(self.duration, 1e-6) * 100:.1f}%)'
+
+def run_mirror(index: int, ready: Any, stop: Any, reports: Any) -> None:
+    '''A secondary mirror: the commands are handled in the frame loop by MirrorStatus, as in the app'''
+    LogFile.set_enabled(False)
+    with suppress_stdout():     # the client prints every command
+        _run_mirror(index, ready, stop, reports)
+
+def _run_mirror(index: int, ready: Any, stop: Any, reports: Any) -> None:
+    arrivals: List[float] = []
+    size = 0
+
+    clock_sync = ClockSync(SessionClock.now)
+    status = MirrorStatus(SessionClock.now, clock_sync)
+    client = TcpClient('127.0.0.1', clock_sync)
+
+    def handle_command(command: str) -> None:
+        nonlocal size
+        arrivals.append(time.perf_counter())
+        size += len(command)
+        status.handle_net_request(command)
+
+    client.connect(handle_command)
+    ready.put(index)
+
+    runtime = IoRuntime.get()
+    started = time.perf_counter()
+    cpu = time.process_time()
+    while not stop.is_set():
+        runtime.dispatch()
+        status.update()
+        time.sleep(1.0 / FPS)
+
+    reports.put(Report(f'mirror {index + 1}', arrivals, size, time.process_time() - cpu, time.perf_counter() - started))
+
+    client.close()
+    IoRuntime.shutdown()
+
+def run_task_screen(index: int, think_time: float, ready: Any, stop: Any, reports: Any) -> None:
+    asyncio.run(_run_task_screen(index, think_time, ready, stop, reports))
+
+async def _run_task_screen(index: int, think_time: float, ready: Any, stop: Any, reports: Any) -> None:
+    '''A task screen: records the messages and answers the questionnaire after a random time, as a participant'''
+    from websockets.client import connect
+    from src.net.ws_server import PORT
+
+    arrivals: List[float] = []
+    size = 0
+
+    async with connect(f'ws://127.0.0.1:{PORT}') as ws:
+        async def answer() -> None:
+            await asyncio.sleep(random.uniform(0, think_time))
+            # the send time lets the primary measure the latency; TaskScreenRequest ignores it
+            await ws.send(json.dumps({ 'type': TaskScreenRequests.questionnaire, 'data': 4, 'sent': time.perf_counter() }))
+
+        ready.put(index)
+        started = time.perf_counter()
+        cpu = time.process_time()
+        while not stop.is_set():
+            try:
+                msg = await asyncio.wait_for(ws.recv(), 0.1)
+            except asyncio.TimeoutError:
+                continue
+
+            arrivals.append(time.perf_counter())
+            size += len(msg)
+            data = json.loads(msg)
+            if data['target'] == 'questionnaire' and data['cmd'] == 'show':
+                asyncio.ensure_future(answer())
+
+        reports.put(Report(f'task screen {index + 1}', arrivals, size, time.process_time() - cpu, time.perf_counter() - started))
+
+class MeasuredTaskScreen(TaskScreen):
+    '''Records the latency of the answers, from their send time to the frame loop'''
+    def __init__(self) -> None:
+        self.latencies: List[float] = []
+        super().__init__()
+
+    # Internal
+
+    def _parse(self, msg: str) -> None:
+        sent = json.loads(msg).get('sent')
+        if sent is not None:
+            self.latencies.append((time.perf_counter() - sent) * 1000)
+        super()._parse(msg)
+
+class Primary:
+    '''Sends the traffic of the experiment scenario from the frame loop and records the send times'''
+    def __init__(self, settings: Settings, server: TcpServer, task_screen: MeasuredTaskScreen) -> None:
+        self.command_times: List[float] = []
+        self.screen_times: List[float] = []
+        self.answer_count = 0
+
+        self._settings = settings
+        self._server = server
+        self._task_screen = task_screen
+        task_screen.set_callback(self._handle_request)
+
+        self._frame = 0
+        self._score = 0
+        self._trial = 0
+        self._is_frozen = False
+
+    def run(self) -> float:
+        '''Returns the duration of the trials'''
+        runtime = IoRuntime.get()
+        score_interval = 1.0 / self._settings.score_rate if self._settings.score_rate > 0 else float('inf')
+        started = time.perf_counter()
+        next_frame = started
+        next_trial = started + self._settings.interval
+        next_score = started + score_interval
+
+        while self._trial < self._settings.trials or self._is_frozen:
+            runtime.dispatch()
+            self._frame += 1
+
+            now = time.perf_counter()
+            if not self._is_frozen and now >= next_trial and self._trial < self._settings.trials:
+                self._freeze()
+            if self._is_frozen:
+                next_trial = now + self._settings.interval
+            elif now >= next_score:
+                self._score += 1
+                self._send_to_screen(lambda: self._task_screen.show_score(self._score))
+                next_score = now + score_interval
+
+            next_frame += 1.0 / FPS
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+
+        return time.perf_counter() - started
+
+    # Internal
+
+    def _send_mirror_command(self, cmd: str) -> None:
+        # as Scenario._set_mirrors_frozen
+        target_frame = self._frame + round(MIRROR_SYNC_DELAY * FPS) if cmd == NetCmd.hide_mirror else 0
+        message = NetCmd.make(cmd, target_frame, SessionClock.now() + MIRROR_SYNC_DELAY)
+        for _ in range(self._settings.burst):
+            self.command_times.append(time.perf_counter())
+            self._server.send(message)
+
+    def _send_to_screen(self, send: Any) -> None:
+        self.screen_times.append(time.perf_counter())
+        send()
+
+    def _freeze(self) -> None:
+        self._trial += 1
+        self._is_frozen = True
+        self._send_mirror_command(NetCmd.hide_mirror)
+        self._send_to_screen(self._task_screen.show_questionnaire)
+
+    def _handle_request(self, request: TaskScreenRequest) -> None:
+        if request.type != TaskScreenRequests.questionnaire:
+            return
+
+        self.answer_count += 1
+        if self._is_frozen:
+            # the first answer ends the trial, as in the scenario
+            self._is_frozen = False
+            self._send_to_screen(self._task_screen.hide_questionnaire)
+            self._score += 10
+            self._send_to_screen(lambda: self._task_screen.show_score(self._score))
+            self._send_mirror_command(NetCmd.show_mirror)
+
+def get_latencies(sent: List[float], reports: List[Report]) -> Tuple[List[float], int]:
+    '''The messages arrive in the order they were sent, so they are matched by their index; returns the latencies and the lost count'''
+    latencies = [(arrival - sent[i]) * 1000 for report in reports for i, arrival in enumerate(report.arrivals[:len(sent)])]
+    return latencies, len(sent) * len(reports) - len(latencies)
+
+def print_report(settings: Settings, primary: Primary, task_screen: MeasuredTaskScreen, duration: float, cpu: float, reports: List[Report]) -> None:
+    mirror_reports = [x for x in reports if x.name.startswith('mirror')]
+    screen_reports = [x for x in reports if x.name.startswith('task screen')]
+
+    print(f'{settings.trials} trials with {len(mirror_reports)} mirrors and {len(screen_reports)} task screens in {duration:.1f} s')
+
+    latencies, lost = get_latencies(primary.command_times, mirror_reports)
+    print(f'mirror commands: {len(primary.command_times)} to each mirror, {lost} lost')
+    print_latencies('  latency to the frame loop', latencies)
+
+    latencies, lost = get_latencies(primary.screen_times, screen_reports)
+    print(f'task screen messages: {len(primary.screen_times)} to each screen, {lost} lost')
+    print_latencies('  latency', latencies)
+
+    print(f'questionnaire answers: {primary.answer_count}')
+    print_latencies('  latency to the frame loop', task_screen.latencies)
+
+    received_count = sum(len(x.arrivals) for x in reports) + primary.answer_count
+    received_size = sum(x.size for x in reports)
+    print(f'throughput: {received_count / duration:.0f} messages/s, {received_size / duration / 1000:.1f} kB/s received by the clients')
+
+    print(f'CPU: primary {cpu * 1000:.0f} ms ({cpu / duration * 100:.1f}%)')
+    for report in reports:
+        print(f'  {report}')
+
+if __name__ == '__main__':
+    settings = Settings()
+    LogFile.set_enabled(False)
+
+    with suppress_stdout():
+        server = TcpServer(SessionClock.now)
+        server.start()
+        task_screen = MeasuredTaskScreen()
+
+    # spawned as on Windows, so the children do not inherit the I/O thread
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    stop = context.Event()
+    reports_queue = context.Queue()
+    processes = [context.Process(target = run_mirror, args = (i, ready, stop, reports_queue)) for i in range(settings.mirrors)]
+    processes += [context.Process(target = run_task_screen, args = (i, settings.think_time, ready, stop, reports_queue)) for i in range(settings.screens)]
+
+    # the connections are dispatched meanwhile, as the primary does not handle anything else yet
+    with suppress_stdout():
+        frame_loop = FrameLoop()
+        for process in processes:
+            process.start()
+        for _ in processes:
+            ready.get(timeout = CONNECT_TIMEOUT)
+        frame_loop.close()
+
+    primary = Primary(settings, server, task_screen)
+    cpu = time.process_time()
+    duration = primary.run()
+    cpu = time.process_time() - cpu
+
+    with suppress_stdout():
+        # the late answers are handled meanwhile
+        frame_loop = FrameLoop()
+        time.sleep(DRAIN_DURATION)
+        frame_loop.close()
+        stop.set()
+        reports: List[Report] = [reports_queue.get(timeout = CONNECT_TIMEOUT) for _ in processes]
+        reports.sort(key = lambda x: x.name)
+        for process in processes:
+            process.join()
+
+        task_screen.close()
+        server.close()
+    IoRuntime.shutdown()
+
+    print_report(settings, primary, task_screen, duration, cpu, reports)
@@ -0,0 +1,60 @@
+# =============================================================================
+# This script re-scores the recorded sessions with the current scoring rules
+# (see ScoringRules in src/exp/scoring.py)
+# =============================================================================
+import argparse
+import time
+
+from typing import List, Optional
+
+from src.exp.logging import LOG_FOLDER
+from src.exp.log_reader import LogReader
+from src.exp.rescoring import Rescoring
+
+class Settings:
+    def __init__(self) -> None:
+        args = self._make_args()
+
+        self.folders: List[str] = args.folders if args.folders else [LOG_FOLDER]
+        self.workers: Optional[int] = args.workers
+
+    def _make_args(self):
+        argparser = argparse.ArgumentParser(
+            description='Re-scores the recorded sessions')
+        argparser.add_argument(
+            'folders',
+            nargs='*',
+            help=f'Folders with logs, searched recursively (default: {LOG_FOLDER})')
+        argparser.add_argument(
+            '--workers',
+            default=None,
+            type=int,
+            help='Number of processes parsing the logs (default: number of CPUs)')
+        return argparser.parse_args()
+
+if __name__ == '__main__':
+    settings = Settings()
+
+    start = time.perf_counter()
+
+    filenames: List[str] = []
+    for folder in settings.folders:
+        event_logs, _, _ = LogReader.find(folder)
+        filenames += event_logs
+
+    sessions = Rescoring.load(filenames, settings.workers)
+    scores = Rescoring.get_scores(sessions)
+
+    print('session\ttargets\ttasks\tlogged\trescored\texact')
+    mismatches = 0
+    for session, score in zip(sessions, scores):
+        if len(session.targets) == 0 and len(session.tasks) == 0:
+            continue
+
+        logged = '' if session.logged_score is None else str(session.logged_score)
+        print(f'{session.filename}\t{len(session.targets)}\t{len(session.tasks)}\t{logged}\t{score}\t{session.is_exact}')
+
+        if session.logged_score is not None and session.logged_score != score:
+            mismatches += 1
+
+    print(f'{len(sessions)} sessions are re-scored in {time.perf_counter() - start:.1f} s, {mismatches} scores differ from the logged ones')
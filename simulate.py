@@ -0,0 +1,95 @@
+# =============================================================================
+# This script runs the experiment scenario headless and faster than in real time,
+# with synthetic traffic and a scripted driver (see src/exp/scenario_sim.py),
+# and prints the distributions of the scores, durations and trials
+# =============================================================================
+import argparse
+import statistics
+import time
+
+from typing import List, Optional
+
+from src.carla.lane import Lane
+from src.exp.scenario_sim import ScenarioSimulator, DriverModel, SessionResult
+
+class Settings:
+    def __init__(self) -> None:
+        args = self._make_args()
+
+        self.sessions: int = args.sessions
+        self.workers: Optional[int] = args.workers
+        self.seed: int = args.seed
+        self.error_rate: float = args.error_rate
+        self.miss_rate: float = args.miss_rate
+
+    def _make_args(self):
+        argparser = argparse.ArgumentParser(
+            description='Simulates the experiment sessions')
+        argparser.add_argument(
+            '-n', '--sessions',
+            default=100,
+            type=int,
+            help='Number of sessions (default: 100)')
+        argparser.add_argument(
+            '--workers',
+            default=None,
+            type=int,
+            help='Number of processes running the sessions (default: number of CPUs)')
+        argparser.add_argument(
+            '--seed',
+            default=0,
+            type=int,
+            help='Seed of the first session, the next sessions use the following numbers (default: 0)')
+        argparser.add_argument(
+            '--error-rate',
+            default=0.1,
+            type=float,
+            help='Probability of a wrong answer to the questionnaire (default: 0.1)')
+        argparser.add_argument(
+            '--miss-rate',
+            default=0.1,
+            type=float,
+            help='Probability of not noticing a target (default: 0.1)')
+        return argparser.parse_args()
+
+def print_distribution(name: str, values: List[float]) -> None:
+    if len(values) == 0:
+        print(f'{name}: -')
+        return
+
+    values = sorted(values)
+    quantiles = [values[int((len(values) - 1) * q)] for q in (0.05, 0.5, 0.95)]
+    print(f'{name}: mean {statistics.mean(values):.1f}, min {values[0]:.1f}, 5% {quantiles[0]:.1f}, median {quantiles[1]:.1f}, 95% {quantiles[2]:.1f}, max {values[-1]:.1f}')
+
+if __name__ == '__main__':
+    settings = Settings()
+
+    start = time.perf_counter()
+
+    seeds = list(range(settings.seed, settings.seed + settings.sessions))
+    driver = DriverModel(answer_error_rate = settings.error_rate, target_miss_rate = settings.miss_rate)
+    results: List[SessionResult] = ScenarioSimulator.run_many(seeds, driver, settings.workers)
+
+    duration = time.perf_counter() - start
+    simulated = sum(x.duration for x in results)
+    print(f'{len(results)} sessions ({simulated / 3600:.1f} h) are simulated in {duration:.1f} s')
+
+    unfinished = [x.seed for x in results if not x.is_done]
+    if len(unfinished) > 0:
+        print(f'{len(unfinished)} sessions did not finish, seeds: {" ".join(str(x) for x in unfinished)}')
+
+    print_distribution('Score', [x.score for x in results])
+    print_distribution('Duration, s', [x.duration for x in results])
+    print_distribution('Trials per session', [len(x.answers) for x in results])
+    print_distribution('Targets noticed per session', [x.targets_noticed for x in results])
+
+    intervals: List[float] = []
+    for result in results:
+        times = [x[0] for x in result.answers]
+        intervals += [b - a for a, b in zip(times, times[1:])]
+    print_distribution('Interval between trials, s', intervals)
+
+    counts = ScenarioSimulator.get_trial_counts(results)
+    print('lane\tclose\tmid\tfar')
+    for lane in (Lane.SAME, Lane.LEFT):
+        print(f'{lane}\t' + '\t'.join(str(counts.get((lane, zone), 0)) for zone in ('close', 'mid', 'far')))
@@ -1,14 +1,14 @@
 from src.carla.utils import add_carla_path
 add_carla_path()
 
-from typing import Optional, List, cast
+from typing import Optional, List, Union, ContextManager, cast, TYPE_CHECKING
 
 try:
     import carla
 except ImportError:
     raise RuntimeError('cannot import CARLA')
 
-from src.utils import suppress_stdout
+from src.utils import suppress_stdout, StartupTimer, ImportProfiler
 
 try:
     with suppress_stdout():
@@ -18,46 +18,74 @@ except ImportError:
 
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
 from src.user_action import UserAction, ActionType, Action
 from src.settings import Settings, MirrorType
-from src.runner import Runner
 
 from src.carla.sync_mode import CarlaSyncMode
 from src.carla.environment import CarlaEnvironment
 from src.carla.vehicle_factory import VehicleFactory
+from src.carla.actor_batch import ActorBatch
+from src.carla.traffic_profile import TrafficProfile
 from src.carla.monitor import CarlaMonitor
+from src.carla.map_cache import MapCache
+from src.carla.blueprint_cache import BlueprintCache
 
-from src.mirror.side import SideMirror
-from src.mirror.wideview import WideviewMirror
-from src.mirror.top_view import TopViewMirror
-from src.mirror.rectangular import RectangularMirror
 from src.mirror.base import Mirror
 
 from src.exp.logging import EventLogger
-from src.exp.scenario import Scenario
 from src.exp.scenario_env import ScenarioEnvironment
+from src.exp.session_clock import SessionClock
+
+from src.net.io_runtime import IoRuntime
+from src.net.tcp_client import TcpClient
+
+# the mirror subclasses and the modules used by the primary mirror only are imported where needed
+if TYPE_CHECKING:
+    from src.runner import Runner
+    from src.carla.actor_pool import ActorPool
+    from src.exp.scenario import Scenario
+    from src.mirror.shared_frames import SharedFrameWriter, SharedFrameReader
+    from src.net.frame_stream import FrameStreamServer, FrameStreamClient
+    from src.net.telemetry import TelemetryPublisher
 
 class Finished(Exception):
     pass
 
 class App:
     
-    def __init__(self):
+    def __init__(self, import_profiler: Optional[ImportProfiler] = None):
         self._spawned_actors: List[carla.Actor] = []
+        self._actor_batch: Optional[ActorBatch] = None
+        self._actor_pool: Optional['ActorPool'] = None
+        self._import_profiler = import_profiler
         
     def run(self):
-        settings = Settings()
+        timer = StartupTimer()
+        settings = Settings.get()
 
         VehicleFactory.set_driving_mode(settings.is_manual_mode)
+        VehicleFactory.set_traffic_profile(TrafficProfile(settings.hybrid_physics_radius, settings.tm_seed))
         
         CarlaEnvironment.set_driver_offset(VehicleFactory.ego_car_type)
-        SideMirror.set_camera_offset(VehicleFactory.ego_car_type)
-        RectangularMirror.set_camera_offset(VehicleFactory.ego_car_type)
-        WideviewMirror.set_camera_offset(VehicleFactory.ego_car_type)
         
         pygame.init()
 
         self._logger = EventLogger('app')
+
+        if settings.frames_from or settings.stream_from:
+            # the images come from another mirror, so CARLA is not needed
+            mirror = self._create_mirror(settings)
+            timer.mark('window')
+            self._report_startup(settings, timer)
+
+            try:
+                self._show_received_mirror(mirror, settings)
+            finally:
+                pygame.quit()
+            return
         
         client = carla.Client(settings.host, 2000)
         client.set_timeout(5.0)
@@ -69,15 +97,40 @@ class App:
         except:
             print(f'APP: CARLA is not running')
             mirror = self._create_mirror(settings)
+            timer.mark('window')
+            self._report_startup(settings, timer)
+            
             self._show_blank_mirror(mirror)
 
         else:
-            runner: Optional[Runner] = None
+            timer.mark('world')
+            runner: Optional['Runner'] = None
             
             vehicle_factory = VehicleFactory(client)
-            ego_car, is_ego_car_created = vehicle_factory.get_ego_car()
-
-            mirror = self._create_mirror(settings, world, ego_car)
+            self._actor_batch = vehicle_factory.actor_batch
+            timer.mark('traffic manager')
+            
+            # the server requests and the network probe run in the background
+            # while the window and its OpenGL context are created
+            with ThreadPoolExecutor() as executor:
+                ego_car_task = executor.submit(vehicle_factory.get_ego_car)
+                map_task = executor.submit(MapCache.get_map, world)
+                blueprints_task = executor.submit(BlueprintCache.get, world)
+                tcp_server_task = executor.submit(TcpClient.can_connect, settings.primary_mirror_host)
+                
+                mirror = self._create_mirror(settings, world)
+                timer.mark('window')
+                
+                ego_car, is_ego_car_created = ego_car_task.result()
+                timer.mark('ego car')
+                
+                map_task.result()
+                blueprints_task.result()
+                is_tcp_server_running = tcp_server_task.result()
+                timer.mark('map and blueprints')
+            
+            mirror.attach_camera(ego_car)
+            timer.mark('camera')
 
             if is_ego_car_created or settings.is_primary_mirror:
                 mirror_name = str(settings.type).split('.')[1].lower()
@@ -88,18 +141,24 @@ class App:
                 if is_ego_car_created:
                     self._spawned_actors.append(ego_car)
                 
-                runner = Runner(environment, vehicle_factory, ego_car, mirror)
+                from src.runner import Runner
+                runner = Runner(environment, vehicle_factory, ego_car, mirror, settings.traffic_count)
+                self._actor_pool = runner.actor_pool
+                timer.mark('runner')
 
             if mirror.camera:
                 self._spawned_actors.append(mirror.camera)
                 
-            self._monitor = CarlaMonitor(world)
+            self._monitor = CarlaMonitor(world, self._actor_pool)
+            timer.mark('monitor')
+            self._report_startup(settings, timer)
             
-            self._show_carla_mirror(mirror, runner)
+            self._show_carla_mirror(mirror, runner, is_tcp_server_running)
 
         finally:
-            for actor in self._spawned_actors:
-                actor.destroy()
+            self._destroy_actors(self._spawned_actors)
+            if self._actor_pool:
+                self._actor_pool.clear()
 
             pygame.quit()
 
@@ -108,17 +167,22 @@ class App:
     def _run_loop(self,
                  sync_mode: CarlaSyncMode,
                  mirror: Mirror,
-                 runner: Optional[Runner]):
+                 runner: Optional['Runner'],
+                 is_tcp_server_running: Optional[bool] = None):
         clock = pygame.time.Clock()
+        frames_to = Settings.get().frames_to
+        frame_writer: Optional['SharedFrameWriter'] = None
+        telemetry = self._make_telemetry() if runner else None
 
         try:
-            with ScenarioEnvironment(runner is not None) as env:
+            with ScenarioEnvironment(runner is not None, is_tcp_server_running) as env, self._make_stream_server() as stream_server:
                 scenario = env.scenario
                 timeout = 5.0 if scenario else 0.2
                 
                 while True:
                     action = UserAction.get()
                     
+                    env.tick()
                     if scenario:
                         scenario.tick()
                         if action is None: 
@@ -136,17 +200,38 @@ class App:
                             snapshot, image = queries
                             mirror_image = cast(carla.Image, image)
                             
+                            world_snapshot = cast(carla.WorldSnapshot, snapshot)
+                            SessionClock.set_frame(world_snapshot.frame, world_snapshot.timestamp.elapsed_seconds)
+
+                            if frames_to:
+                                if frame_writer is None:
+                                    from src.mirror.shared_frames import SharedFrameWriter
+                                    frame_writer = SharedFrameWriter(frames_to, mirror_image.width, mirror_image.height)
+                                frame_writer.publish(world_snapshot.frame, mirror_image.raw_data)
+                            if stream_server:
+                                stream_server.publish(world_snapshot.frame, mirror_image.width, mirror_image.height, mirror_image.raw_data)
+                            
                             # self._print_image(mirror)
                         
                             if runner:
-                                carla_snapshot = cast(carla.WorldSnapshot, snapshot)
-                                ego_car_snapshot, spawned = runner.make_step(carla_snapshot, action)
+                                ego_car_snapshot, spawned = runner.make_step(world_snapshot, action)
+
+                                # the traffic is scanned once per frame for both
+                                vehicle, distance, lane = self._monitor.get_nearest_vehicle_behind(ego_car_snapshot) if scenario or telemetry else (None, 0.0, None)
                                 
                                 if scenario:
-                                    self._update_scenario_state(scenario, runner, ego_car_snapshot)
+                                    self._update_scenario_state(scenario, runner, ego_car_snapshot, vehicle, distance, lane)
                                     if action:
                                         scenario.report_action_result(action, spawned is not None)
 
+                                if telemetry:
+                                    telemetry.set_ego_car(world_snapshot.frame, world_snapshot.timestamp.elapsed_seconds, runner.ego_car_speed, ego_car_snapshot.get_transform())
+                                    telemetry.set_vehicle_behind(distance if vehicle else None, lane if vehicle else None)
+
+                    if telemetry:
+                        # also while frozen, so that the recorders see the freeze
+                        telemetry.publish(env.mirror_status.is_frozen)
+
                     if spawned:
                         self._spawned_actors.append(spawned)
 
@@ -157,18 +242,28 @@ class App:
                     clock.tick(CarlaEnvironment.FPS)
         except Finished:
             pass
+        finally:
+            if frame_writer:
+                frame_writer.close()
+            if telemetry:
+                telemetry.close()
+            # also on a CARLA timeout or Ctrl+C, so that the background vehicles do not stay in the server world
+            if runner and runner.traffic:
+                runner.traffic.clear()
             
         self._remove_spawned(sync_mode)
 
     def _show_carla_mirror(self,
                            mirror: Mirror,
-                           runner: Optional[Runner]):
+                           runner: Optional['Runner'],
+                           is_tcp_server_running: Optional[bool] = None):
         try:
             with CarlaSyncMode(cast(carla.World, mirror.world),
                             CarlaEnvironment.FPS,
                             runner is not None,
-                            cast(carla.Sensor, mirror.camera)) as sync_mode:     # Create a synchronous mode context.
-                self._run_loop(sync_mode, mirror, runner)
+                            cast(carla.Sensor, mirror.camera),
+                            traffic_manager = runner.vehicle_factory.traffic_manager if runner else None) as sync_mode:     # Create a synchronous mode context.
+                self._run_loop(sync_mode, mirror, runner, is_tcp_server_running)
         finally:
             time.sleep(0.5)
 
@@ -180,6 +275,8 @@ class App:
         
             while True:
                 action = UserAction.get()
+                
+                env.tick()
                 if scenario:
                     scenario.tick()
 
@@ -207,24 +304,94 @@ class App:
                 pygame.display.flip()
                 clock.tick(CarlaEnvironment.FPS)
 
+    def _make_stream_server(self) -> ContextManager[Optional['FrameStreamServer']]:
+        # closed before ScenarioEnvironment, which stops the network I/O
+        settings = Settings.get()
+        if settings.stream_port is None:
+            return nullcontext()
+
+        from src.net.frame_stream import FrameStreamServer
+        return FrameStreamServer(settings.stream_port, settings.stream_budget)
+
+    def _make_telemetry(self) -> Optional['TelemetryPublisher']:
+        settings = Settings.get()
+        if settings.telemetry_to is None:
+            return None
+
+        from src.net.telemetry import TelemetryPublisher
+        return TelemetryPublisher(settings.telemetry_to)
+
+    def _show_received_mirror(self, mirror: Mirror, settings: Settings) -> None:
+        '''Shows the images of a mirror in another process on this PC, or streamed from another PC'''
+        reader: Union['SharedFrameReader', 'FrameStreamClient']
+        if settings.frames_from:
+            from src.mirror.shared_frames import SharedFrameReader
+            reader = SharedFrameReader(settings.frames_from)
+        else:
+            from src.net.frame_stream import FrameStreamClient, PORT
+            host, _, port = cast(str, settings.stream_from).partition(':')
+            reader = FrameStreamClient(host, int(port) if port else PORT)
+
+        clock = pygame.time.Clock()
+
+        try:
+            while True:
+                action = UserAction.get()
+                if action:
+                    if action.type == ActionType.QUIT:
+                        break
+                    elif action.type == ActionType.MOUSE:
+                        mirror.on_mouse(cast(str, action.param))
+                    elif action.type == ActionType.MIRROR_VIEW_OFFSET:
+                        mirror.on_offset(cast(str, action.param))
+                    elif action.type == ActionType.DEBUG_MIRROR:
+                        if action.param == 'snapshot':
+                            mirror.save_snapshot('debug')
+
+                # the last image stays on the mirror while the publishing mirror is frozen
+                mirror.draw_image(cast(carla.Image, reader.read()))
+
+                pygame.display.flip()
+                clock.tick(CarlaEnvironment.FPS)
+        finally:
+            reader.close()
+            IoRuntime.shutdown()
+
     def _create_mirror(self, settings: Settings, world: Optional[carla.World] = None, ego_car: Optional[carla.Vehicle] = None) -> Mirror:
+        # only the module of the selected mirror type is imported
         if settings.type == MirrorType.WIDEVIEW:
+            from src.mirror.wideview import WideviewMirror
+            WideviewMirror.set_camera_offset(VehicleFactory.ego_car_type)
             return WideviewMirror(settings, world, ego_car)
         elif settings.type == MirrorType.TOPVIEW:
+            from src.mirror.top_view import TopViewMirror
             return TopViewMirror(settings, world, ego_car)
         elif settings.type == MirrorType.RLEFT or settings.type == MirrorType.RRIGHT or settings.type == MirrorType.RREAR:
+            from src.mirror.rectangular import RectangularMirror
+            RectangularMirror.set_camera_offset(VehicleFactory.ego_car_type)
             return RectangularMirror(settings, world, ego_car)
         elif settings.type == MirrorType.LEFT or settings.type == MirrorType.RIGHT:
+            from src.mirror.side import SideMirror
+            SideMirror.set_camera_offset(VehicleFactory.ego_car_type)
             return SideMirror(settings, world, ego_car)
         else:
             print(f'APP Unknown mirror type: "{settings.type}"')
             raise IndexError
 
+    def _report_startup(self, settings: Settings, timer: StartupTimer) -> None:
+        timer.report()
+        
+        if self._import_profiler:
+            self._import_profiler.stop()
+            if settings.startup_profile:
+                self._import_profiler.report()
+            self._import_profiler = None
+
     def _handle_action(self,
                        action: Optional[Action],
                        mirror: Mirror,
-                       scenario: Optional[Scenario],
-                       runner: Optional[Runner]) -> None:
+                       scenario: Optional['Scenario'],
+                       runner: Optional['Runner']) -> None:
         if not action:
             return
         
@@ -237,29 +404,29 @@ class App:
             mirror.on_mouse(cast(str, action.param))
         elif action.type == ActionType.REMOVE_TARGETS:
             targets = [ x for x in self._spawned_actors if x.type_id.startswith('static.prop.') ]
-            for target in targets:
-                self._spawned_actors.remove(target)
-                target.destroy()
+            self._spawned_actors = [ x for x in self._spawned_actors if x not in targets ]
+            self._release_actors(targets)
         elif action.type == ActionType.REMOVE_CARS:
             ego_car = runner.ego_car if runner else None
             vehicles = [ x for x in self._spawned_actors if x.type_id.startswith('vehicle.') and x != ego_car ]
-            for vehicle in vehicles:
-                self._spawned_actors.remove(vehicle)
-                vehicle.destroy()
+            self._spawned_actors = [ x for x in self._spawned_actors if x not in vehicles ]
+            self._release_actors(vehicles)
         elif action.type == ActionType.DEBUG_MIRROR:
             if action.param == 'snapshot':
                 self._print_image(mirror, True)
 
     def _update_scenario_state(self,
-                               scenario: Scenario,
-                               runner: Runner,
-                               ego_car_snapshot: carla.ActorSnapshot) -> None:
+                               scenario: 'Scenario',
+                               runner: 'Runner',
+                               ego_car_snapshot: carla.ActorSnapshot,
+                               vehicle: Optional[carla.Vehicle],
+                               distance: float,
+                               lane: Optional[str]) -> None:
         if runner.search_target is None:
             scenario.set_search_target_distance(0)
         else:
             scenario.set_search_target_distance(runner.controller.get_distance_to(ego_car_snapshot, runner.search_target))
         
-        vehicle, distance, lane = self._monitor.get_nearest_vehicle_behind(ego_car_snapshot)
         if vehicle and lane:
             if scenario.set_nearest_vehicle_behind(vehicle.type_id, distance, lane, runner.ego_car_speed):
                 runner.mirror.save_snapshot(f'{lane}_{distance:.0f}')
@@ -268,9 +435,29 @@ class App:
         actors = [x for x in self._spawned_actors if not x.type_id.startswith('sensor.')]
         self._spawned_actors = [x for x in self._spawned_actors if x.type_id.startswith('sensor.')]
         
-        for actor in actors:
-            actor.destroy()
-            sync_mode.tick(5.0)
+        self._destroy_actors(actors)
+        if self._actor_pool:
+            self._actor_pool.clear()
+            
+        sync_mode.tick(5.0)
+    
+    def _release_actors(self, actors: List[carla.Actor]) -> None:
+        # pooled actors are parked to be reused later, the others are destroyed
+        if self._actor_pool:
+            actors = self._actor_pool.release(actors)
+        self._destroy_actors(actors)
+    
+    def _destroy_actors(self, actors: List[carla.Actor]) -> None:
+        # pooled actors are destroyed by the pool
+        if self._actor_pool:
+            actors = [x for x in actors if not self._actor_pool.owns(x)]
+            
+        # all actors are destroyed within a single request to the server
+        if self._actor_batch:
+            self._actor_batch.destroy(actors)
+        else:
+            for actor in actors:
+                actor.destroy()
 
     def _print_image(self, mirror: Mirror, at_any_distance: bool = False):
         if mirror.world:
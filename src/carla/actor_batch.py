@@ -0,0 +1,88 @@
+import carla
+
+from typing import Optional, Sequence, Iterable, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from carla_command import Command, Response     # stubs only, the runtime module is carla.command
+
+SpawnRequest = Tuple[carla.ActorBlueprint, carla.Transform, Optional[str]]     # blueprint, transform, color
+
+class ActorBatch:
+    '''
+    Groups actor commands, so that spawning or destroying N actors
+    costs a single round trip to the server instead of N.
+    The blueprints are shared (see BlueprintCache), so the color of each request is set
+    right before its command is made, as the command copies the blueprint attributes
+
+        batch = ActorBatch(client, traffic_manager.get_port())
+        vehicles = batch.spawn([(bp, transform, color), ...], autopilot = True)
+        batch.destroy(vehicles)
+    '''
+    DEFAULT_TM_PORT = 8000
+
+    def __init__(self,
+                 client: carla.Client,
+                 tm_port: Optional[int] = None) -> None:
+        self.client = client
+        self.world = client.get_world()
+        self.tm_port = tm_port if tm_port is not None else ActorBatch.DEFAULT_TM_PORT
+
+    def apply(self,
+              commands: List['Command'],
+              due_tick_cue: bool = False) -> List['Response']:
+        if len(commands) == 0:
+            return []
+
+        responses = self.client.apply_batch_sync(commands, due_tick_cue)
+
+        errors = [r.error for r in responses if r.has_error()]
+        if len(errors) > 0:
+            print(f'CAB: {len(errors)} of {len(commands)} commands failed, the first error: {errors[0]}')
+
+        return responses
+
+    def spawn(self,
+              requests: Sequence[SpawnRequest],
+              autopilot: bool = False,
+              physics: bool = True,
+              due_tick_cue: bool = False) -> List[Optional[carla.Actor]]:
+        '''Returns the spawned actors in the order of requests, None for failed requests'''
+        SpawnActor = carla.command.SpawnActor
+        SetAutopilot = carla.command.SetAutopilot
+        SetSimulatePhysics = carla.command.SetSimulatePhysics
+        FutureActor = carla.command.FutureActor
+
+        commands: List['Command'] = []
+        for blueprint, transform, color in requests:
+            if color is not None:
+                blueprint.set_attribute('color', color)
+            command = SpawnActor(blueprint, transform)
+            if autopilot:
+                command = command.then(SetAutopilot(FutureActor, True, self.tm_port))
+            if not physics:
+                command = command.then(SetSimulatePhysics(FutureActor, False))
+            commands.append(command)
+
+        responses = self.apply(commands, due_tick_cue)
+
+        ids = [r.actor_id for r in responses if not r.has_error()]
+        actors = { actor.id: actor for actor in self.world.get_actors(ids) } if len(ids) > 0 else { }
+
+        return [None if r.has_error() else actors.get(r.actor_id) for r in responses]
+
+    def destroy(self,
+                actors: Iterable[carla.Actor],
+                due_tick_cue: bool = False) -> int:
+        '''Returns the number of actors destroyed successfully'''
+        DestroyActor = carla.command.DestroyActor
+
+        commands: List['Command'] = [DestroyActor(actor.id) for actor in actors]
+        responses = self.apply(commands, due_tick_cue)
+
+        return len([r for r in responses if not r.has_error()])
+
+    def set_autopilot(self,
+                      actors: Iterable[carla.Actor],
+                      enabled: bool = True) -> None:
+        SetAutopilot = carla.command.SetAutopilot
+        self.apply([SetAutopilot(actor.id, enabled, self.tm_port) for actor in actors])
@@ -0,0 +1,156 @@
+import random
+import carla
+
+from typing import Optional, Iterable, Dict, List, Set, Tuple, cast, TYPE_CHECKING
+
+from src.carla.vehicle_factory import VehicleFactory
+from src.carla.blueprint_cache import BlueprintCache
+
+if TYPE_CHECKING:
+    from carla_command import Command
+
+VEHICLES_PER_BLUEPRINT = 1
+
+PARKING_LOCATION = carla.Location(x = 0, y = 0, z = -500)   # under the map, no camera sees it
+PARKING_SLOT_SPACING = 10.0                                 # meters, so that parked actors never overlap
+SPAWN_CLEARANCE = 6.0                                       # meters from the spot to the center of any vehicle, more than a car length
+
+class ActorPool:
+    '''
+    Vehicles and targets (props) are spawned once at the session start and parked under the map.
+    Then, they are "spawned" by teleporting them to the requested location, and "removed" by parking
+    them again, which is much cheaper for the server than spawning and destroying actors
+    '''
+    def __init__(self, vehicle_factory: VehicleFactory) -> None:
+        self._vehicle_factory = vehicle_factory
+        self._batch = vehicle_factory.actor_batch
+        self._world = vehicle_factory.world
+
+        self._actors: Dict[int, carla.Actor] = dict()
+        self._parking: Dict[int, carla.Transform] = dict()
+        self._free_vehicles: List[carla.Vehicle] = []
+        self._free_props: Dict[str, carla.Actor] = dict()
+        self._parked: Set[int] = set()      # the ids of the free actors
+
+    def fill(self, prop_names: Iterable[str]) -> None:
+        vehicle_requests = [(bp, self._get_parking_slot(i), color) for i, (bp, color) in enumerate(self._get_vehicle_blueprints())]
+        vehicles = self._batch.spawn(vehicle_requests, physics = False)
+
+        blueprints = BlueprintCache.get(self._world)
+        prop_bps = [blueprints.props.get(name) for name in prop_names]
+        prop_requests = [(bp, self._get_parking_slot(len(vehicle_requests) + i), None) for i, bp in enumerate([x for x in prop_bps if x is not None])]
+        props = self._batch.spawn(prop_requests)
+
+        for actor, (_, transform, _) in zip(vehicles + props, vehicle_requests + prop_requests):
+            if actor is None:
+                continue
+
+            self._actors[actor.id] = actor
+            self._parking[actor.id] = transform
+            self._parked.add(actor.id)
+            if actor.type_id.startswith('vehicle.'):
+                self._free_vehicles.append(cast(carla.Vehicle, actor))
+            else:
+                self._free_props[ActorPool._get_prop_name(actor)] = actor
+
+        print(f'CAP: {len(self._free_vehicles)} vehicles and {len(self._free_props)} props are parked')
+
+    def owns(self, actor: carla.Actor) -> bool:
+        return actor.id in self._actors
+
+    def is_parked(self, actor_id: int) -> bool:
+        '''The actor is a free pooled actor under the map, which the traffic checks must ignore'''
+        return actor_id in self._parked
+
+    def has_free_vehicles(self) -> bool:
+        return len(self._free_vehicles) > 0
+
+    def is_free(self, transform: carla.Transform) -> bool:
+        '''No vehicle is at the spot, including the ego car and the background traffic; the parked vehicles are far below'''
+        location = transform.location
+        vehicles = self._world.get_actors().filter('vehicle.*')
+        return all(x.get_location().distance(location) >= SPAWN_CLEARANCE for x in vehicles)
+
+    def take_vehicle(self, transform: carla.Transform) -> Optional[carla.Vehicle]:
+        '''None if no vehicle is free or the spot is occupied, as spawn_actor fails there;
+        a teleported vehicle would overlap the one at the spot'''
+        if len(self._free_vehicles) == 0 or not self.is_free(transform):
+            return None
+
+        vehicle = self._free_vehicles.pop(random.randrange(len(self._free_vehicles)))
+        self._parked.discard(vehicle.id)
+
+        commands: List['Command'] = [
+            carla.command.ApplyTransform(vehicle.id, transform),
+            carla.command.SetSimulatePhysics(vehicle.id, True),
+            carla.command.ApplyTargetVelocity(vehicle.id, carla.Vector3D()),
+            carla.command.SetAutopilot(vehicle.id, True, self._batch.tm_port),
+        ]
+        self._batch.apply(commands)
+
+        return vehicle
+
+    def take_prop(self, name: str, transform: carla.Transform) -> Optional[carla.Actor]:
+        prop = self._free_props.pop(name, None)
+        if prop is None:
+            return None
+        self._parked.discard(prop.id)
+
+        self._batch.apply([carla.command.ApplyTransform(prop.id, transform)])
+
+        return prop
+
+    def release(self, actors: Iterable[carla.Actor]) -> List[carla.Actor]:
+        '''Parks the pooled actors, returns the actors that do not belong to the pool'''
+        others: List[carla.Actor] = []
+        commands: List['Command'] = []
+
+        for actor in actors:
+            if not self.owns(actor):
+                others.append(actor)
+                continue
+
+            if actor.type_id.startswith('vehicle.'):
+                commands += [
+                    carla.command.SetAutopilot(actor.id, False, self._batch.tm_port),
+                    carla.command.SetSimulatePhysics(actor.id, False),
+                    carla.command.ApplyTargetVelocity(actor.id, carla.Vector3D()),
+                ]
+                self._free_vehicles.append(cast(carla.Vehicle, actor))
+            else:
+                self._free_props[ActorPool._get_prop_name(actor)] = actor
+
+            commands.append(carla.command.ApplyTransform(actor.id, self._parking[actor.id]))
+            self._parked.add(actor.id)
+
+        self._batch.apply(commands)
+
+        return others
+
+    def clear(self) -> None:
+        self._batch.destroy(self._actors.values())
+
+        self._actors.clear()
+        self._parking.clear()
+        self._free_vehicles.clear()
+        self._free_props.clear()
+        self._parked.clear()
+
+    # Internal
+
+    def _get_vehicle_blueprints(self) -> List[Tuple[carla.ActorBlueprint, Optional[str]]]:
+        '''Each copy of a blueprint gets its own random color'''
+        blueprints = self._vehicle_factory.get_traffic_blueprints()
+        return [(bp, self._vehicle_factory.pick_color(bp)) for _ in range(VEHICLES_PER_BLUEPRINT) for bp in blueprints]
+
+    @staticmethod
+    def _get_parking_slot(index: int) -> carla.Transform:
+        location = carla.Location(
+            x = PARKING_LOCATION.x + index * PARKING_SLOT_SPACING,
+            y = PARKING_LOCATION.y,
+            z = PARKING_LOCATION.z)
+        return carla.Transform(location, carla.Rotation())
+
+    @staticmethod
+    def _get_prop_name(prop: carla.Actor) -> str:
+        return prop.type_id.split('.')[2]
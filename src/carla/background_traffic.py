@@ -0,0 +1,184 @@
+import math
+import random
+import carla
+
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from src.carla.vehicle_factory import VehicleFactory
+from src.carla.map_cache import MapCache
+
+if TYPE_CHECKING:
+    from carla_command import Command
+    from src.carla.actor_pool import ActorPool
+
+UPDATE_INTERVAL = 15                # frames between updates, 0.5 s at 30 FPS
+MAX_SPAWNS_PER_UPDATE = 4           # bounds the per-update server work
+MAX_RECYCLES_PER_UPDATE = 4
+
+RADIUS = 150.0                      # meters, vehicles further away are recycled
+MAX_DISTANCE_BEHIND = 100.0         # meters along the ego car heading
+MAX_DISTANCE_AHEAD = 150.0
+MIN_SPAWN_DISTANCE_AHEAD = 40.0     # so that the driver does not see vehicles popping up
+MIN_SPAWN_GAP = 10.0                # meters between a spawn point and any vehicle
+
+GRID_CELL_SIZE = 50.0               # meters
+
+Point = Tuple[float, float]
+
+class SpawnPointIndex:
+    '''Spawn points bucketed into a grid, so that only the cells around the ego car are scanned'''
+    def __init__(self, spawn_points: List[carla.Transform]) -> None:
+        self._cells: Dict[Tuple[int, int], List[carla.Transform]] = dict()
+        for transform in spawn_points:
+            cell = SpawnPointIndex._cell(transform.location.x, transform.location.y)
+            self._cells.setdefault(cell, []).append(transform)
+
+    def __len__(self) -> int:
+        return sum([len(x) for x in self._cells.values()])
+
+    def query(self, x: float, y: float, radius: float) -> List[carla.Transform]:
+        cx0, cy0 = SpawnPointIndex._cell(x - radius, y - radius)
+        cx1, cy1 = SpawnPointIndex._cell(x + radius, y + radius)
+
+        result: List[carla.Transform] = []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                for transform in self._cells.get((cx, cy), []):
+                    loc = transform.location
+                    if (loc.x - x)**2 + (loc.y - y)**2 <= radius * radius:
+                        result.append(transform)
+
+        return result
+
+    # Internal
+
+    @staticmethod
+    def _cell(x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / GRID_CELL_SIZE), math.floor(y / GRID_CELL_SIZE)
+
+class BackgroundTraffic:
+    '''
+    Keeps the number of background vehicles around the ego car close to the budget.
+    Vehicles that fall far behind or ahead are teleported to spawn points ahead of the driver,
+    and the missing ones are spawned there. Both operations are batched.
+    '''
+    def __init__(self,
+                 world: carla.World,
+                 vehicle_factory: VehicleFactory,
+                 budget: int,
+                 actor_pool: Optional['ActorPool'] = None) -> None:
+        self.budget = budget
+        self.vehicles: Dict[int, carla.Vehicle] = dict()
+
+        self._world = world
+        self._actor_pool = actor_pool       # its parked vehicles do not occupy the spawn points
+
+        self._vehicle_factory = vehicle_factory
+        self._batch = vehicle_factory.actor_batch
+        self._spawn_points = SpawnPointIndex(MapCache.get(MapCache.get_map(world)).get_spawn_transforms())
+        self._frame = 0
+
+        print(f'CBT: budget is {budget} vehicles, {len(self._spawn_points)} spawn points are indexed')
+
+    def tick(self,
+             world_snapshot: carla.WorldSnapshot,
+             ego_car_snapshot: carla.ActorSnapshot) -> None:
+        self._frame += 1
+        if self._frame % UPDATE_INTERVAL != 0:
+            return
+
+        ego_car_transform = ego_car_snapshot.get_transform()
+        ego_car_location = ego_car_transform.location
+        yaw = math.radians(ego_car_transform.rotation.yaw)
+        heading = (math.cos(yaw), math.sin(yaw))
+
+        far: List[carla.Vehicle] = []
+
+        for id in list(self.vehicles.keys()):
+            if not world_snapshot.has_actor(id):
+                del self.vehicles[id]       # destroyed by somebody else
+                continue
+
+            loc = world_snapshot.find(id).get_transform().location
+            if not BackgroundTraffic._is_inside((loc.x, loc.y), ego_car_location, heading):
+                far.append(self.vehicles[id])
+
+        far = far[:MAX_RECYCLES_PER_UPDATE]
+        missing = min(self.budget - len(self.vehicles), MAX_SPAWNS_PER_UPDATE)
+        if len(far) == 0 and missing <= 0:
+            return
+
+        # the recycled vehicles are teleported without a collision check, so every vehicle in the world counts:
+        # the ego car, the scenario cars and the cars taken from the pool
+        occupied = self._get_occupied(world_snapshot)
+
+        spawn_points = self._find_spawn_points(ego_car_location, heading, occupied, len(far) + max(missing, 0))
+
+        recycled = list(zip(far, spawn_points))
+        if len(recycled) > 0:
+            self._recycle(recycled)
+
+        spawn_points = spawn_points[len(recycled):]
+        if len(spawn_points) > 0:
+            vehicles = self._vehicle_factory.make_vehicles(spawn_points)
+            self._vehicle_factory.configure_traffic_vehicles(vehicles)
+            for vehicle in vehicles:
+                self.vehicles[vehicle.id] = vehicle
+
+    def clear(self) -> None:
+        self._batch.destroy(self.vehicles.values())
+        self.vehicles.clear()
+
+    # Internal
+
+    def _get_occupied(self, world_snapshot: carla.WorldSnapshot) -> List[Point]:
+        occupied: List[Point] = []
+        for vehicle in self._world.get_actors().filter('vehicle.*'):
+            if self._actor_pool and self._actor_pool.is_parked(vehicle.id):
+                continue
+            if not world_snapshot.has_actor(vehicle.id):
+                continue        # spawned after the snapshot
+            loc = world_snapshot.find(vehicle.id).get_transform().location
+            occupied.append((loc.x, loc.y))
+        return occupied
+
+    def _find_spawn_points(self,
+                           ego_car_location: carla.Location,
+                           heading: Point,
+                           occupied: List[Point],
+                           count: int) -> List[carla.Transform]:
+        candidates = [x for x in self._spawn_points.query(ego_car_location.x, ego_car_location.y, RADIUS) if
+                      MIN_SPAWN_DISTANCE_AHEAD <= BackgroundTraffic._distance_along((x.location.x, x.location.y), ego_car_location, heading) <= MAX_DISTANCE_AHEAD]
+        random.shuffle(candidates)
+
+        result: List[carla.Transform] = []
+        for transform in candidates:
+            if len(result) == count:
+                break
+
+            point = (transform.location.x, transform.location.y)
+            if all([(point[0] - x)**2 + (point[1] - y)**2 > MIN_SPAWN_GAP**2 for x, y in occupied]):
+                result.append(transform)
+                occupied.append(point)
+
+        return result
+
+    def _recycle(self, recycled: List[Tuple[carla.Vehicle, carla.Transform]]) -> None:
+        ApplyTransform = carla.command.ApplyTransform
+        ApplyTargetVelocity = carla.command.ApplyTargetVelocity
+
+        commands: List['Command'] = [ApplyTransform(vehicle.id, transform) for vehicle, transform in recycled]
+        commands += [ApplyTargetVelocity(vehicle.id, carla.Vector3D()) for vehicle, _ in recycled]
+        self._batch.apply(commands)
+
+    @staticmethod
+    def _distance_along(point: Point, origin: carla.Location, heading: Point) -> float:
+        return (point[0] - origin.x) * heading[0] + (point[1] - origin.y) * heading[1]
+
+    @staticmethod
+    def _is_inside(point: Point, origin: carla.Location, heading: Point) -> bool:
+        along = BackgroundTraffic._distance_along(point, origin, heading)
+        if along < -MAX_DISTANCE_BEHIND or along > MAX_DISTANCE_AHEAD:
+            return False
+
+        return (point[0] - origin.x)**2 + (point[1] - origin.y)**2 <= RADIUS * RADIUS
@@ -0,0 +1,94 @@
+import threading
+import time
+import carla
+
+from typing import Optional, Dict, List
+
+PASSENGE_CARS = [
+    'vehicle.audi.a2',
+    'vehicle.audi.etron',
+    'vehicle.audi.tt',
+    'vehicle.bmw.grandtourer',
+    'vehicle.chevrolet.impala',
+    'vehicle.citroen.c3',
+    'vehicle.dodge.charger_2020',
+    'vehicle.dodge.charger_police',
+    'vehicle.dodge.charger_police_2020',
+    'vehicle.ford.crown',
+    'vehicle.ford.mustang',
+    'vehicle.jeep.wrangler_rubicon',
+    'vehicle.lincoln.mkz_2017',
+    'vehicle.lincoln.mkz_2020',
+    'vehicle.mercedes.coupe',
+    'vehicle.mercedes.coupe_2020',
+    'vehicle.micro.microlino',
+    'vehicle.mini.cooper_s',
+    'vehicle.mini.cooper_s_2021',
+    'vehicle.nissan.micra',
+    'vehicle.nissan.patrol',
+    'vehicle.nissan.patrol_2021',
+    'vehicle.seat.leon',
+    'vehicle.tesla.model3',
+    'vehicle.toyota.prius',
+    'vehicle.tesla.cybertruck',
+]
+
+CAMERA = 'sensor.camera.rgb'
+PROP_PREFIX = 'static.prop.'
+
+class BlueprintCache:
+    '''
+    The blueprint library is fetched from the server once per world, and
+    the blueprints used for spawning are sorted out in advance:
+    - passenger cars with the recommended colors
+    - props by their short name (as in DriverTask.TARGETS)
+    - the camera
+
+    The blueprints are shared by all callers and must be treated as read-only:
+    the attributes of a spawn, such as the color, are set right before the spawn command is made from it
+
+        cache = BlueprintCache.get(world)
+        bp = cache.props['slide']
+    '''
+    _instance: Optional['BlueprintCache'] = None
+    _lock = threading.Lock()      # the cache is filled from the startup threads
+
+    def __init__(self, world: carla.World) -> None:
+        start = time.perf_counter()
+
+        self.world_id = world.id
+
+        library = world.get_blueprint_library()
+        self._blueprints: Dict[str, carla.ActorBlueprint] = { bp.id: bp for bp in library }
+
+        self.passenger_cars = [
+            bp for bp in self._blueprints.values() if
+                bp.id in PASSENGE_CARS
+                and bp.has_attribute('number_of_wheels')
+                and int(bp.get_attribute('number_of_wheels')) == 4
+        ]
+        self.colors: Dict[str, List[str]] = {
+            bp.id: bp.get_attribute('color').recommended_values for bp in self._blueprints.values() if
+                bp.id.startswith('vehicle.') and bp.has_attribute('color')
+        }
+        self.props: Dict[str, carla.ActorBlueprint] = {
+            bp.id[len(PROP_PREFIX):]: bp for bp in self._blueprints.values() if bp.id.startswith(PROP_PREFIX)
+        }
+        self.camera = self._blueprints.get(CAMERA)
+
+        print(f'CBC: {len(self._blueprints)} blueprints are cached in {1000 * (time.perf_counter() - start):.0f} ms')
+
+    @staticmethod
+    def get(world: carla.World) -> 'BlueprintCache':
+        # a new world id means the map was (re)loaded and the blueprints must be fetched again
+        with BlueprintCache._lock:
+            if BlueprintCache._instance is None or BlueprintCache._instance.world_id != world.id:
+                BlueprintCache._instance = BlueprintCache(world)
+            return BlueprintCache._instance
+
+    @staticmethod
+    def invalidate() -> None:
+        BlueprintCache._instance = None
+
+    def find(self, id: str) -> Optional[carla.ActorBlueprint]:
+        return self._blueprints.get(id)
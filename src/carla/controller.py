@@ -5,6 +5,9 @@ from typing import Optional
 
 from src.carla.environment import CarlaEnvironment
 from src.carla.vehicle_factory import VehicleFactory
+from src.carla.actor_pool import ActorPool
+from src.carla.blueprint_cache import BlueprintCache
+from src.carla.map_cache import MapCache, WAYPOINT_DISTANCE
 
 DISPLAY_X = 0.9
 DISPLAY_Y = 0.07
@@ -15,12 +18,15 @@ DISPLAY_ACTOR_INFO_COLOR = carla.Color(0, 255, 255)
 DISPLAY_EGOCAR_INFO_COLOR = carla.Color(255, 255, 0)
 DISPLAY_EXP_INFO_COLOR = carla.Color(255, 128, 128)
 
+PRINTED_WAYPOINT_DISTANCE = 5.0     # meters between the printed waypoints
+
 class CarlaController:
-    def __init__(self, world: carla.World) -> None:
+    def __init__(self, world: carla.World, actor_pool: Optional[ActorPool] = None) -> None:
         self.world = world
         self.debug = world.debug
+        self.actor_pool = actor_pool
 
-        self._map = self.world.get_map()        
+        self._map = MapCache.get_map(self.world)
         self._info: Optional[str] = None
     
     # Info display
@@ -82,7 +88,7 @@ class CarlaController:
             if vehicle_waypoint is None or abs(ego_car_waypoint.lane_id) == abs(vehicle_waypoint.lane_id):
                 continue
             
-            vehicle = vehicle_factory.make_vehicle(False, vehicle_transform)
+            vehicle = self._make_vehicle(vehicle_factory, vehicle_transform)
             
         vehicle_factory.configure_traffic_vehicle(vehicle)
             
@@ -129,7 +135,7 @@ class CarlaController:
         # printInfo('VN', new_vehicle_waypoint)
         
         vehicle_transform = carla.Transform(vehicle_location, new_vehicle_waypoint.transform.rotation)
-        vehicle = vehicle_factory.make_vehicle(False, vehicle_transform)
+        vehicle = self._make_vehicle(vehicle_factory, vehicle_transform)
         
         if vehicle:
             vehicle_factory.configure_traffic_vehicle(vehicle)
@@ -181,19 +187,22 @@ class CarlaController:
     
     def print_spawn_points(self) -> None:
         output = open('logs/spawns.txt', 'w')
-        output.writelines([f'{p.location.x}\t{p.location.y}\n' for p in self._map.get_spawn_points()])
+        output.writelines([f'{p["x"]}\t{p["y"]}\n' for p in MapCache.get(self._map).spawn_points])
     def print_landmarks(self) -> None:
         output = open('logs/landmarks.txt', 'w')
-        output.writelines([f'{p.transform.location.x}\t{p.transform.location.y}\n' for p in self._map.get_all_landmarks()])
+        output.writelines([f'{p["x"]}\t{p["y"]}\n' for p in MapCache.get(self._map).landmarks])
     def print_lights(self) -> None:
         output = open('logs/lights.txt', 'w')
         output.writelines([f'{p.location.x}\t{p.location.y}\n' for p in self.world.get_lightmanager().get_all_lights()])
     def print_map_topology(self) -> None:
         output = open('logs/topology.txt', 'w')
-        output.writelines([f'{p[0].transform.location.x}\t{p[0].transform.location.y}\n' for p in self._map.get_topology()])
+        output.writelines([f'{p["x0"]}\t{p["y0"]}\n' for p in MapCache.get(self._map).topology])
     def print_waypoints(self) -> None:
         output = open('logs/waypoints.txt', 'w')
-        output.writelines([f'{p.transform.location.x}\t{p.transform.location.y}\n' for p in self._map.generate_waypoints(5)])
+        waypoints = MapCache.get(self._map).waypoints
+        # the cached table is denser; one of its waypoints falls in every PRINTED_WAYPOINT_DISTANCE of a lane
+        waypoints = waypoints[waypoints['s'] % PRINTED_WAYPOINT_DISTANCE < WAYPOINT_DISTANCE]
+        output.writelines([f'{p["x"]}\t{p["y"]}\n' for p in waypoints])
     def print_closest_waypoint(self, object: Optional[carla.ActorSnapshot]) -> None:
         if object:
             output = open('logs/custom.txt', 'a')
@@ -214,6 +223,17 @@ class CarlaController:
     # Internal
     
     def _create_target(self, name: str, transform: carla.Transform) -> Optional[carla.Actor]:
-        bp = self.world.get_blueprint_library().find(f'static.prop.{name}')
+        if self.actor_pool:
+            target = self.actor_pool.take_prop(name, transform)
+            if target:
+                return target
+            
+        bp = BlueprintCache.get(self.world).props.get(name)
         return self.world.spawn_actor(bp, transform) if bp is not None else None
-    
\ No newline at end of file
+
+    def _make_vehicle(self, vehicle_factory: VehicleFactory, transform: carla.Transform) -> Optional[carla.Vehicle]:
+        if self.actor_pool and self.actor_pool.has_free_vehicles():
+            # None if the spot is occupied, then the callers try another spot
+            return self.actor_pool.take_vehicle(transform)
+            
+        return vehicle_factory.make_vehicle(False, transform)
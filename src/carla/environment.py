@@ -1,5 +1,4 @@
 import math
-# import random
 import carla
 
 from typing import Callable, Optional
@@ -7,6 +6,7 @@ from typing import Callable, Optional
 # from src.carla.vehicle_factory import VehicleFactory
 
 from src.offset import Offset
+from src.carla.blueprint_cache import BlueprintCache
 
 
 class CarlaEnvironment:
@@ -84,6 +84,7 @@ class CarlaEnvironment:
                 available_maps = self.client.get_available_maps()
                 if desired_map_name in available_maps:
                     world = self.client.load_world(f'Town{town_id}')
+                    BlueprintCache.invalidate()
                 else:
                     only_basic: Callable[[str], bool] = lambda map: not map.endswith('_Opt')
                     basic_maps = [map.split('/').pop()[4:] for map in filter(only_basic, available_maps)]
@@ -95,25 +96,6 @@ class CarlaEnvironment:
 
     # Unused, but may be useful in future
     
-    # def create_traffic(self,
-    #                    vehicle_factory: VehicleFactory,
-    #                    max_count: int) -> None:
-    #     world = self.client.get_world()
-    #     spawn_points = world.get_map().get_spawn_points()
-    #     random.shuffle(spawn_points)
-        
-    #     vehicles = world.get_actors().filter('vehicle.*')
-    #     if len(vehicles) >= (max_count + 1):
-    #         return
-        
-    #     for n, transform in enumerate(spawn_points):
-    #         if n == max_count:
-    #             break
-    #         other_car = vehicle_factory.make_vehicle(False, transform)
-    #         if other_car:
-    #             vehicle_factory.configure_traffic_vehicle(other_car)
-    #             print(f'CEV: spawned {other_car.type_id} [#{n+1}]')
-                
     # def add_traffic(self,
     #                 vehicle_factory: VehicleFactory,
     #                 max_count: int) -> None:
@@ -0,0 +1,185 @@
+import hashlib
+import os
+import threading
+import time
+import carla
+
+from typing import Optional, Dict, List, Tuple, Any
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('numpy is not installed')
+
+CACHE_FOLDER = 'cache/maps'
+WAYPOINT_DISTANCE = 2.0     # meters between the waypoints of the dense table
+
+TRANSFORM_DTYPE = np.dtype([
+    ('x', np.float32), ('y', np.float32), ('z', np.float32),
+    ('pitch', np.float32), ('yaw', np.float32), ('roll', np.float32),
+])
+SEGMENT_DTYPE = np.dtype([
+    ('x0', np.float32), ('y0', np.float32), ('z0', np.float32),
+    ('x1', np.float32), ('y1', np.float32), ('z1', np.float32),
+])
+WAYPOINT_DTYPE = np.dtype([
+    ('x', np.float32), ('y', np.float32), ('z', np.float32), ('yaw', np.float32),
+    ('s', np.float32),
+    ('road_id', np.int32), ('section_id', np.int32), ('lane_id', np.int16),
+    ('lane_width', np.float32), ('lane_type', np.int32), ('lane_change', np.int8),
+    ('is_junction', np.bool_),
+])
+LANDMARK_DTYPE = np.dtype([
+    ('x', np.float32), ('y', np.float32), ('z', np.float32), ('yaw', np.float32),
+    ('id', 'U16'), ('name', 'U32'), ('type', 'U16'), ('sub_type', 'U16'),
+    ('value', np.float32), ('unit', 'U8'), ('road_id', np.int32), ('s', np.float32),
+])
+
+class MapCache:
+    '''
+    Map geometry stored on disk as NumPy arrays, one file per map name and OpenDRIVE content.
+    The file is built once (map.py does it after loading the map), and then every process
+    loads it in milliseconds instead of querying and generating the geometry again
+
+        cache = MapCache.get(world.get_map())
+        xs, ys = cache.spawn_points['x'], cache.spawn_points['y']
+
+    The map object itself is also kept per world, as every world.get_map() call
+    transfers and parses the whole OpenDRIVE file again, and so is its cache filename,
+    as the OpenDRIVE content is hashed only on the first lookup
+    '''
+    _instances: Dict[str, 'MapCache'] = dict()
+    _maps: Dict[int, carla.Map] = dict()
+    _filenames: Dict[int, Tuple[carla.Map, str]] = dict()     # by id(carla_map); the map is kept so that its id is not reused
+    _lock = threading.Lock()      # the caches are filled from the startup threads
+
+    def __init__(self,
+                 name: str,
+                 spawn_points: Any,
+                 topology: Any,
+                 waypoints: Any,
+                 landmarks: Any) -> None:
+        self.name = name
+        self.spawn_points = spawn_points
+        self.topology = topology
+        self.waypoints = waypoints
+        self.landmarks = landmarks
+
+    @staticmethod
+    def get(carla_map: carla.Map) -> 'MapCache':
+        filename = MapCache.get_filename(carla_map)
+
+        with MapCache._lock:
+            cache = MapCache._instances.get(filename)
+            if cache is None:
+                cache = MapCache.load(filename)
+                if cache is None:
+                    cache = MapCache.build(carla_map)
+                    cache.save(filename)
+                MapCache._instances[filename] = cache
+
+        return cache
+
+    @staticmethod
+    def get_map(world: carla.World) -> carla.Map:
+        with MapCache._lock:
+            carla_map = MapCache._maps.get(world.id)
+            if carla_map is None:
+                start = time.perf_counter()
+                carla_map = world.get_map()
+                MapCache._maps[world.id] = carla_map
+                print(f'CMC: received {carla_map.name} in {1000 * (time.perf_counter() - start):.0f} ms')
+
+        return carla_map
+
+    @staticmethod
+    def get_filename(carla_map: carla.Map) -> str:
+        with MapCache._lock:
+            entry = MapCache._filenames.get(id(carla_map))
+            if entry is None:
+                digest = hashlib.sha1(carla_map.to_opendrive().encode()).hexdigest()[:12]
+                name = carla_map.name.split('/').pop()
+                entry = (carla_map, f'{CACHE_FOLDER}/{name}_{digest}.npz')
+                MapCache._filenames[id(carla_map)] = entry
+
+        return entry[1]
+
+    @staticmethod
+    def load(filename: str) -> Optional['MapCache']:
+        if not os.path.exists(filename):
+            return None
+
+        start = time.perf_counter()
+        try:
+            with np.load(filename) as data:
+                cache = MapCache(
+                    str(data['name']),
+                    data['spawn_points'],
+                    data['topology'],
+                    data['waypoints'],
+                    data['landmarks'])
+        except Exception as ex:
+            print(f'CMC: cannot load {filename}: {ex}')
+            return None
+
+        print(f'CMC: loaded {filename} in {1000 * (time.perf_counter() - start):.0f} ms')
+        return cache
+
+    @staticmethod
+    def build(carla_map: carla.Map) -> 'MapCache':
+        start = time.perf_counter()
+
+        spawn_points = np.array([MapCache._transform_row(x) for x in carla_map.get_spawn_points()], dtype = TRANSFORM_DTYPE)
+
+        topology = np.array([
+            (a.transform.location.x, a.transform.location.y, a.transform.location.z,
+             b.transform.location.x, b.transform.location.y, b.transform.location.z) for a, b in carla_map.get_topology()
+        ], dtype = SEGMENT_DTYPE)
+
+        waypoints = np.array([
+            (wp.transform.location.x, wp.transform.location.y, wp.transform.location.z, wp.transform.rotation.yaw,
+             wp.s, wp.road_id, wp.section_id, wp.lane_id,
+             wp.lane_width, int(wp.lane_type), int(wp.lane_change), wp.is_junction) for wp in carla_map.generate_waypoints(WAYPOINT_DISTANCE)
+        ], dtype = WAYPOINT_DTYPE)
+
+        landmarks = np.array([
+            (lm.transform.location.x, lm.transform.location.y, lm.transform.location.z, lm.transform.rotation.yaw,
+             lm.id, lm.name, lm.type, lm.sub_type, lm.value, lm.unit, lm.road_id, lm.s) for lm in carla_map.get_all_landmarks()
+        ], dtype = LANDMARK_DTYPE)
+
+        print(f'CMC: built the cache of {carla_map.name} in {1000 * (time.perf_counter() - start):.0f} ms')
+
+        return MapCache(carla_map.name, spawn_points, topology, waypoints, landmarks)
+
+    def save(self, filename: str) -> None:
+        folder = os.path.dirname(filename)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+
+        # the file is written under a temporary name first, so that the processes
+        # starting simultaneously never read a half-written file
+        temp_filename = f'{filename}.{os.getpid()}.tmp'
+        with open(temp_filename, 'wb') as f:
+            np.savez(f,
+                     name = np.array(self.name),
+                     spawn_points = self.spawn_points,
+                     topology = self.topology,
+                     waypoints = self.waypoints,
+                     landmarks = self.landmarks)
+        os.replace(temp_filename, filename)
+
+        print(f'CMC: saved {filename}')
+
+    def get_spawn_transforms(self) -> List[carla.Transform]:
+        return [carla.Transform(
+                    carla.Location(float(p['x']), float(p['y']), float(p['z'])),
+                    carla.Rotation(float(p['pitch']), float(p['yaw']), float(p['roll'])))
+                for p in self.spawn_points]
+
+    # Internal
+
+    @staticmethod
+    def _transform_row(transform: carla.Transform) -> Any:
+        loc = transform.location
+        rot = transform.rotation
+        return (loc.x, loc.y, loc.z, rot.pitch, rot.yaw, rot.roll)
@@ -2,15 +2,22 @@ import carla
 import math
 import sys
 
-from typing import Optional, Tuple, List, cast
+from typing import Optional, Tuple, List, cast, TYPE_CHECKING
 
 from src.carla.traffic_state import TrafficState
 from src.carla.lane import Lane
+from src.carla.map_cache import MapCache
+
+if TYPE_CHECKING:
+    from src.carla.actor_pool import ActorPool
+
+MAX_HEIGHT_DIFFERENCE = 20.0    # meters; the vehicles parked under the map by ActorPool are far below
 
 class CarlaMonitor:
-    def __init__(self, world: carla.World) -> None:
+    def __init__(self, world: carla.World, actor_pool: Optional['ActorPool'] = None) -> None:
         self._world = world
-        self._map = self._world.get_map()
+        self._actor_pool = actor_pool       # its parked vehicles are under the map, not in the traffic
+        self._map = MapCache.get_map(self._world)
         self._traffic_state = TrafficState()
         
     def get_nearest_vehicle_behind(self, ego_car_snapshot: carla.ActorSnapshot) -> Tuple[Optional[carla.Vehicle], float, Optional[str]]:
@@ -25,16 +32,20 @@ class CarlaMonitor:
         self._traffic_state.ego_car_lane_props = self._get_lane_props(ego_car_snapshot)
 
         for vehicle in vehicles:
+            if self._actor_pool and self._actor_pool.is_parked(vehicle.id):
+                continue
+
             transform = vehicle.get_transform()
             velocity = vehicle.get_velocity()
             
             is_approaching_from_behind, distance = CarlaMonitor._is_approaching_from_behind(transform, velocity, ego_car_snapshot)
             if is_approaching_from_behind:
-                lane = self.get_lane(ego_car_snapshot, vehicle)
-                self._traffic_state.update(distance, lane)
+                vehicle_lane = self.get_lane(ego_car_snapshot, vehicle)
+                self._traffic_state.update(distance, vehicle_lane)
                 if distance < min_distance:
                     min_distance = distance
                     car = vehicle
+                    lane = vehicle_lane
 
         self._traffic_state.log()
 
@@ -76,6 +87,10 @@ class CarlaMonitor:
         dist = math.sqrt((l1.x - l2.x)**2 + (l1.y - l2.y)**2)
         if dist < 1:    # this is ego car, ignore it
             return False, 0
+
+        # a vehicle parked by the pool of the primary mirror, also for the mirrors that do not have the pool
+        if abs(l1.z - l2.z) > MAX_HEIGHT_DIFFERENCE:
+            return False, 0
         
         if distance and abs(dist - distance) > 0.5:
             return False, 0
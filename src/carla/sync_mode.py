@@ -24,9 +24,11 @@ class CarlaSyncMode(object):
                  world: carla.World,
                  fps: int = 30,
                  ticks: bool = False,       # only one client can call world.tick()
-                 *sensors: carla.Sensor):
+                 *sensors: carla.Sensor,
+                 traffic_manager: Optional[carla.TrafficManager] = None):
         self._world = world
         self._sensors = sensors
+        self._traffic_manager = traffic_manager if ticks else None      # it must tick together with the world
         
         self._delta_seconds = 1.0 / fps
         self._can_tick_world = ticks
@@ -40,6 +42,9 @@ class CarlaSyncMode(object):
                 no_rendering_mode = False,
                 synchronous_mode = True,
                 fixed_delta_seconds = self._delta_seconds))
+            
+        if self._traffic_manager:
+            self._traffic_manager.set_synchronous_mode(True)
 
         def make_queue(register_event: Callable[[Callable[[QueryResult], None]], Any]) -> None:
             q: Queue[QueryResult] = Queue()
@@ -53,6 +58,9 @@ class CarlaSyncMode(object):
         return self
     
     def __exit__(self, *sensors: Tuple[carla.Sensor]):
+        if self._traffic_manager:
+            self._traffic_manager.set_synchronous_mode(False)
+            
         if self._can_tick_world:
             self._world.apply_settings(self._settings)
 
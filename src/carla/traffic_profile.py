@@ -0,0 +1,28 @@
+import carla
+
+from typing import Optional
+
+class TrafficProfile:
+    '''
+    Traffic manager settings that allow running more vehicles at the same FPS:
+    - vehicles further than the hybrid physics radius from the ego car are moved
+      by the traffic manager without the physics simulation
+    - the random device seed makes the traffic reproducible between the runs;
+      without it, the traffic manager picks its own seed and the traffic differs
+    The synchronous mode of the traffic manager is switched by CarlaSyncMode
+    '''
+    def __init__(self,
+                 hybrid_physics_radius: Optional[float] = None,
+                 seed: Optional[int] = None) -> None:
+        self.hybrid_physics_radius = hybrid_physics_radius
+        self.seed = seed
+
+    def apply(self, traffic_manager: carla.TrafficManager) -> None:
+        if self.hybrid_physics_radius is not None:
+            traffic_manager.set_hybrid_physics_mode(True)
+            traffic_manager.set_hybrid_physics_radius(self.hybrid_physics_radius)
+            print(f'CTP: hybrid physics within {self.hybrid_physics_radius:.0f} m')
+
+        if self.seed is not None:
+            traffic_manager.set_random_device_seed(self.seed)
+            print(f'CTP: random seed is {self.seed}')
@@ -5,8 +5,8 @@ from src.exp.logging import TrafficLogger
 from src.exp.scenario import DISTANCES
 
 class ZONE_EDGE:
-    far = DISTANCES[2] - 5
-    mid = DISTANCES[1] - 5
+    far = DISTANCES[-1] - 5
+    mid = DISTANCES[-2] - 5
 
 class TrafficState:
     def __init__(self) -> None:
@@ -14,16 +14,6 @@ class TrafficState:
         self.ego_car_lane_props: Optional[Tuple[float, float]]
         
         self._logger = TrafficLogger()
-        self._logger.log(
-            'ec_pos_x',
-            'ec_pos_y',
-            'same_far',
-            'same_mid',
-            'same_close',
-            'next_far',
-            'next_mid',
-            'next_close'
-        )
         
     def reset(self) -> None:
         self._same_lane_far = 0
@@ -52,8 +42,8 @@ class TrafficState:
     def log(self) -> None:
         ec_pos_x, ec_pos_y = self.ego_car_lane_props if self.ego_car_lane_props else (0.0, 0.0) 
         self._logger.log(
-            f'{ec_pos_x:.3f}',
-            f'{ec_pos_y:.2f}',
+            ec_pos_x,
+            ec_pos_y,
             self._same_lane_far,
             self._same_lane_mid,
             self._same_lane_close,
@@ -1,37 +1,12 @@
 import random
-import time
 import carla
 
-from typing import Optional, Tuple, cast
-
-PASSENGE_CARS = [
-    'vehicle.audi.a2',
-    'vehicle.audi.etron',
-    'vehicle.audi.tt',
-    'vehicle.bmw.grandtourer',
-    'vehicle.chevrolet.impala',
-    'vehicle.citroen.c3',
-    'vehicle.dodge.charger_2020',
-    'vehicle.dodge.charger_police',
-    'vehicle.dodge.charger_police_2020',
-    'vehicle.ford.crown',
-    'vehicle.ford.mustang',
-    'vehicle.jeep.wrangler_rubicon',
-    'vehicle.lincoln.mkz_2017',
-    'vehicle.lincoln.mkz_2020',
-    'vehicle.mercedes.coupe',
-    'vehicle.mercedes.coupe_2020',
-    'vehicle.micro.microlino',
-    'vehicle.mini.cooper_s',
-    'vehicle.mini.cooper_s_2021',
-    'vehicle.nissan.micra',
-    'vehicle.nissan.patrol',
-    'vehicle.nissan.patrol_2021',
-    'vehicle.seat.leon',
-    'vehicle.tesla.model3',
-    'vehicle.toyota.prius',
-    'vehicle.tesla.cybertruck',
-]
+from typing import Optional, Tuple, List, cast
+
+from src.carla.actor_batch import ActorBatch, SpawnRequest
+from src.carla.traffic_profile import TrafficProfile
+from src.carla.blueprint_cache import BlueprintCache
+from src.carla.map_cache import MapCache
 
 MANUAL_EGO_CAR_TYPE = 'vehicle.dreyevr.egovehicle'
 AUTO_EGO_CAR_TYPE = 'vehicle.lincoln.mkz_2017'
@@ -39,18 +14,24 @@ AUTO_EGO_CAR_TYPE = 'vehicle.lincoln.mkz_2017'
 # EGO_CAR_TYPE = 'vehicle.audi.tt'
 # EGO_CAR_TYPE = 'vehicle.mercedes.coupe_2020'
 
+TICK_TIMEOUT = 1.0      # seconds; the server does not tick on its own if another client left it in the synchronous mode
+
 class VehicleFactory:
     
     ego_car_type: str
+    traffic_profile = TrafficProfile()      # set via set_traffic_profile
     
     def __init__(self, client: carla.Client) -> None:
         self.world = client.get_world()
         
         try:
             self.traffic_manager = client.get_trafficmanager()
+            VehicleFactory.traffic_profile.apply(self.traffic_manager)
         except:
             self.traffic_manager = None
             print(f'CVF: Traffic manager is not available')
+            
+        self.actor_batch = ActorBatch(client, self.traffic_manager.get_port() if self.traffic_manager else None)
         
     @staticmethod
     def set_driving_mode(is_manual_mode: bool):
@@ -59,58 +40,59 @@ class VehicleFactory:
         else:
             VehicleFactory.ego_car_type = AUTO_EGO_CAR_TYPE
             
+    @staticmethod
+    def set_traffic_profile(profile: TrafficProfile):
+        VehicleFactory.traffic_profile = profile
+            
     def get_ego_car(self) -> Tuple[carla.Vehicle, bool]:
-        time.sleep(1)   # small pause, othewise the world.get_actors() list is empty
+        # the actor list is empty until the client receives the first world tick
+        self._wait_for_tick()
         
-        vehicles = self.world.get_actors().filter(VehicleFactory.ego_car_type)
+        ego_car = self._find_ego_car()
+        if ego_car is not None:
+            print(f'CVF: Found a vehicle, attaching the mirror')
+            return (ego_car, False)
         
-        if (len(vehicles) == 0):
-            print(f'CVF: No vehicles found, spawining a new one')
-            vehicle: Optional[carla.Vehicle] = None
-            while vehicle is None:
-                vehicle = self.make_vehicle(True)
-                time.sleep(0.5)
-                
-            self.configure_ego_car(vehicle)
+        print(f'CVF: No vehicles found, spawining a new one')
+        vehicle: Optional[carla.Vehicle] = None
+        while vehicle is None:
+            vehicle = self.make_vehicle(True)
+            if vehicle is None:
+                # the spawn point is occupied, possibly by the ego car of another mirror
+                self._wait_for_tick()
+                ego_car = self._find_ego_car()
+                if ego_car is not None:
+                    print(f'CVF: Another mirror has spawned a vehicle, attaching the mirror')
+                    return (ego_car, False)
+        
+        # several mirrors may spawn an ego car each at the same time:
+        # all of them keep the one with the lowest id, and the others are destroyed
+        self._wait_for_tick()
+        ego_car = self._find_ego_car()
+        if ego_car is not None and ego_car.id != vehicle.id:
+            print(f'CVF: Another mirror has spawned a vehicle, attaching the mirror')
+            vehicle.destroy()
+            return (ego_car, False)
             
-            return (vehicle, True)
-        else:
-            print(f'CVF: Found a vehicle, attaching the mirror')
-            vehicle = cast(carla.Vehicle, vehicles[0])
-            return (vehicle, False)
+        self.configure_ego_car(vehicle)
+        
+        return (vehicle, True)
 
     def make_vehicle(self,
                      is_ego_car: bool,
                      transform: Optional[carla.Transform] = None) -> Optional[carla.Vehicle]:
-        vehicle_bp: Optional[carla.ActorBlueprint] = None
-        if is_ego_car:
-            vehicle_bp = self.world.get_blueprint_library().filter(VehicleFactory.ego_car_type)[0]
-            vehicle_bp.set_attribute('role_name', 'ego')
-        else:
-            vehicles_bps = self.world.get_blueprint_library().filter('vehicle.*')
-            vehicles_bps = [
-                bp for bp in vehicles_bps if 
-                    bp.id in PASSENGE_CARS
-                    and bp.has_attribute('number_of_wheels')
-                    and int(bp.get_attribute('number_of_wheels')) == 4
-            ]
-            vehicle_bp = random.choice(vehicles_bps)
-            
-            while vehicle_bp.id == VehicleFactory.ego_car_type:
-                vehicle_bp = random.choice(vehicles_bps)
+        vehicle_bp, color = self._get_vehicle_blueprint(is_ego_car)
         
         if transform is None:
-            spawn_points = self.world.get_map().get_spawn_points()
+            spawn_points = MapCache.get_map(self.world).get_spawn_points()
             if is_ego_car:
                 transform = spawn_points[0]       # ego-car appears always in the same location
             else:
                 transform = random.choice(spawn_points)
-            
-        if vehicle_bp.has_attribute('color'):
-            color = random.choice(vehicle_bp.get_attribute('color').recommended_values)
-            vehicle_bp.set_attribute('color', color)
 
         try:
+            if color is not None:
+                vehicle_bp.set_attribute('color', color)
             vehicle = cast(carla.Vehicle, self.world.spawn_actor(vehicle_bp, transform))
             vehicle.set_autopilot(True)
         except Exception as e:
@@ -119,19 +101,76 @@ class VehicleFactory:
         
         return vehicle
 
+    def make_vehicles(self,
+                      transforms: List[carla.Transform]) -> List[carla.Vehicle]:
+        # spawns all the traffic vehicles in a single batch; the locations that were occupied are skipped
+        requests: List[SpawnRequest] = []
+        for transform in transforms:
+            vehicle_bp, color = self._get_vehicle_blueprint(False)
+            requests.append((vehicle_bp, transform, color))
+        spawned = self.actor_batch.spawn(requests, autopilot = True)
+        return [cast(carla.Vehicle, x) for x in spawned if x is not None]
+
+    def get_traffic_blueprints(self) -> List[carla.ActorBlueprint]:
+        '''The cached blueprints, read-only; the color of each vehicle comes from pick_color'''
+        blueprints = BlueprintCache.get(self.world)
+        return [bp for bp in blueprints.passenger_cars if bp.id != VehicleFactory.ego_car_type]
+
+    def pick_color(self, vehicle_bp: carla.ActorBlueprint) -> Optional[str]:
+        '''A random recommended color, or None if the vehicle has no colors'''
+        colors = BlueprintCache.get(self.world).colors.get(vehicle_bp.id)
+        return random.choice(colors) if colors else None
+
     def configure_traffic_vehicle(self,
                                   vehicle: carla.Vehicle) -> None:
+        self.configure_traffic_vehicles([vehicle])
+
+    def configure_traffic_vehicles(self,
+                                   vehicles: List[carla.Vehicle]) -> None:
+        # the traffic manager has no batch commands, but its calls are local, so
+        # we only make sure all the vehicles spawned in a batch get configured before the next tick
         if self.traffic_manager:
-            self.traffic_manager.vehicle_percentage_speed_difference(vehicle, -25)
-            self.traffic_manager.ignore_lights_percentage(vehicle, 100)
-            self.traffic_manager.ignore_signs_percentage(vehicle, 100)
-            # self.traffic_manager.distance_to_leading_vehicle(vehicle, 10)
-            # self.traffic_manager.random_left_lanechange_percentage(vehicle, 20)
-            # self.traffic_manager.random_right_lanechange_percentage(vehicle, 20)
+            for vehicle in vehicles:
+                self.traffic_manager.vehicle_percentage_speed_difference(vehicle, -25)
+                self.traffic_manager.ignore_lights_percentage(vehicle, 100)
+                self.traffic_manager.ignore_signs_percentage(vehicle, 100)
+                # self.traffic_manager.distance_to_leading_vehicle(vehicle, 10)
+                # self.traffic_manager.random_left_lanechange_percentage(vehicle, 20)
+                # self.traffic_manager.random_right_lanechange_percentage(vehicle, 20)
 
     def configure_ego_car(self,
                    vehicle: carla.Vehicle) -> None:
         if self.traffic_manager:
             self.traffic_manager.ignore_lights_percentage(vehicle, 100)
             # self.traffic_manager.keep_right_rule_percentage(vehicle, 50)
-        
\ No newline at end of file
+
+    # Internal
+
+    def _wait_for_tick(self) -> None:
+        try:
+            self.world.wait_for_tick(TICK_TIMEOUT)
+        except RuntimeError:
+            pass
+        
+    def _find_ego_car(self) -> Optional[carla.Vehicle]:
+        vehicles = self.world.get_actors().filter(VehicleFactory.ego_car_type)
+        if len(vehicles) == 0:
+            return None
+        
+        return cast(carla.Vehicle, min(vehicles, key = lambda x: x.id))
+
+    def _get_vehicle_blueprint(self, is_ego_car: bool) -> Tuple[carla.ActorBlueprint, Optional[str]]:
+        '''The blueprint and its color, which is set when the vehicle is spawned'''
+        vehicle_bp: Optional[carla.ActorBlueprint] = None
+        if is_ego_car:
+            blueprints = BlueprintCache.get(self.world)
+            vehicle_bp = blueprints.find(VehicleFactory.ego_car_type)
+            if vehicle_bp is None:
+                raise IndexError(f'no blueprint {VehicleFactory.ego_car_type}')
+            # the traffic manager computes the hybrid physics radius around the "hero" vehicle
+            role_name = 'hero' if VehicleFactory.traffic_profile.hybrid_physics_radius is not None else 'ego'
+            vehicle_bp.set_attribute('role_name', role_name)
+        else:
+            vehicle_bp = random.choice(self.get_traffic_blueprints())
+            
+        return vehicle_bp, self.pick_color(vehicle_bp)
@@ -0,0 +1,158 @@
+import os
+import time
+
+from typing import Optional, Dict, Iterator, List, Tuple, Any
+
+from src.exp.log_reader import LogReader
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('numpy is not installed')
+
+KEY_LENGTH = 3          # logger type and two first values, like "scenario car approached"
+
+ENTRY_DTYPE = np.dtype([
+    ('session', np.int32),
+    ('key', np.int32),
+    ('offset', np.int64),           # of the line in the event log, bytes
+    ('timestamp', np.float64),
+    ('frame', np.int64),
+])
+
+class LogIndex:
+    '''
+    Index of event log lines by their key (the logger type and the first values).
+    Queries read only the matching lines from the logs. The index is rebuilt
+    only for the logs that were changed since it was saved:
+
+        index = LogIndex.build(event_logs, LogIndex.load('logs/index.npz'))
+        index.save('logs/index.npz')
+        for session, timestamp, frame, fields in index.query('scenario car approached'):
+            name, lane, distance = fields[3:]
+    '''
+    def __init__(self,
+                 sessions: List[str],
+                 sizes: Any,
+                 mtimes: Any,
+                 keys: List[str],
+                 entries: Any) -> None:
+        self.sessions = sessions
+        self.sizes = sizes
+        self.mtimes = mtimes
+        self.keys = keys
+        self.entries = entries
+
+    @staticmethod
+    def build(filenames: List[str], previous: Optional['LogIndex'] = None) -> 'LogIndex':
+        start = time.perf_counter()
+
+        key_ids: Dict[str, int] = dict()
+        parts: List[Any] = []
+        sizes: List[int] = []
+        mtimes: List[float] = []
+        scanned = 0
+
+        # the key ids of the previous index are mapped to the new ones
+        key_map = np.array([key_ids.setdefault(x, len(key_ids)) for x in previous.keys], dtype = np.int32) if previous else None
+
+        for session, filename in enumerate(filenames):
+            stat = os.stat(filename)
+            sizes.append(stat.st_size)
+            mtimes.append(stat.st_mtime)
+
+            previous_session = previous._find(filename, stat.st_size, stat.st_mtime) if previous else None
+            if previous is not None and previous_session is not None and key_map is not None:
+                rows = previous.entries[previous.entries['session'] == previous_session].copy()
+                if len(rows) > 0:
+                    rows['key'] = key_map[rows['key']]
+            else:
+                rows = LogIndex._scan(filename, key_ids)
+                scanned += 1
+
+            rows['session'] = session
+            parts.append(rows)
+
+        entries = np.concatenate(parts) if len(parts) > 0 else np.zeros(0, dtype = ENTRY_DTYPE)
+        keys = sorted(key_ids.keys(), key = lambda x: key_ids[x])
+
+        print(f'LIX: {len(entries)} lines of {len(filenames)} logs are indexed ({scanned} scanned) in {1000 * (time.perf_counter() - start):.0f} ms')
+
+        return LogIndex(filenames, np.array(sizes, dtype = np.int64), np.array(mtimes, dtype = np.float64), keys, entries)
+
+    @staticmethod
+    def load(filename: str) -> Optional['LogIndex']:
+        if not os.path.exists(filename):
+            return None
+
+        try:
+            with np.load(filename) as data:
+                return LogIndex(
+                    [str(x) for x in data['sessions']],
+                    data['sizes'],
+                    data['mtimes'],
+                    [str(x) for x in data['keys']],
+                    data['entries'])
+        except Exception as ex:
+            print(f'LIX: cannot load {filename}: {ex}')
+            return None
+
+    def save(self, filename: str) -> None:
+        folder = os.path.dirname(filename)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        with open(filename, 'wb') as f:
+            np.savez(f,
+                     sessions = np.array(self.sessions, dtype = str),
+                     sizes = self.sizes,
+                     mtimes = self.mtimes,
+                     keys = np.array(self.keys, dtype = str),
+                     entries = self.entries)
+
+    def get_keys(self, prefix: str = '') -> List[str]:
+        '''The keys that start with the given words'''
+        return [x for x in self.keys if prefix == '' or x == prefix or x.startswith(f'{prefix} ')]
+
+    def query(self, prefix: str) -> Iterator[Tuple[str, float, int, List[str]]]:
+        '''Yields the session, timestamp, frame and fields of the lines which keys start with the given words'''
+        key_ids = [self.keys.index(x) for x in self.get_keys(prefix)]
+        entries = self.entries[np.isin(self.entries['key'], key_ids)]
+        entries = entries[np.lexsort((entries['offset'], entries['session']))]
+
+        for session in np.unique(entries['session']):
+            filename = self.sessions[session]
+            with open(filename, 'rb') as f:
+                for entry in entries[entries['session'] == session]:
+                    f.seek(int(entry['offset']))
+                    parsed = LogReader.parse_event_line(f.readline().decode(errors = 'replace'))
+                    if parsed is not None:
+                        yield filename, float(entry['timestamp']), int(entry['frame']), parsed[2]
+
+    # Internal
+
+    def _find(self, filename: str, size: int, mtime: float) -> Optional[int]:
+        if filename not in self.sessions:
+            return None
+
+        session = self.sessions.index(filename)
+        if self.sizes[session] != size or self.mtimes[session] != mtime:
+            return None
+
+        return session
+
+    @staticmethod
+    def _scan(filename: str, key_ids: Dict[str, int]) -> Any:
+        rows: List[Tuple[int, int, int, float, int]] = []
+        offset = 0
+
+        with open(filename, 'rb') as f:
+            for line in f:
+                parsed = LogReader.parse_event_line(line.decode(errors = 'replace'))
+                if parsed is not None:
+                    timestamp, frame, fields = parsed
+                    key = ' '.join(fields[:KEY_LENGTH])
+                    rows.append((0, key_ids.setdefault(key, len(key_ids)), offset, timestamp, frame))
+                offset += len(line)
+
+        return np.array(rows, dtype = ENTRY_DTYPE)
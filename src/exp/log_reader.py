@@ -0,0 +1,142 @@
+import glob
+import heapq
+import os
+import re
+
+from datetime import datetime, timedelta
+from typing import Optional, Iterable, Iterator, List, Tuple
+
+from src.exp.logging import IMAGE_FOLDER
+from src.exp.traffic_log import TrafficLog
+
+Entry = Tuple[float, str, int, str]        # timestamp, source, frame (-1 if unknown), text
+
+SNAPSHOT_NAME = re.compile(r'^ss-(\d\d)-(\d\d)-(\d\d)(?:-(\d{3}))?(?:-(\d+))?-(.*)\.jpg$')
+
+class LogReader:
+    '''
+    Reads the event logs, traffic logs and snapshot folders of any number of sessions
+    as streams of entries, and merges them by the timestamp. The files are read line by line
+    (traffic logs are memory-mapped), so the memory used does not depend on the log sizes:
+
+        for timestamp, source, frame, text in LogReader.merge(LogReader.read_folders(['logs'])):
+            ...
+
+    All timestamps follow the convention of the event logs (see SessionClock.to_timestamp)
+    '''
+    @staticmethod
+    def find(folder: str) -> Tuple[List[str], List[str], List[str]]:
+        '''Returns the event logs, traffic logs and snapshot folders found in the folder and its subfolders'''
+        event_logs = sorted(glob.glob(f'{folder}/**/event_*.txt', recursive = True))
+        traffic_logs = sorted(glob.glob(f'{folder}/**/traffic_*.bin', recursive = True))
+
+        # the older text traffic logs, but not those converted from the binary logs
+        traffic_logs += [x for x in sorted(glob.glob(f'{folder}/**/traffic_*.txt', recursive = True)) if
+                         not os.path.exists(f'{os.path.splitext(x)[0]}.bin')]
+
+        snapshot_folders = sorted([x for x in glob.glob(f'{folder}/**/{IMAGE_FOLDER}/*', recursive = True) if os.path.isdir(x)])
+
+        return event_logs, traffic_logs, snapshot_folders
+
+    @staticmethod
+    def read_folders(folders: List[str],
+                     with_traffic: bool = False,
+                     with_snapshots: bool = False) -> List[Iterator[Entry]]:
+        streams: List[Iterator[Entry]] = []
+        for folder in folders:
+            event_logs, traffic_logs, snapshot_folders = LogReader.find(folder)
+            streams += [LogReader.read_events(x, LogReader.get_source(x, folder)) for x in event_logs]
+            if with_traffic:
+                streams += [LogReader.read_traffic(x, LogReader.get_source(x, folder)) for x in traffic_logs]
+            if with_snapshots:
+                streams += [LogReader.read_snapshots(x, LogReader.get_source(x, folder)) for x in snapshot_folders]
+
+        return streams
+
+    @staticmethod
+    def merge(streams: Iterable[Iterator[Entry]]) -> Iterator[Entry]:
+        '''k-way merge of the streams, each of them must be ordered by the timestamp'''
+        return heapq.merge(*streams, key = lambda x: x[0])
+
+    @staticmethod
+    def get_source(path: str, folder: str) -> str:
+        return os.path.splitext(os.path.relpath(path, folder))[0].replace('\\', '/')
+
+    @staticmethod
+    def parse_event_line(line: str) -> Optional[Tuple[float, int, List[str]]]:
+        '''Returns the timestamp, the frame (-1 in the older logs) and the fields starting from the logger type'''
+        fields = line.rstrip('\r\n').split('\t')
+        try:
+            timestamp = float(fields[0])
+        except ValueError:
+            return None
+
+        # the logs stamped by SessionClock have the frame and the simulation time after the timestamp
+        if len(fields) >= 4 and fields[1].isdigit():
+            return timestamp, int(fields[1]), fields[3:]
+
+        return timestamp, -1, fields[1:]
+
+    @staticmethod
+    def read_events(filename: str, source: str) -> Iterator[Entry]:
+        with open(filename) as f:
+            for line in f:
+                parsed = LogReader.parse_event_line(line)
+                if parsed is not None:
+                    timestamp, frame, fields = parsed
+                    yield (timestamp, source, frame, '\t'.join(fields))
+
+    @staticmethod
+    def read_traffic(filename: str, source: str) -> Iterator[Entry]:
+        if filename.endswith('.bin'):
+            yield from LogReader._read_binary_traffic(filename, source)
+            return
+
+        with open(filename) as f:
+            f.readline()        # the column names
+            for line in f:
+                fields = line.rstrip('\r\n').split('\t')
+                yield (float(fields[0]), source, -1, '\t'.join(fields[1:]))
+
+    @staticmethod
+    def read_snapshots(folder: str, source: str) -> Iterator[Entry]:
+        # the folder name has the date and time of the session start, and file names have the time only
+        try:
+            start = datetime.strptime(os.path.basename(folder), '%Y-%m-%d_%H-%M-%S')
+        except ValueError:
+            return
+
+        entries: List[Entry] = []
+        for name in os.listdir(folder):
+            match = SNAPSHOT_NAME.match(name)
+            if match is None:
+                continue
+
+            hours, minutes, seconds, ms, frame, attrib = match.groups()
+            time = start.replace(hour = int(hours), minute = int(minutes), second = int(seconds), microsecond = 1000 * int(ms or 0))
+            if time < start:
+                time += timedelta(days = 1)     # the session went over midnight
+
+            # naive UTC datetime to timestamp, as datetime.utcnow().timestamp() does
+            entries.append((time.timestamp(), source, int(frame) if frame else -1, f'snapshot\t{attrib}\t{name}'))
+
+        yield from sorted(entries, key = lambda x: x[0])
+
+    # Internal
+
+    @staticmethod
+    def _read_binary_traffic(filename: str, source: str) -> Iterator[Entry]:
+        records = TrafficLog.load(filename)
+        if len(records) == 0:
+            return
+
+        # the binary logs have the seconds since the epoch, converted to the event log convention once
+        t0 = float(records['timestamp'][0])
+        shift = datetime.utcfromtimestamp(t0).timestamp() - t0
+
+        names = [x for x in records.dtype.names if x not in ('timestamp', 'frame', 'sim_time')]
+        has_frame = 'frame' in records.dtype.names
+
+        for record in records:
+            frame = int(record['frame']) if has_frame else -1
+            yield (float(record['timestamp']) + shift, source, frame, '\t'.join([str(record[x]) for x in names]))
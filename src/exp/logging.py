@@ -1,32 +1,193 @@
 import os
+import atexit
+import threading
+import time
+import weakref
 
-from io import TextIOWrapper
-from typing import Optional, Any
-from datetime import datetime
+from collections import deque
+from typing import Optional, Any, Deque, List, Set, Tuple, IO
+
+from src.exp.traffic_log import TrafficLog, TRAFFIC_DTYPE, HEADER_SIZE
+from src.exp.session_clock import SessionClock
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('numpy is not installed')
 
 LOG_FOLDER = 'logs'
 IMAGE_FOLDER = "snapshots"
 
-class LogFile:
+EVENT_FLUSH_INTERVAL = 0.2          # seconds
+TRAFFIC_FLUSH_INTERVAL = 1.0
+WRITE_BUFFER_SIZE = 1 << 16         # bytes
+TRAFFIC_CHUNK_SIZE = 30             # records, about 1 second at 30 FPS
+
+CONSOLE_MAX_LINES_PER_SECOND = 20
+
+Record = Tuple[int, int, float, Optional[str], Tuple[Any, ...], bool]     # SessionClock.stamp(), type, params, is_verbal
+
+class ConsoleSink:
+    '''Prints the lines of verbal loggers, but not more than CONSOLE_MAX_LINES_PER_SECOND'''
     def __init__(self) -> None:
+        self._period_start = 0.0
+        self._count = 0
+        self._skipped = 0
+    
+    def print(self, line: str) -> None:
+        now = time.monotonic()
+        if now - self._period_start >= 1.0:
+            self.flush()
+            self._period_start = now
+            self._count = 0
+        
+        if self._count < CONSOLE_MAX_LINES_PER_SECOND:
+            print(line)
+            self._count += 1
+        else:
+            self._skipped += 1
+    
+    def flush(self) -> None:
+        if self._skipped > 0:
+            print(f'LOG: {self._skipped} lines were not shown')
+            self._skipped = 0
+
+class LogWriter:
+    '''
+    Writes the log records in a background thread. The logging thread only appends a record
+    to the queue (deque.append is atomic, no lock is needed); the writer thread formats
+    the queued records and writes them in one chunk every flush interval.
+    All writers are flushed and closed when the app exits, also after a crash
+    '''
+    _instances: Set['LogWriter'] = set()
+    
+    def __init__(self, file: IO[Any], flush_interval: float) -> None:
+        self._file = file
+        self._flush_interval = flush_interval
+        self._queue: Deque[Any] = deque()
+        self._console = ConsoleSink()
+        
+        self._is_running = True
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target = self._run, name = 'LogWriter', daemon = True)
+        self._thread.start()
+        
+        LogWriter._instances.add(self)
+    
+    def put(self, record: Any) -> None:
+        self._queue.append(record)
+    
+    def close(self) -> None:
+        if not self._is_running:
+            return
+        
+        self._is_running = False
+        self._wakeup.set()
+        self._thread.join()
+        
+        LogWriter._instances.discard(self)
+    
+    @staticmethod
+    def close_all() -> None:
+        for writer in list(LogWriter._instances):
+            writer.close()
+    
+    # Internal
+    
+    def _run(self) -> None:
+        while self._is_running:
+            self._wakeup.wait(self._flush_interval)
+            self._write()
+        
+        self._write()       # the records queued while closing
+        self._console.flush()
+    
+    def _write(self) -> None:
+        lines: List[str] = []
+        while True:
+            try:
+                offset_ns, frame, sim_time, type, params, is_verbal = self._queue.popleft()
+            except IndexError:
+                break
+            
+            stamp = f'{SessionClock.to_timestamp(offset_ns):.6f}\t{frame}\t{sim_time:.4f}'
+            data = '\t'.join([str(x) for x in params])
+            if type is not None:
+                lines.append(f'{stamp}\t{type}\t{data}\n')
+            else:
+                lines.append(f'{stamp}\t{data}\n')
+            
+            if is_verbal:
+                self._console.print(f'LOG: {stamp}\t{type}\t{data}')
+        
+        if len(lines) > 0:
+            self._file.write(''.join(lines))
+            self._file.flush()
+
+class ChunkWriter(LogWriter):
+    '''Writes the queued bytes into a binary file as they are'''
+    def _write(self) -> None:
+        is_written = False
+        while True:
+            try:
+                chunk = self._queue.popleft()
+            except IndexError:
+                break
+            
+            self._file.write(chunk)
+            is_written = True
+        
+        if is_written:
+            self._file.flush()
+
+atexit.register(LogWriter.close_all)
+
+class LogFile:
+    is_enabled = True       # set via set_enabled
+    
+    def __init__(self,
+                 flush_interval: float = EVENT_FLUSH_INTERVAL,
+                 is_binary: bool = False,
+                 empty_size: int = 0) -> None:
         self.name: str
-        self.file: TextIOWrapper
+        self.file: IO[Any]
+        self.writer: LogWriter
         
+        self._flush_interval = flush_interval
+        self._is_binary = is_binary
+        self._empty_size = empty_size     # bytes of a file without records, such as a binary header
+        self._is_open = False
         self._count = 0
         
         if not os.path.exists(LOG_FOLDER):
             os.makedirs(LOG_FOLDER)
+    
+    @staticmethod
+    def set_enabled(is_enabled: bool) -> None:
+        # the loggers created while the files are disabled write nothing (used by the headless simulator)
+        LogFile.is_enabled = is_enabled
+        
+    def is_open(self) -> bool:
+        return self._is_open
         
     def create(self, prefix: Optional[str] = None, suffix: Optional[str] = None) -> bool:
-        if self._count == 0:
-            name = datetime.utcnow().strftime('%Y-%m-%d_%H-%M-%S')
+        if self._count == 0 and not LogFile.is_enabled:
+            self.name = 'disabled'
+        elif self._count == 0:
+            name = SessionClock.to_datetime(SessionClock.now_ns()).strftime('%Y-%m-%d_%H-%M-%S')
             if prefix is not None:
                 name = f'{prefix}_{name}'
             if suffix is not None:
                 name = f'{suffix}_{name}'
             
             self.name = name    
-            self.file = open(f'{LOG_FOLDER}/{name}.txt', 'w')
+            if self._is_binary:
+                self.file = open(f'{LOG_FOLDER}/{name}.bin', 'wb', buffering = WRITE_BUFFER_SIZE)
+                self.writer = ChunkWriter(self.file, self._flush_interval)
+            else:
+                self.file = open(f'{LOG_FOLDER}/{name}.txt', 'w', buffering = WRITE_BUFFER_SIZE)
+                self.writer = LogWriter(self.file, self._flush_interval)
+            self._is_open = True
             
         self._count += 1
         
@@ -35,11 +196,14 @@ class LogFile:
     def close(self) -> bool:
         self._count -= 1
         
-        if self._count == 0:
+        if self._count == 0 and self._is_open:
+            self._is_open = False
+            self.writer.close()
+            
             size = self.file.tell()
             self.file.close()
             
-            if size == 0:
+            if size <= self._empty_size:
                 os.remove(self.file.name) 
                 print(f'LOG: removed [{self.name}]')
             else:
@@ -72,18 +236,13 @@ class BaseLogger:
         self._logfile.close()
     
     def log(self, *params: Any) -> None:
-        if self._logfile.file.closed:
+        # the params are formatted later in the writer thread, so they must not be modified after this call
+        if not self._logfile.is_open():
             return
         
-        timestamp = datetime.utcnow().timestamp()
-        data = '\t'.join([str(x) for x in params])
-        if self._type is not None:
-            self._logfile.file.write(f'{timestamp}\t{self._type}\t{data}\n')
-        else:
-            self._logfile.file.write(f'{timestamp}\t{data}\n')
-        
-        if self._is_verbal:
-            print(f'LOG: {timestamp}\t{self._type}\t{data}')
+        offset_ns, frame, sim_time = SessionClock.stamp()
+        record: Record = (offset_ns, frame, sim_time, self._type, params, self._is_verbal)
+        self._logfile.writer.put(record)
             
 class EventLogger(BaseLogger):
     logfile = LogFile()
@@ -95,15 +254,67 @@ class EventLogger(BaseLogger):
     def __init__(self, type: Optional[str] = None) -> None:
         super().__init__(EventLogger.logfile, type, True)
 
-class TrafficLogger(BaseLogger):
-    logfile = LogFile()
-    
-    def __new__(cls) -> 'EventLogger':
-        TrafficLogger.logfile.create('traffic')
-        return super().__new__(cls)
+class TrafficLogger:
+    '''
+    Writes the traffic records (see src.exp.traffic_log) into a binary file.
+    The records are collected into NumPy chunks of TRAFFIC_CHUNK_SIZE, and the full chunks are written
+    in the background. The file is loaded with TrafficLog.load, and converted to text with traffic_log.py
+    '''
+    logfile = LogFile(TRAFFIC_FLUSH_INTERVAL, True, HEADER_SIZE)
+    _instances: 'weakref.WeakSet[TrafficLogger]' = weakref.WeakSet()
     
     def __init__(self) -> None:
-        super().__init__(TrafficLogger.logfile)
+        if TrafficLogger.logfile.create('traffic') and TrafficLogger.logfile.is_open():
+            TrafficLogger.logfile.writer.put(TrafficLog.make_header(SessionClock.to_time(SessionClock.now_ns())))
+        
+        self._chunk = np.zeros(TRAFFIC_CHUNK_SIZE, dtype = TRAFFIC_DTYPE)
+        self._count = 0
+        
+        TrafficLogger._instances.add(self)
+        
+        print(f'LOG: created [{TrafficLogger.logfile.name}]')
+    
+    def __del__(self):
+        self._write_chunk()
+        
+        print(f'LOG: finalized [{TrafficLogger.logfile.name}]')
+        TrafficLogger.logfile.close()
+    
+    def log(self,
+            ec_pos_x: float,
+            ec_pos_y: float,
+            same_far: int,
+            same_mid: int,
+            same_close: int,
+            next_far: int,
+            next_mid: int,
+            next_close: int) -> None:
+        if not TrafficLogger.logfile.is_open():
+            return
+        
+        offset_ns, frame, sim_time = SessionClock.stamp()
+        self._chunk[self._count] = (SessionClock.to_time(offset_ns), frame, sim_time, ec_pos_x, ec_pos_y, same_far, same_mid, same_close, next_far, next_mid, next_close)
+        self._count += 1
+        
+        if self._count == TRAFFIC_CHUNK_SIZE:
+            self._write_chunk()
+    
+    @staticmethod
+    def write_all() -> None:
+        # the records of the last chunk are passed to the writer before it is closed on exit
+        for logger in list(TrafficLogger._instances):
+            logger._write_chunk()
+    
+    # Internal
+    
+    def _write_chunk(self) -> None:
+        if self._count == 0 or not TrafficLogger.logfile.is_open():
+            return
+        
+        TrafficLogger.logfile.writer.put(self._chunk[:self._count].tobytes())
+        self._count = 0
+
+atexit.register(TrafficLogger.write_all)     # called before LogWriter.close_all, as the exit functions are called in the reverse order
 
 class ImageLogger:
     def __init__(self) -> None:
@@ -111,7 +322,7 @@ class ImageLogger:
         if not os.path.exists(folder):
             os.makedirs(folder)
             
-        ts = datetime.utcnow().strftime('%Y-%m-%d_%H-%M-%S')
+        ts = SessionClock.to_datetime(SessionClock.now_ns()).strftime('%Y-%m-%d_%H-%M-%S')
         self._folder = f'{folder}/{ts}'
         os.makedirs(self._folder)
             
@@ -120,5 +331,7 @@ class ImageLogger:
             os.rmdir(self._folder)
             
     def get_filename(self, attrib: str) -> str:
-        ts = datetime.utcnow().strftime('%H-%M-%S')
-        return f'{self._folder}/ss-{ts}-{attrib}.jpg'
\ No newline at end of file
+        # milliseconds and the frame id make the names unique, and allow joining the snapshots with the logs
+        offset_ns, frame, _ = SessionClock.stamp()
+        ts = SessionClock.to_datetime(offset_ns).strftime('%H-%M-%S-%f')[:-3]
+        return f'{self._folder}/ss-{ts}-{frame}-{attrib}.jpg'
\ No newline at end of file
@@ -1,15 +1,72 @@
+from typing import Callable, Optional, Tuple
+
+from src.exp.logging import EventLogger
+from src.exp.session_clock import SessionClock
+
+from src.net.clock_sync import ClockSync
+
 class NetCmd:
     hide_mirror = 'hide_mirror'
     show_mirror = 'show_mirror'
 
+    @staticmethod
+    def make(cmd: str, frame: int, time: float) -> str:
+        '''The command is applied on the CARLA frame, or at the time of the primary mirror clock if the frame is 0'''
+        return f'{cmd} {frame} {time:.6f}'
+
 class MirrorStatus:
-    def __init__(self) -> None:
+    '''
+    Whether the mirror is frozen. The primary mirror picks a CARLA frame a few frames ahead and sends
+    it to the secondary mirrors, and each mirror freezes after it has shown that frame, so all of them
+    stop on the same frame wherever the command is received. The mirrors without the frames (the blank
+    mirror, the simulator) use the time instead, converted to the local clock by ClockSync.
+    `update` must be called every frame, before the world is advanced
+    '''
+    def __init__(self,
+                 clock: Callable[[], float] = SessionClock.now,
+                 clock_sync: Optional[ClockSync] = None) -> None:
         self.is_frozen = False
-        
+
+        self._clock = clock
+        self._clock_sync = clock_sync
+        self._target: Optional[Tuple[bool, int, float]] = None       # is frozen, frame, local time
+
+        self._logger = EventLogger('mirror')
+
+    def set_target(self, is_frozen: bool, frame: int, time: float) -> None:
+        '''The frame is a CARLA frame id or 0, the time is on the local clock'''
+        self._target = (is_frozen, frame, time)
+
+    def update(self) -> None:
+        if self._target is None:
+            return
+
+        is_frozen, frame, time = self._target
+        current_frame, _ = SessionClock.get_frame()
+        now = self._clock()
+
+        if frame > 0 and current_frame > 0:
+            if current_frame < frame:
+                return
+        elif now < time:
+            return
+
+        self._target = None
+        self.is_frozen = is_frozen
+
+        # a command received too late is applied on a later frame
+        self._logger.log('frozen' if is_frozen else 'unfrozen', frame, current_frame, f'{(now - time) * 1000:.1f}')
+
     def handle_net_request(self, req: str) -> None:
-        if req == NetCmd.hide_mirror:
-            self.is_frozen = True
-        elif req == NetCmd.show_mirror:
-            self.is_frozen = False
+        cmd, *args = req.split()
+        if cmd != NetCmd.hide_mirror and cmd != NetCmd.show_mirror:
+            print(f'MST: uknown network command {req}')
+            return
+
+        is_frozen = cmd == NetCmd.hide_mirror
+        if len(args) == 2:
+            primary_time = float(args[1])
+            time = self._clock_sync.to_local(primary_time) if self._clock_sync else self._clock()
+            self.set_target(is_frozen, int(args[0]), time)
         else:
-            print(f'MST: uknown network command {req}')
\ No newline at end of file
+            self.is_frozen = is_frozen
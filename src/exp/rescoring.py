@@ -0,0 +1,159 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Tuple, Any
+
+from src.carla.lane import Lane
+from src.exp.log_reader import LogReader
+from src.exp.scoring import ScoringRules
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('numpy is not installed')
+
+TARGET_DTYPE = np.dtype([
+    ('session', np.int32),
+    ('distance', np.float64),
+    ('misses', np.int32),
+])
+TASK_DTYPE = np.dtype([
+    ('session', np.int32),
+    ('distance', np.float64),
+    ('is_same_lane', np.bool_),
+    ('response', np.int32),
+])
+
+MIN_SESSIONS_PER_WORKER = 8         # smaller studies are loaded in this process
+
+class SessionScoring:
+    '''The scoring inputs of a session read from its event log'''
+    def __init__(self,
+                 filename: str,
+                 targets: Any,
+                 tasks: Any,
+                 logged_score: Optional[int],
+                 is_exact: bool) -> None:
+        self.filename = filename
+        self.targets = targets
+        self.tasks = tasks
+        self.logged_score = logged_score        # the last score shown to the driver, if logged
+        self.is_exact = is_exact                # False for the logs written before Scoring logged its inputs
+
+    @staticmethod
+    def load(filename: str) -> 'SessionScoring':
+        # the "scoring" lines have the exact inputs of the rules; the older logs have
+        # the "scenario" lines only, with the distances rounded and no missed targets
+        scoring: List[List[str]] = []
+        scenario: List[List[str]] = []
+
+        with open(filename) as f:
+            for line in f:
+                parsed = LogReader.parse_event_line(line)
+                if parsed is None or len(parsed[2]) < 2:
+                    continue
+
+                fields = parsed[2]
+                if fields[0] == 'scoring':
+                    scoring.append(fields[1:])
+                elif fields[0] == 'scenario':
+                    scenario.append(fields[1:])
+
+        if len(scoring) > 0:
+            return SessionScoring._from_scoring(filename, scoring)
+        else:
+            return SessionScoring._from_scenario(filename, scenario)
+
+    # Internal
+
+    @staticmethod
+    def _from_scoring(filename: str, events: List[List[str]]) -> 'SessionScoring':
+        targets: List[Tuple[int, float, int]] = []
+        tasks: List[Tuple[int, float, bool, int]] = []
+        logged_score: Optional[int] = None
+
+        misses = 0
+        task: Optional[Tuple[float, bool]] = None
+
+        for event in events:
+            if event[0] == 'reset':
+                targets.clear()         # only the scores after the last reset count
+                tasks.clear()
+                logged_score = 0
+            elif event[0] == 'target':
+                if event[1] == 'set':
+                    misses = 0
+                elif event[1] == 'missed':
+                    misses += 1
+                elif event[1] == 'noticed':
+                    targets.append((0, float(event[2]), misses))
+                    logged_score = int(event[3])
+            elif event[0] == 'task':
+                if event[1] == 'set':
+                    task = (float(event[2]), event[3] == Lane.SAME)
+                elif event[1] == 'response' and task is not None:
+                    tasks.append((0, task[0], task[1], int(event[2])))
+                    logged_score = int(event[3])
+
+        return SessionScoring(filename, np.array(targets, dtype = TARGET_DTYPE), np.array(tasks, dtype = TASK_DTYPE), logged_score, True)
+
+    @staticmethod
+    def _from_scenario(filename: str, events: List[List[str]]) -> 'SessionScoring':
+        targets: List[Tuple[int, float, int]] = []
+        tasks: List[Tuple[int, float, bool, int]] = []
+
+        task: Optional[Tuple[float, bool]] = None
+
+        for event in events:
+            if event[0] == 'target' and event[1] == 'noticed':
+                targets.append((0, float(event[2]), 0))
+            elif event[0] == 'car' and event[1] == 'approached' and len(event) >= 5:
+                task = (float(event[4]), event[3] == Lane.SAME)
+            elif event[0] == 'evaluation' and event[1] == 'response' and task is not None:
+                tasks.append((0, task[0], task[1], int(event[2])))
+                task = None
+
+        return SessionScoring(filename, np.array(targets, dtype = TARGET_DTYPE), np.array(tasks, dtype = TASK_DTYPE), None, False)
+
+class Rescoring:
+    '''
+    Re-applies ScoringRules to the recorded sessions. The logs are parsed in a process pool,
+    and then the rules are applied once to the arrays of all targets and tasks of all sessions:
+
+        sessions = Rescoring.load(event_logs)
+        scores = Rescoring.get_scores(sessions)
+    '''
+    @staticmethod
+    def load(filenames: List[str], workers: Optional[int] = None) -> List[SessionScoring]:
+        if len(filenames) < MIN_SESSIONS_PER_WORKER * 2:
+            return [SessionScoring.load(x) for x in filenames]
+
+        with ProcessPoolExecutor(workers) as executor:
+            return list(executor.map(SessionScoring.load, filenames, chunksize = MIN_SESSIONS_PER_WORKER))
+
+    @staticmethod
+    def get_scores(sessions: List[SessionScoring]) -> Any:
+        '''Returns the score of each session'''
+        targets = Rescoring._concatenate([x.targets for x in sessions], TARGET_DTYPE)
+        tasks = Rescoring._concatenate([x.tasks for x in sessions], TASK_DTYPE)
+
+        target_scores = ScoringRules.get_target_score(targets['distance'], targets['misses'])
+
+        task_scores = ScoringRules.get_task_score(tasks['distance'], tasks['is_same_lane'])
+        correct_answers = ScoringRules.get_task_correct_answer(tasks['distance'], tasks['is_same_lane'])
+        response_scores = ScoringRules.get_response_score(task_scores, tasks['response'], correct_answers)
+
+        # the scores are integers in each step of the live scoring, so the sum is exact
+        scores = np.bincount(targets['session'], weights = target_scores, minlength = len(sessions))
+        scores += np.bincount(tasks['session'], weights = response_scores, minlength = len(sessions))
+
+        return scores.astype(np.int64)
+
+    # Internal
+
+    @staticmethod
+    def _concatenate(parts: List[Any], dtype: Any) -> Any:
+        if len(parts) == 0:
+            return np.zeros(0, dtype = dtype)
+
+        result = np.concatenate(parts)
+        result['session'] = np.repeat(np.arange(len(parts), dtype = np.int32), [len(x) for x in parts])
+        return result
@@ -1,7 +1,7 @@
+import math
 import random
-import time
 
-from typing import Optional, List, cast
+from typing import Optional, List, Callable, cast, TYPE_CHECKING
 
 from queue import SimpleQueue
 
@@ -9,14 +9,16 @@ from src.user_action import Action, ActionType, DriverTask, CarSpawningLocation
 
 from src.exp.task_screen import TaskScreenRequests, TaskScreenRequest, TaskScreen
 from src.exp.logging import EventLogger
-from src.exp.delayed_task import DelayedTask
+from src.exp.scheduler import Scheduler
 from src.exp.mirror_status import MirrorStatus, NetCmd
 from src.exp.scoring import Scoring
+from src.exp.session_clock import SessionClock
 
-from src.net.tcp_server import TcpServer
+if TYPE_CHECKING:
+    from src.net.tcp_server import TcpServer
 
 REPETITIONS = 6
-DISTANCES = [5, 25, 40]
+DISTANCES = [5, 15, 25, 40]     # meters: a close, a mid and two far ones in the zones of the scoring rules
 SPAWN_VEHICLE_BEHIND = 35 # meters
 SPAWN_LOCATIONS = [
     CarSpawningLocation.behind_next_lane,
@@ -26,14 +28,19 @@ SPAWN_LOCATIONS = [
 SPAWN_PAUSE = 10.0
 MIN_EGOCAR_SPEED_TO_EVALUATE_LINE_CHANGE_SAFETY = 20.0
 MAX_TARGET_LIFESPAN = 120.0     # 2 minutes
+MIRROR_SYNC_DELAY = 0.1         # seconds from sending a freeze command to the frame it is applied on, at least
+UNFREEZE_PAUSE = 1.0            # seconds from the questionnaire response to unfreezing the mirrors
+MIRROR_SYNC_MARGIN = 0.05       # seconds added to the one-way delay of the slowest secondary mirror
 
 class Scenario:
     def __init__(self,
                  task_screen: TaskScreen,
-                 cmd_server: Optional[TcpServer],
-                 mirror_status: MirrorStatus) -> None:
+                 cmd_server: Optional['TcpServer'],
+                 mirror_status: MirrorStatus,
+                 clock: Callable[[], float] = SessionClock.now) -> None:
         
         self._mirror_status = mirror_status
+        self._clock = clock
 
         self._task_screen = task_screen
         self._task_screen.set_callback(lambda request: self._task_screen_requests.put(request))
@@ -44,7 +51,7 @@ class Scenario:
         self._task_screen_requests: SimpleQueue[TaskScreenRequest] = SimpleQueue()
         self._controller_actions: SimpleQueue[Action] = SimpleQueue()
 
-        self._delayed_tasks: List[DelayedTask] = list()
+        self._scheduler = Scheduler(clock)     # a virtual clock lets the scenario run faster than in real time
 
         self._logger = EventLogger('scenario')
         
@@ -73,13 +80,11 @@ class Scenario:
         self._scoring.reset()
         self._next_task()
         
-        self._delayed_tasks.append(DelayedTask(1.0, self._spawn_random_target))
-        self._delayed_tasks.append(DelayedTask(2.0, self._spawn_next_car))
+        self._scheduler.call_later(1.0, self._spawn_random_target)
+        self._scheduler.call_later(2.0, self._spawn_next_car)
         
     def tick(self) -> None:
-        finished_tasks = [task for task in self._delayed_tasks if task.tick()]
-        for task in finished_tasks:
-            self._delayed_tasks.remove(task)
+        self._scheduler.tick()
             
         while not self._task_screen_requests.empty():
             request = self._task_screen_requests.get()
@@ -89,7 +94,7 @@ class Scenario:
                 
                 self._target_timestamp = 0.0
                 self._controller_actions.put(Action(ActionType.REMOVE_TARGETS))
-                self._delayed_tasks.append(DelayedTask(0.5, self._spawn_random_target))
+                self._scheduler.call_later(0.5, self._spawn_random_target)
 
             elif request.type == TaskScreenRequests.questionnaire:
                 self._scoring.set_task_result(cast(int, request.data))
@@ -100,25 +105,27 @@ class Scenario:
                 self._controller_actions.put(Action(ActionType.UNFREEZE))
 
                 if self._next_task():
-                    self._delayed_tasks.append(DelayedTask(2.0, self._spawn_next_car))
+                    self._scheduler.call_later(2.0, self._spawn_next_car)
                 else:
                     self._clear_tasks()
 
-                    self._delayed_tasks.append(DelayedTask(0.3, self._task_screen.show_message, ['Done!', 'Thank you!']))
-                    self._delayed_tasks.append(DelayedTask(0.8, self._task_screen.hide_button))
-                    self._delayed_tasks.append(DelayedTask(1.5, self._controller_actions.put, Action(ActionType.STOP_SCENARIO)))
+                    self._scheduler.call_later(0.3, self._task_screen.show_message, ['Done!', 'Thank you!'])
+                    self._scheduler.call_later(0.8, self._task_screen.hide_button)
+                    self._scheduler.call_later(1.5, self._controller_actions.put, Action(ActionType.STOP_SCENARIO))
 
                     self._logger.log('done')
                     self._is_running = False
                 
-                self._delayed_tasks.append(DelayedTask(0.5, self._task_screen.hide_questionnaire))
-                self._delayed_tasks.append(DelayedTask(1.0, self._continue_driving))
+                self._scheduler.call_later(0.5, self._task_screen.hide_questionnaire)
+                # both mirror commands are applied MIRROR_SYNC_DELAY or more after they are sent, so the unfreeze
+                # command is sent that much earlier, and the mirrors stay frozen as long as before
+                self._scheduler.call_later(UNFREEZE_PAUSE - MIRROR_SYNC_DELAY, self._continue_driving)
             else:
                 print(f'SCN: unknown request: {request.type} ({request.data})')
                 
-        if (self._target_timestamp > 0.0 and time.perf_counter() - self._target_timestamp) > MAX_TARGET_LIFESPAN:
+        if (self._target_timestamp > 0.0 and self._scheduler.time - self._target_timestamp) > MAX_TARGET_LIFESPAN:
             self._target_timestamp = 0.0
-            self._delayed_tasks.append(DelayedTask(0.5, self._spawn_random_target))
+            self._scheduler.call_later(0.5, self._spawn_random_target)
             self._controller_actions.put(Action(ActionType.REMOVE_TARGETS))
     
     def get_action(self) -> Optional[Action]:
@@ -150,10 +157,7 @@ class Scenario:
                 self._logger.log('car', 'approached', name, lane, f'{distance:.1f}')
                 self._logger.log('evaluation', 'request')
                 
-                if self._cmd_server:
-                    self._cmd_server.send(NetCmd.hide_mirror)
-
-                self._delayed_tasks.append(DelayedTask(0.1, self._stop_driving))
+                self._set_mirrors_frozen(True)
                 
                 return True
             
@@ -188,13 +192,13 @@ class Scenario:
                 if self._car_spawning_location_index == len(SPAWN_LOCATIONS):
                     self._car_spawning_location_index = 0
                     
-                self._delayed_tasks.append(DelayedTask(SPAWN_PAUSE, self._spawn_next_car))
+                self._scheduler.call_later(SPAWN_PAUSE, self._spawn_next_car)
             else:
-                self._delayed_tasks.append(DelayedTask(1.0, self._spawn_next_car))
+                self._scheduler.call_later(1.0, self._spawn_next_car)
         elif action.type == ActionType.START_SCENARIO:
             pass
         elif action.type == ActionType.STOP_SCENARIO:
-            self._delayed_tasks.append(DelayedTask(1.0, self._task_screen.hide_button))
+            self._scheduler.call_later(1.0, self._task_screen.hide_button)
     
     # Internal
 
@@ -209,12 +213,12 @@ class Scenario:
         self._logger.log('target', 'spawned', name)
         self._scoring.set_target()
         
-        self._target_timestamp = time.perf_counter()
+        self._target_timestamp = self._scheduler.time
         print('\007')
 
         self._controller_actions.put(Action(ActionType.SPAWN_TARGET, target_type))
-        self._delayed_tasks.append(DelayedTask(1.0, self._task_screen.show_message, ['Please find', f'{DriverTask.TARGETS[target_type]}']))
-        self._delayed_tasks.append(DelayedTask(3.0, self._task_screen.show_button))
+        self._scheduler.call_later(1.0, self._task_screen.show_message, ['Please find', f'{DriverTask.TARGETS[target_type]}'])
+        self._scheduler.call_later(3.0, self._task_screen.show_button)
         
     def _spawn_next_car(self) -> None:
         param = (SPAWN_LOCATIONS[self._car_spawning_location_index], SPAWN_VEHICLE_BEHIND)
@@ -230,17 +234,29 @@ class Scenario:
         
         return True
         
-    def _stop_driving(self) -> None:
-        self._mirror_status.is_frozen = True
-        
     def _continue_driving(self) -> None:
-        self._mirror_status.is_frozen = False
+        self._set_mirrors_frozen(False)
+
+    def _set_mirrors_frozen(self, is_frozen: bool) -> None:
+        # the command must reach the slowest secondary mirror before the frame it is applied on
+        max_rtt = self._cmd_server.get_max_rtt() if self._cmd_server else 0.0
+        delay = max(MIRROR_SYNC_DELAY, max_rtt / 2 + MIRROR_SYNC_MARGIN)
+
+        # the frames do not advance while the mirrors are frozen, so they are unfrozen at a time
+        frame, _ = SessionClock.get_frame()
+        target_frame = 0
+        if is_frozen and frame > 0:
+            from src.carla.environment import CarlaEnvironment     # CARLA is loaded only when it sends frames, not in the simulator
+            target_frame = frame + math.ceil(delay * CarlaEnvironment.FPS)
+        target_time = self._clock() + delay
+
+        self._mirror_status.set_target(is_frozen, target_frame, target_time)
         if self._cmd_server:
-            self._cmd_server.send(NetCmd.show_mirror)
+            cmd = NetCmd.hide_mirror if is_frozen else NetCmd.show_mirror
+            self._cmd_server.send(NetCmd.make(cmd, target_frame, target_time))
+
+        self._logger.log('mirror', 'freeze' if is_frozen else 'unfreeze', target_frame, f'{target_time:.3f}', f'{max_rtt * 1000:.1f}')
         
     def _clear_tasks(self) -> None:
-        print(f'SCN Cancelling {len(self._delayed_tasks)} tasks')
-        for task in self._delayed_tasks:
-            print(f'SCN     {task}')
-            task.cancel()
-        self._delayed_tasks.clear()
+        count = self._scheduler.cancel_all()
+        print(f'SCN Cancelled {count} tasks')
@@ -1,38 +1,57 @@
 import socket
 
-from typing import Optional, Any
+from typing import Optional, Any, TYPE_CHECKING
 
 from src.settings import Settings
 
-from src.exp.scenario import Scenario
+from src.exp.logging import EventLogger
 from src.exp.mirror_status import MirrorStatus
-from src.exp.task_screen import TaskScreen
+from src.exp.session_clock import SessionClock
 
-from src.net.tcp_server import TcpServer
+from src.net.clock_sync import ClockSync
+from src.net.io_runtime import IoRuntime
 from src.net.tcp_client import TcpClient
 
+# the primary mirror modules (and websockets) are imported only when this mirror becomes primary
+if TYPE_CHECKING:
+    from src.exp.scenario import Scenario
+    from src.exp.task_screen import TaskScreen
+    from src.net.tcp_server import TcpServer
+
 class ScenarioEnvironment(object):
-    def __init__(self, is_primary_mirror: bool = True):
+    def __init__(self,
+                 is_primary_mirror: bool = True,
+                 is_tcp_server_running: Optional[bool] = None):
         self._is_primary_mirror = is_primary_mirror
+        self._is_tcp_server_running = is_tcp_server_running     # probed in advance by the app, if not None
         
-        self._task_screen: Optional[TaskScreen] = None
-        self._tcp_server: Optional[TcpServer] = None
+        self._task_screen: Optional['TaskScreen'] = None
+        self._tcp_server: Optional['TcpServer'] = None
         self._tcp_client: Optional[TcpClient] = None
         
-        self.scenario: Optional[Scenario] = None
-        self.mirror_status = MirrorStatus()
+        self.scenario: Optional['Scenario'] = None
+        self.clock_sync = ClockSync(SessionClock.now, self._log_clock_sample)     # used by a secondary mirror
+        self.mirror_status = MirrorStatus(SessionClock.now, self.clock_sync)
+
+        self._logger = EventLogger('clock')
         
     def __enter__(self):
-        settings = Settings()
+        settings = Settings.get()
         server_host = settings.primary_mirror_host
 
-        is_tcp_server_running = TcpClient.can_connect(server_host)
+        is_tcp_server_running = self._is_tcp_server_running
+        if is_tcp_server_running is None:
+            is_tcp_server_running = TcpClient.can_connect(server_host)
         if is_tcp_server_running:
             self._is_primary_mirror = False
 
         if self._is_primary_mirror:
+            from src.net.tcp_server import TcpServer
+            from src.exp.task_screen import TaskScreen
+            from src.exp.scenario import Scenario
+            
             try:
-                self._tcp_server = TcpServer()
+                self._tcp_server = TcpServer(SessionClock.now)
                 self._tcp_server.start()
             except socket.error:
                 self._is_primary_mirror = False
@@ -42,7 +61,7 @@ class ScenarioEnvironment(object):
                 self.scenario = Scenario(self._task_screen, self._tcp_server, self.mirror_status) if self._task_screen else None
                 
         if not self._is_primary_mirror:
-            self._tcp_client = TcpClient(server_host)
+            self._tcp_client = TcpClient(server_host, self.clock_sync)
             self._tcp_client.connect(self.mirror_status.handle_net_request)
             
         return self
@@ -55,4 +74,17 @@ class ScenarioEnvironment(object):
         if self._tcp_client:
             self._tcp_client.close()
             
+        IoRuntime.shutdown()
+        
         return self
+    
+    def tick(self) -> None:
+        '''Handles the network messages and the scheduled mirror freezing, must be called every frame before the world is advanced'''
+        IoRuntime.get().dispatch()
+        self.mirror_status.update()
+
+    # Internal
+
+    def _log_clock_sample(self, offset: float, rtt: float, estimated_offset: float, estimated_rtt: float) -> None:
+        # the offset of the primary mirror clock and the round trip, in ms
+        self._logger.log('sample', f'{offset * 1000:.3f}', f'{rtt * 1000:.3f}', f'{estimated_offset * 1000:.3f}', f'{estimated_rtt * 1000:.3f}')
@@ -0,0 +1,249 @@
+import math
+import random
+
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Optional, Dict, List, Tuple, Union
+
+from src.utils import suppress_stdout
+
+with suppress_stdout():
+    from src.user_action import Action, ActionType, CarSpawningLocation
+
+from src.carla.lane import Lane
+from src.exp.logging import LogFile
+from src.exp.mirror_status import MirrorStatus
+from src.exp.scenario import Scenario, SPAWN_VEHICLE_BEHIND
+from src.exp.scheduler import VirtualClock
+from src.exp.scoring import ScoringRules, TASK_CLOSE_DISTANCE, TASK_MID_DISTANCE
+from src.exp.task_screen import TaskScreen, TaskScreenRequest, TaskScreenRequests
+
+FPS = 30
+MAX_SESSION_DURATION = 2 * 3600.0   # seconds of the virtual time, the session is stopped if it is not done by then
+
+EGO_CAR_SPEED = 30.0                # km/h
+VEHICLE_APPROACH_SPEED = (1.0, 4.0) # m/s faster than the ego car
+RANDOM_VEHICLE_DISTANCE = (35.0, 80.0)
+TARGET_DISTANCE = (80.0, 150.0)     # meters ahead of the ego car when spawned
+TARGET_SIDE_OFFSET = 5.0            # meters from the ego car path
+MAX_TARGET_DISTANCE_BEHIND = 100.0  # the target disappears from the model this far behind
+
+class DriverModel:
+    '''How the simulated driver responds'''
+    def __init__(self,
+                 answer_error_rate: float = 0.1,
+                 answer_time: Tuple[float, float] = (1.5, 4.0),
+                 target_miss_rate: float = 0.1,
+                 target_notice_distance: Tuple[float, float] = (15.0, 90.0)) -> None:
+        self.answer_error_rate = answer_error_rate
+        self.answer_time = answer_time
+        self.target_miss_rate = target_miss_rate
+        self.target_notice_distance = target_notice_distance
+
+class SyntheticTraffic:
+    '''
+    Executes the scenario actions instead of CARLA: vehicles approach the ego car from behind,
+    and the targets appear ahead of it and are passed by
+    '''
+    def __init__(self, rng: random.Random) -> None:
+        self.is_stopped = False
+        self.vehicles: List[Tuple[float, float, str]] = []      # distance behind, approach speed, lane
+        self.target_along: Optional[float] = None                # meters ahead (negative when passed by)
+
+        self._rng = rng
+
+    def execute(self, action: Action) -> bool:
+        '''Returns True if something was spawned, as the runner does'''
+        if action.type == ActionType.SPAWN_CAR:
+            location = action.param[0] if isinstance(action.param, tuple) else CarSpawningLocation.random
+            if location == CarSpawningLocation.behind_same_lane:
+                self.vehicles.append((SPAWN_VEHICLE_BEHIND, self._rng.uniform(*VEHICLE_APPROACH_SPEED), Lane.SAME))
+            elif location == CarSpawningLocation.behind_next_lane:
+                self.vehicles.append((SPAWN_VEHICLE_BEHIND, self._rng.uniform(*VEHICLE_APPROACH_SPEED), Lane.LEFT))
+            else:
+                self.vehicles.append((self._rng.uniform(*RANDOM_VEHICLE_DISTANCE), self._rng.uniform(*VEHICLE_APPROACH_SPEED), self._rng.choice([Lane.SAME, Lane.LEFT])))
+            return True
+        elif action.type == ActionType.SPAWN_TARGET:
+            self.target_along = self._rng.uniform(*TARGET_DISTANCE)
+            return True
+        elif action.type == ActionType.REMOVE_TARGETS:
+            self.target_along = None
+        elif action.type == ActionType.REMOVE_CARS:
+            self.vehicles.clear()
+        elif action.type == ActionType.STOP_SCENARIO:
+            self.is_stopped = True
+
+        return False
+
+    def step(self, dt: float) -> None:
+        # the vehicles that have overtaken the ego car leave the mirror view
+        self.vehicles = [(distance - speed * dt, speed, lane) for distance, speed, lane in self.vehicles if distance - speed * dt > 0]
+
+        if self.target_along is not None:
+            self.target_along -= EGO_CAR_SPEED / 3.6 * dt
+            if self.target_along < -MAX_TARGET_DISTANCE_BEHIND:
+                self.target_along = None
+
+    def get_nearest_vehicle(self) -> Optional[Tuple[float, str]]:
+        if len(self.vehicles) == 0:
+            return None
+
+        distance, _, lane = min(self.vehicles)
+        return distance, lane
+
+    def get_target_distance(self) -> float:
+        # 0 means there is no target, as in Runner
+        if self.target_along is None:
+            return 0.0
+
+        return math.hypot(self.target_along, TARGET_SIDE_OFFSET)
+
+class ScriptedTaskScreen(TaskScreen):
+    '''Stands for the task screen and the driver using it'''
+    def __init__(self, clock: VirtualClock, driver: DriverModel, rng: random.Random) -> None:
+        super().__init__(is_headless = True)
+
+        self.score = 0
+        self.answers: List[Tuple[float, float, str, int, int]] = []     # time, distance, lane, answer, correct answer
+        self.targets_noticed = 0
+
+        self._clock = clock
+        self._driver = driver
+        self._rng = rng
+
+        self._is_button_visible = False
+        self._answer: Optional[Tuple[float, int]] = None        # due time, answer
+        self._notice_distance: Optional[float] = None
+
+    def show_button(self, caption: str = 'Spawn next target') -> None:
+        self._is_button_visible = True
+
+    def hide_button(self) -> None:
+        self._is_button_visible = False
+
+    def show_questionnaire(self) -> None:
+        pass
+
+    def hide_questionnaire(self) -> None:
+        pass
+
+    def show_message(self, msg: Union[str, List[str]]) -> None:
+        pass
+
+    def show_score(self, score: int) -> None:
+        self.score = score
+
+    def on_task(self, distance: float, lane: str) -> None:
+        '''The driver sees the vehicle in the mirror and decides on the answer'''
+        correct_answer = int(ScoringRules.get_task_correct_answer(distance, lane == Lane.SAME))
+        answer = correct_answer
+        if self._rng.random() < self._driver.answer_error_rate:
+            answer = self._rng.choice([x for x in range(4) if x != correct_answer])
+
+        self.answers.append((self._clock.now(), distance, lane, answer, correct_answer))
+        self._answer = (self._clock.now() + self._rng.uniform(*self._driver.answer_time), answer)
+
+    def on_target_spawned(self) -> None:
+        is_missed = self._rng.random() < self._driver.target_miss_rate
+        self._notice_distance = None if is_missed else self._rng.uniform(*self._driver.target_notice_distance)
+
+    def step(self, target_distance: float) -> None:
+        if self._answer is not None and self._clock.now() >= self._answer[0]:
+            self._reply(TaskScreenRequests.questionnaire, self._answer[1])
+            self._answer = None
+
+        if self._is_button_visible and self._notice_distance is not None and 0 < target_distance <= self._notice_distance:
+            self._reply(TaskScreenRequests.target, None)
+            self._notice_distance = None
+            self.targets_noticed += 1
+
+    # Internal
+
+    def _reply(self, type: str, data: Optional[int]) -> None:
+        if self._cb:
+            self._cb(TaskScreenRequest(SimpleNamespace(type = type, data = data)))
+
+class SessionResult:
+    def __init__(self,
+                 seed: int,
+                 duration: float,
+                 is_done: bool,
+                 score: int,
+                 answers: List[Tuple[float, float, str, int, int]],
+                 targets_noticed: int) -> None:
+        self.seed = seed
+        self.duration = duration
+        self.is_done = is_done
+        self.score = score
+        self.answers = answers
+        self.targets_noticed = targets_noticed
+
+class ScenarioSimulator:
+    '''
+    Runs the Scenario without CARLA, the task screen and the driver: the virtual clock advances
+    by one frame per loop, SyntheticTraffic executes the actions and reports the distances,
+    and ScriptedTaskScreen responds. Sessions run in parallel processes:
+
+        results = ScenarioSimulator.run_many(list(range(1000)), DriverModel())
+    '''
+    @staticmethod
+    def run(seed: int, driver: DriverModel) -> SessionResult:
+        # Scenario uses the global random generator for the trial order and targets
+        random.seed(seed)
+        rng = random.Random(seed)
+
+        LogFile.set_enabled(False)
+
+        clock = VirtualClock()
+        task_screen = ScriptedTaskScreen(clock, driver, rng)
+        traffic = SyntheticTraffic(rng)
+
+        with suppress_stdout():
+            mirror_status = MirrorStatus(clock.now)
+            scenario = Scenario(task_screen, None, mirror_status, clock.now)
+            scenario.start()
+
+            dt = 1.0 / FPS
+            while not traffic.is_stopped and clock.now() < MAX_SESSION_DURATION:
+                clock.advance(dt)
+                scenario.tick()
+                mirror_status.update()
+
+                # one action per frame, as in the app
+                action = scenario.get_action()
+                spawned = traffic.execute(action) if action else False
+                if action and action.type == ActionType.SPAWN_TARGET:
+                    task_screen.on_target_spawned()
+
+                # the world does not advance while the mirror is frozen, as in the app
+                if not mirror_status.is_frozen:
+                    traffic.step(dt)
+
+                    scenario.set_search_target_distance(traffic.get_target_distance())
+                    nearest = traffic.get_nearest_vehicle()
+                    if nearest:
+                        distance, lane = nearest
+                        if scenario.set_nearest_vehicle_behind('vehicle.sim.car', distance, lane, EGO_CAR_SPEED):
+                            task_screen.on_task(distance, lane)
+
+                    if action:
+                        scenario.report_action_result(action, spawned)
+
+                task_screen.step(traffic.get_target_distance())
+
+        return SessionResult(seed, clock.now(), traffic.is_stopped, task_screen.score, task_screen.answers, task_screen.targets_noticed)
+
+    @staticmethod
+    def run_many(seeds: List[int], driver: DriverModel, workers: Optional[int] = None) -> List[SessionResult]:
+        with ProcessPoolExecutor(workers) as executor:
+            return list(executor.map(ScenarioSimulator.run, seeds, [driver] * len(seeds), chunksize = 4))
+
+    @staticmethod
+    def get_trial_counts(results: List[SessionResult]) -> Dict[Tuple[str, str], int]:
+        '''Number of trials per lane and the distance zone of the scoring rules'''
+        counts: Dict[Tuple[str, str], int] = dict()
+        for result in results:
+            for _, distance, lane, _, _ in result.answers:
+                zone = 'close' if distance < TASK_CLOSE_DISTANCE else ('mid' if distance < TASK_MID_DISTANCE else 'far')
+                counts[(lane, zone)] = counts.get((lane, zone), 0) + 1
+        return counts
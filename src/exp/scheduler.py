@@ -0,0 +1,113 @@
+import heapq
+
+from typing import Callable, List, Tuple, Any
+
+from src.exp.session_clock import SessionClock
+
+class TaskHandle:
+    '''A task scheduled by Scheduler.call_later'''
+    def __init__(self, due: float, interval: float, cb: Callable[..., None], args: Tuple[Any, ...], is_repetitive: bool) -> None:
+        self.due = due
+        self.interval = interval
+        self.is_repetitive = is_repetitive
+
+        self._cb = cb
+        self._args = args
+        self._is_active = True
+
+    def __str__(self) -> str:
+        return f'{self._cb.__name__}'
+
+    def is_active(self) -> bool:
+        return self._is_active
+
+    def cancel(self) -> None:
+        # the task stays in the heap until it is due, and then it is dropped
+        self._is_active = False
+
+    def run(self) -> None:
+        self._is_active = self.is_repetitive
+        self._cb(*self._args)
+
+class VirtualClock:
+    '''Time that advances only when asked to, so that scenarios can run faster than in real time'''
+    def __init__(self, start: float = 0.0) -> None:
+        self._time = start
+
+    def now(self) -> float:
+        return self._time
+
+    def advance(self, seconds: float) -> None:
+        self._time += seconds
+
+class Scheduler:
+    '''
+    Runs the tasks when they are due. The tasks are kept in a heap ordered by their due time,
+    so adding a task takes O(log n), cancelling takes O(1), and a tick reads the clock once
+    and looks at the due tasks only:
+
+        scheduler = Scheduler()
+        handle = scheduler.call_later(1.0, show_message, 'Hello')
+        ...
+        scheduler.tick()        # every frame
+    '''
+    def __init__(self, clock: Callable[[], float] = SessionClock.now) -> None:
+        self.time = clock()     # the time of the last tick, in seconds
+
+        self._clock = clock
+        self._heap: List[Tuple[float, int, TaskHandle]] = []
+        self._count = 0         # keeps the order of the tasks due at the same time
+
+    def call_later(self, delay: float, cb: Callable[..., None], *args: Any, is_repetitive: bool = False) -> TaskHandle:
+        handle = TaskHandle(self._clock() + delay, delay, cb, args, is_repetitive)
+        self._push(handle)
+        return handle
+
+    def tick(self) -> int:
+        '''Runs the due tasks, returns their count'''
+        self.time = self._clock()
+
+        count = 0
+        repeated: List[TaskHandle] = []
+
+        while len(self._heap) > 0 and self._heap[0][0] <= self.time:
+            _, _, handle = heapq.heappop(self._heap)
+            if not handle.is_active():
+                continue
+
+            handle.run()
+            count += 1
+
+            if handle.is_active():
+                repeated.append(handle)
+
+        # the repetitive tasks run once per tick at most, even with a short interval
+        for handle in repeated:
+            handle.due = self.time + handle.interval
+            self._push(handle)
+
+        return count
+
+    def cancel_all(self) -> int:
+        '''Cancels all the tasks, returns the number of the active tasks that were cancelled'''
+        count = 0
+        for _, _, handle in self._heap:
+            if handle.is_active():
+                handle.cancel()
+                count += 1
+
+        self._heap.clear()
+        return count
+
+    def get_next_due(self) -> float:
+        '''The due time of the next active task, or infinity if there are none'''
+        while len(self._heap) > 0 and not self._heap[0][2].is_active():
+            heapq.heappop(self._heap)
+
+        return self._heap[0][0] if len(self._heap) > 0 else float('inf')
+
+    # Internal
+
+    def _push(self, handle: TaskHandle) -> None:
+        self._count += 1
+        heapq.heappush(self._heap, (handle.due, self._count, handle))
@@ -1,95 +1,113 @@
 import sys
-from typing import Callable
+from typing import Callable, Any
 
 # from src.exp.task_screen import TaskResponse
 from src.carla.lane import Lane
+from src.exp.logging import EventLogger
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('numpy is not installed')
 
 MAX_SCORE_TARGET: float = 100
 MAX_SCORE_TASK: float = 100
 
 PENALTY = 10
 
+TARGET_VISIBILITY_DISTANCE = 100    # probably, target will be visible no more that from this far
+TARGET_MISS_DISTANCE = 20           # the target is missed if the driver passes by it closer than this
+TASK_CLOSE_DISTANCE = 10
+TASK_MID_DISTANCE = 20
+
+class ScoringRules:
+    '''
+    The scoring rules. They accept both single values (the live Scoring) and NumPy arrays
+    of the values from many sessions (offline re-scoring, see src/exp/rescoring.py),
+    so the scores are computed in exactly the same way in both cases
+    '''
+    @staticmethod
+    def get_target_score(distance: Any, misses: Any) -> Any:
+        # the score for a target is halved each time the driver misses it
+        score = np.floor(MAX_SCORE_TARGET / np.power(2.0, misses))
+
+        # a notice of a target too far away to be seen is a fake one
+        return np.where(distance < TARGET_VISIBILITY_DISTANCE, score, -PENALTY)
+
+    @staticmethod
+    def get_task_correct_answer(distance: Any, is_same_lane: Any) -> Any:
+        return np.where(is_same_lane,
+            np.where(distance < TASK_CLOSE_DISTANCE, 1, 0),
+            np.where(distance < TASK_CLOSE_DISTANCE, 3, np.where(distance < TASK_MID_DISTANCE, 2, 0)))
+
+    @staticmethod
+    def get_task_score(distance: Any, is_same_lane: Any) -> Any:
+        score = MAX_SCORE_TASK * np.where(is_same_lane, 0.8, 1.0)
+        return score * np.where(distance < TASK_CLOSE_DISTANCE, 0.8 * 0.8, np.where(distance < TASK_MID_DISTANCE, 0.8, 1.0))
+
+    @staticmethod
+    def get_response_score(task_score: Any, response: Any, correct_answer: Any) -> Any:
+        diff = np.abs(response - correct_answer)
+        return np.where(diff == 0, np.floor(task_score),
+            np.where(diff == 1, np.floor(task_score / 2),
+            np.where(diff == 2, 0,                  # no points earned, as the response is not correct
+            -PENALTY)))                             # apply a penalty, as the response is completely wrong
+
 class Scoring:
+    '''
+    Computes the score during a session. The inputs of the rules are logged
+    with their exact values, so that the sessions can be re-scored offline
+    '''
     def __init__(self, cb: Callable[[int], None]) -> None:
         self._cb = cb
-        
+        self._logger = EventLogger('scoring')
+
         self._score = 0
-        self._score_for_target = MAX_SCORE_TARGET
-        self._score_for_task = MAX_SCORE_TASK
-        
+        self._target_misses = 0
+
+        self._task_score = MAX_SCORE_TASK
         self._task_correct_answer = 0
-        
+
         self._target_distance = sys.float_info.max
         self._is_approaching = False
-        
+
     def reset(self) -> None:
         self._score = 0
+        self._logger.log('reset')
         self._cb(self._score)
-        
+
     def set_target(self) -> None:
-        self._score_for_target = MAX_SCORE_TARGET
+        self._target_misses = 0
         self._target_distance = sys.float_info.max
         self._is_approaching = False
+        self._logger.log('target', 'set')
 
     def set_target_distance(self, dist: float) -> None:
         if dist == 0:
             return
-        
+
         is_approaching = dist < self._target_distance
-        
-        if dist < 20 and not is_approaching and self._is_approaching:
-            # missed the target
-            self._score_for_target = self._score_for_target / 2
+
+        if dist < TARGET_MISS_DISTANCE and not is_approaching and self._is_approaching:
+            self._target_misses += 1
+            self._logger.log('target', 'missed')
             print(F'Missed the target')
-            
+
         self._target_distance = dist
         self._is_approaching = is_approaching
 
     def target_noticed(self) -> None:
-        if self._target_distance < 100:
-            # probably, target will be visible no more that from this far
-            self._score += int(self._score_for_target)
-        else:
-            # this is a fake notice: the target was too far to notice
-            self._score -= PENALTY
-            
+        self._score += int(ScoringRules.get_target_score(self._target_distance, self._target_misses))
+        self._logger.log('target', 'noticed', repr(self._target_distance), self._score)
         self._cb(self._score)
-    
+
     def set_task(self, distance: float, lane: str, ego_car_speed: float) -> None:
-        self._score_for_task = MAX_SCORE_TASK
-        
-        if lane == Lane.SAME:
-            self._score_for_task *= 0.8
-            if distance < 10:
-                self._task_correct_answer = 1
-            else:
-                self._task_correct_answer = 0
-        else:
-            if distance < 10:
-                self._task_correct_answer = 3
-            elif distance < 20:
-                self._task_correct_answer = 2
-            else:
-                self._task_correct_answer = 0
-            
-        if distance < 10:
-            self._score_for_task *= 0.8 * 0.8
-        elif distance < 20:
-            self._score_for_task *= 0.8
-        
+        is_same_lane = lane == Lane.SAME
+        self._task_correct_answer = int(ScoringRules.get_task_correct_answer(distance, is_same_lane))
+        self._task_score = float(ScoringRules.get_task_score(distance, is_same_lane))
+        self._logger.log('task', 'set', repr(distance), lane)
+
     def set_task_result(self, response: int) -> None:
-        diff = abs(response - self._task_correct_answer)
-
-        if diff == 0:
-            self._score += int(self._score_for_task)
-        elif diff == 1:
-            self._score += int(self._score_for_task / 2)
-        elif diff == 2:
-            # no points earned, as the response is not correct
-            pass
-        elif diff >= 3:
-            # apply a penalty, as the response is completely wrong
-            self._score -= PENALTY
-            
+        self._score += int(ScoringRules.get_response_score(self._task_score, response, self._task_correct_answer))
+        self._logger.log('task', 'response', response, self._score)
         self._cb(self._score)
-        
\ No newline at end of file
@@ -0,0 +1,58 @@
+import time
+
+from datetime import datetime
+from typing import Tuple
+
+class SessionClock:
+    '''
+    The time base of all logs and snapshots of a session.
+    The wall clock is read once, when the module is imported (the anchor), and all the later times
+    are the anchor plus the perf_counter_ns offset, so they are precise and never go backwards.
+    The frame id and the simulation time of the last CARLA tick are attached to each stamp:
+
+        offset_ns, frame, sim_time = SessionClock.stamp()
+        timestamp = SessionClock.to_timestamp(offset_ns)
+    '''
+    _anchor_ns = time.time_ns()
+    _anchor_perf_ns = time.perf_counter_ns()
+    _anchor_text = datetime.utcnow().timestamp()        # the wall-clock anchor in the form the text logs always had
+
+    _frame: Tuple[int, float] = (0, 0.0)                # frame id and simulation time, replaced as a whole
+
+    @staticmethod
+    def set_frame(frame: int, sim_time: float) -> None:
+        SessionClock._frame = (frame, sim_time)
+
+    @staticmethod
+    def get_frame() -> Tuple[int, float]:
+        return SessionClock._frame
+
+    @staticmethod
+    def now_ns() -> int:
+        '''Nanoseconds since the anchor'''
+        return time.perf_counter_ns() - SessionClock._anchor_perf_ns
+
+    @staticmethod
+    def now() -> float:
+        '''Seconds since the anchor'''
+        return SessionClock.now_ns() / 1e9
+
+    @staticmethod
+    def stamp() -> Tuple[int, int, float]:
+        frame, sim_time = SessionClock._frame
+        return (SessionClock.now_ns(), frame, sim_time)
+
+    @staticmethod
+    def to_time(offset_ns: int) -> float:
+        '''Seconds since the epoch'''
+        return (SessionClock._anchor_ns + offset_ns) / 1e9
+
+    @staticmethod
+    def to_timestamp(offset_ns: int) -> float:
+        '''The text log timestamp, compatible with datetime.utcnow().timestamp() of the earlier logs'''
+        return SessionClock._anchor_text + offset_ns / 1e9
+
+    @staticmethod
+    def to_datetime(offset_ns: int) -> datetime:
+        '''UTC date and time'''
+        return datetime.utcfromtimestamp(SessionClock.to_time(offset_ns))
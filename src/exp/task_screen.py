@@ -1,9 +1,10 @@
 import json
 
-from typing import Callable, Optional, Union, List, Any
+from typing import Callable, Optional, Union, List, Any, TYPE_CHECKING
 from types import SimpleNamespace
 
-from src.net.ws_server import WsServer
+if TYPE_CHECKING:
+    from src.net.ws_server import WsServer
 
 class TaskScreenRequest:
     def __init__(self, json: Any) -> None:
@@ -17,15 +18,26 @@ class TaskScreenRequests:
     target = 'target'
 
 class TaskScreen:
-    def __init__(self, cb: Optional[Callable[[TaskScreenRequest], None]] = None) -> None:
-        self._server = WsServer(self._parse)
+    '''
+    The task screen in the browser, served by WsServer. A headless screen has no server
+    and sends nothing (the simulator drives the scenario with it)
+    '''
+    def __init__(self,
+                 cb: Optional[Callable[[TaskScreenRequest], None]] = None,
+                 is_headless: bool = False) -> None:
+        self._server: Optional['WsServer'] = None
+        if not is_headless:
+            from src.net.ws_server import WsServer      # websockets are loaded only when the screen is shown
+            self._server = WsServer(self._parse)
+
         self._cb = cb
 
     def set_callback(self, cb: Callable[[TaskScreenRequest], None]) -> None:
         self._cb = cb
         
     def close(self) -> None:
-        self._server.close()
+        if self._server:
+            self._server.close()
         
     def show_button(self, caption: str = 'Spawn next target') -> None:
         data = json.dumps({
@@ -33,28 +45,28 @@ class TaskScreen:
             'cmd': 'show',
             'param': caption
         })
-        self._server.send(data)
+        self._send(data)
         
     def hide_button(self) -> None:
         data = json.dumps({
             'target': 'button',
             'cmd': 'hide'
         })
-        self._server.send(data)
+        self._send(data)
         
     def show_questionnaire(self) -> None:
         data = json.dumps({
             'target': 'questionnaire',
             'cmd': 'show'
         })
-        self._server.send(data)
+        self._send(data)
         
     def hide_questionnaire(self) -> None:
         data = json.dumps({
             'target': 'questionnaire',
             'cmd': 'hide'
         })
-        self._server.send(data)
+        self._send(data)
         
     def show_message(self, msg: Union[str, List[str]]) -> None:
         data = json.dumps({
@@ -62,17 +74,21 @@ class TaskScreen:
             'cmd': 'show',
             'param': msg
         })
-        self._server.send(data)
+        self._send(data)
         
     def show_score(self, score: int) -> None:
         data = json.dumps({
             'target': 'score',
             'cmd': f'{score}'
         })
-        self._server.send(data)
+        self._send(data)
         
     # Internal
 
+    def _send(self, data: str) -> None:
+        if self._server:
+            self._server.send(data)
+
     def _parse(self, msg: str) -> None:
         req = TaskScreenRequest(json.loads(msg, object_hook = lambda d: SimpleNamespace(**d)))
         if self._cb:
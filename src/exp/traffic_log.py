@@ -0,0 +1,107 @@
+import json
+import os
+
+from datetime import datetime
+from typing import Any, Dict, List
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('numpy is not installed')
+
+MAGIC = b'CMTRAFFIC'
+VERSION = 2
+HEADER_SIZE = 512           # bytes, the header is padded with spaces up to this size
+
+TRAFFIC_DTYPE = np.dtype([
+    ('timestamp', np.float64),      # seconds since the epoch, see SessionClock
+    ('frame', np.int64),            # CARLA frame id
+    ('sim_time', np.float64),       # CARLA simulation time, seconds
+    ('ec_pos_x', np.float32),
+    ('ec_pos_y', np.float32),
+    ('same_far', np.uint8),
+    ('same_mid', np.uint8),
+    ('same_close', np.uint8),
+    ('next_far', np.uint8),
+    ('next_mid', np.uint8),
+    ('next_close', np.uint8),
+])
+
+class TrafficLog:
+    '''
+    Binary traffic log: a text header of HEADER_SIZE bytes followed by the records of TRAFFIC_DTYPE.
+    The header is the MAGIC, and then a JSON line with the version, the record fields and the creation time.
+    The version 1 had no frame and sim_time fields; such files are loaded by the fields listed in the header.
+    The records are read by memory-mapping the file, no text is parsed:
+
+        log = TrafficLog.load('logs/traffic_2023-01-01_12-00-00.bin')
+        xs = log['ec_pos_x']
+    '''
+    @staticmethod
+    def make_header(created: float) -> bytes:
+        info = {
+            'version': VERSION,
+            'fields': TRAFFIC_DTYPE.descr,
+            'created': created,
+        }
+        header = MAGIC + json.dumps(info).encode() + b'\n'
+        if len(header) > HEADER_SIZE:
+            raise ValueError(f'the header takes {len(header)} bytes, but only {HEADER_SIZE} are reserved')
+
+        return header[:-1] + b' ' * (HEADER_SIZE - len(header)) + b'\n'
+
+    @staticmethod
+    def read_header(filename: str) -> Dict[str, Any]:
+        with open(filename, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+
+        if not header.startswith(MAGIC) or len(header) < HEADER_SIZE:
+            raise ValueError(f'{filename} is not a traffic log')
+
+        info: Dict[str, Any] = json.loads(header[len(MAGIC):].decode())
+        if info['version'] > VERSION:
+            raise ValueError(f'{filename} has the version {info["version"]}, but only {VERSION} is supported')
+
+        return info
+
+    @staticmethod
+    def load(filename: str) -> Any:
+        '''Returns a read-only structured array mapped to the file'''
+        info = TrafficLog.read_header(filename)
+        dtype = np.dtype([tuple(x) for x in info['fields']])
+
+        # a record written partially when the app was killed is ignored
+        count = (os.path.getsize(filename) - HEADER_SIZE) // dtype.itemsize
+        if count == 0:
+            return np.zeros(0, dtype = dtype)
+
+        return np.memmap(filename, dtype = dtype, mode = 'r', offset = HEADER_SIZE, shape = (count,))
+
+    @staticmethod
+    def to_tsv(filename: str, tsv_filename: str) -> int:
+        '''Writes the log in the text layout of the former TrafficLogger, returns the number of rows'''
+        info = TrafficLog.read_header(filename)
+        records = TrafficLog.load(filename)
+
+        columns = [name for name, _ in TRAFFIC_DTYPE.descr if name not in ('timestamp', 'frame', 'sim_time')]
+
+        # the text logs had the timestamps of datetime.utcnow().timestamp()
+        timestamps = [TrafficLog._to_text_timestamp(x) for x in records['timestamp']]
+        xs = [f'{x:.3f}' for x in records['ec_pos_x']]
+        ys = [f'{x:.2f}' for x in records['ec_pos_y']]
+        flags = [records[name].astype(str) for name in columns[2:]]
+
+        lines: List[str] = [f'{TrafficLog._to_text_timestamp(info["created"])}\t' + '\t'.join(columns) + '\n']
+        for i in range(len(records)):
+            lines.append(f'{timestamps[i]}\t{xs[i]}\t{ys[i]}\t' + '\t'.join([x[i] for x in flags]) + '\n')
+
+        with open(tsv_filename, 'w') as f:
+            f.write(''.join(lines))
+
+        return len(records)
+
+    # Internal
+
+    @staticmethod
+    def _to_text_timestamp(timestamp: float) -> float:
+        return datetime.utcfromtimestamp(float(timestamp)).timestamp()
@@ -1,10 +1,10 @@
 from src.winapi import Window
 from src.settings import Settings
 from src.mirror.settings import MirrorSettings
-from src.mirror.opengl_renderer import OpenGLRenderer
 from src.exp.logging import ImageLogger
+from src.carla.blueprint_cache import BlueprintCache
 
-from typing import Optional, Tuple, List, cast
+from typing import Optional, Tuple, List, cast, TYPE_CHECKING
 
 import pygame
 import carla
@@ -16,6 +16,9 @@ try:
 except ImportError:
     raise RuntimeError('numpy is not installed')
 
+if TYPE_CHECKING:
+    from src.mirror.opengl_renderer import OpenGLRenderer
+
 class Mirror:
     MASK_TRANSPARENT_COLOR = (0, 0, 0)
     MIN_BRIGHTNESS = 0.3
@@ -53,14 +56,17 @@ class Mirror:
             self.width = self._settings.width if self._settings.width else default_size[0]
             self.height = self._settings.height if self._settings.height else default_size[1]
         
+        self.camera: Optional[carla.Sensor] = None
+        
         # to be set in the descendants
-        self.camera: Optional[carla.Sensor]
+        self._camera_fov: float
+        self._camera_transform: carla.Transform
         self._display: pygame.surface.Surface
         self._wnd: Window
         
         # continue initializing
    
-        self._display_gl: Optional[OpenGLRenderer] = None
+        self._display_gl: Optional['OpenGLRenderer'] = None
 
         self._mask: Optional[pygame.surface.Surface] = None
 
@@ -135,6 +141,11 @@ class Mirror:
             texture_data = self._display.get_view('1')
             self._display_gl.render(texture_data)
             
+    def attach_camera(self, vehicle: carla.Vehicle) -> None:
+        '''Spawns the camera if the mirror was created before the vehicle was known'''
+        if self.camera is None:
+            self.camera = self._make_camera(self.width, self.height, self._camera_fov, self._camera_transform, vehicle)
+        
     def save_snapshot(self, attrib: str) -> None:
         filename = self._image_logger.get_filename(attrib)
         if self._display_gl:
@@ -206,7 +217,9 @@ class Mirror:
 
     def _make_display(self, size: Tuple[int, int]) -> pygame.surface.Surface:
         if self.shader:
-            settings = Settings()
+            from src.mirror.opengl_renderer import OpenGLRenderer     # moderngl is loaded for the mirrors with shaders only
+            
+            settings = Settings.get()
             self._display_gl = OpenGLRenderer(
                 size,
                 self.shader,
@@ -231,6 +244,15 @@ class Mirror:
         
         return display
     
+    def _set_camera(self,
+                    fov: float,
+                    transform: carla.Transform,
+                    vehicle: Optional[carla.Vehicle]) -> None:
+        self._camera_fov = fov
+        self._camera_transform = transform
+        if vehicle is not None:
+            self.attach_camera(vehicle)
+    
     def _make_camera(self,
                     width: int,
                     height: int,
@@ -241,7 +263,7 @@ class Mirror:
         if self.world is None:
             return None
         
-        camera_bp = self.world.get_blueprint_library().find('sensor.camera.rgb')
+        camera_bp = BlueprintCache.get(self.world).camera
         if camera_bp is None:
             return None
         
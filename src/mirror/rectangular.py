@@ -102,7 +102,7 @@ class RectangularMirror(Mirror):
             carla.Location(cam_x, cam_y, cam_z),
             carla.Rotation(yaw = cam_yaw, pitch = cam_pitch)
         )
-        self.camera = self._make_camera(self.width, self.height, settings.fov, transform, vehicle) if vehicle is not None else None
+        self._set_camera(settings.fov, transform, vehicle)
         
         self._must_scale = False
         
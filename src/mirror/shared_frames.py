@@ -0,0 +1,252 @@
+import mmap
+import struct
+import sys
+import time
+
+from typing import Any, List, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('numpy is not installed')
+
+try:
+    from multiprocessing import shared_memory      # Python 3.8+
+except ImportError:
+    shared_memory = None        # type: ignore
+
+MAGIC = b'MFRM'
+VERSION = 1
+META = struct.Struct('<4sHHIII')    # magic, version, slot count, width, height, channels
+STATE_OFFSET = 32                   # uint64: is open, published frame count
+SLOTS_OFFSET = 64                   # uint64 per slot: sequence, frame id, publish time (perf_counter_ns)
+SLOT_FIELDS = 3
+SLOT_COUNT = 3                      # a reader copying the latest image is overwritten only if the writer publishes this many images meanwhile
+CHANNELS = 4                        # BGRA, as the CARLA images
+REOPEN_INTERVAL = 1.0               # seconds between the attempts to open the memory of a writer that is not running
+
+class _Memory:
+    '''Named shared memory: multiprocessing.shared_memory, or a named mapping on Windows with Python 3.7'''
+    def __init__(self, name: str, size: int, create: bool) -> None:
+        self._shm: Any = None
+        self._mmap: Optional[mmap.mmap] = None
+
+        if shared_memory is not None:
+            if create:
+                try:
+                    self._shm = shared_memory.SharedMemory(name, True, size)
+                except FileExistsError:
+                    # left by a writer that has crashed
+                    stale = shared_memory.SharedMemory(name)
+                    stale.close()
+                    stale.unlink()
+                    self._shm = shared_memory.SharedMemory(name, True, size)
+            else:
+                self._shm = shared_memory.SharedMemory(name)
+                if sys.platform != 'win32':
+                    # otherwise the resource tracker of this process removes the writer's memory when this process exits
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(self._shm._name, 'shared_memory')    # pyright: ignore
+            self.buf = self._shm.buf
+        elif sys.platform == 'win32':
+            # the mapping exists while any process has it open; opening creates a blank one if there is no writer
+            self._mmap = mmap.mmap(-1, size, tagname = name)
+            self.buf = memoryview(self._mmap)
+        else:
+            raise RuntimeError('shared memory requires Python 3.8 or Windows')
+
+    def close(self, unlink: bool = False) -> None:
+        self.buf.release()
+        if self._shm is not None:
+            self._shm.close()
+            if unlink:
+                self._shm.unlink()
+        elif self._mmap is not None:
+            self._mmap.close()
+
+def _get_layout(slot_count: int, width: int, height: int) -> List[int]:
+    '''The offset of the images, the size of an image and the total size'''
+    images_offset = SLOTS_OFFSET + (slot_count * SLOT_FIELDS * 8 + 63) // 64 * 64
+    image_size = width * height * CHANNELS
+    return [images_offset, image_size, images_offset + slot_count * image_size]
+
+class SharedImage:
+    '''A copy of a published image, drawn by Mirror.draw_image like carla.Image'''
+    def __init__(self, width: int, height: int, frame: int, timestamp_ns: int, raw_data: 'np.ndarray[Any, Any]') -> None:
+        self.width = width
+        self.height = height
+        self.frame = frame
+        self.timestamp_ns = timestamp_ns      # perf_counter_ns of the writer, the same clock on one PC
+        self.raw_data = raw_data
+
+    def get_age(self) -> float:
+        '''Seconds since the image was published'''
+        return (time.perf_counter_ns() - self.timestamp_ns) / 1e9
+
+class SharedFrameWriter:
+    '''
+    Publishes the images of a mirror camera to the mirror processes on the same PC, so that they do not
+    need cameras of their own. The images are written into a ring of slots in shared memory.
+    Each slot has a sequence number that is odd while the image is written and even when it is done,
+    so the readers can tell if an image has changed while they were copying it (a seqlock).
+    The writer never waits for the readers:
+
+        writer = SharedFrameWriter('mirror_rear', image.width, image.height)
+        writer.publish(frame, image.raw_data)
+    '''
+    def __init__(self, name: str, width: int, height: int, slot_count: int = SLOT_COUNT) -> None:
+        self.name = name
+        self.width = width
+        self.height = height
+
+        images_offset, image_size, size = _get_layout(slot_count, width, height)
+        self._memory = _Memory(name, size, True)
+
+        buf = self._memory.buf
+        META.pack_into(buf, 0, MAGIC, VERSION, slot_count, width, height, CHANNELS)
+
+        self._slot_count = slot_count
+        self._state = np.ndarray((2,), np.uint64, buf, STATE_OFFSET)
+        self._slots = np.ndarray((slot_count, SLOT_FIELDS), np.uint64, buf, SLOTS_OFFSET)
+        self._images = np.ndarray((slot_count, image_size), np.uint8, buf, images_offset)
+        self._slots[:] = 0
+        self._published = 0
+
+        self._state[0] = 1
+        self._state[1] = 0
+
+        print(f'SFW: publishing {width}x{height} images to "{name}"')
+
+    def publish(self, frame: int, data: Union[bytes, memoryview]) -> None:
+        index = self._published % self._slot_count
+        slot = self._slots[index]
+        sequence = self._published * 2 + 1
+
+        # the stores are not reordered on x86, so a reader that sees the even sequence sees the image as well
+        slot[0] = sequence
+        self._images[index] = np.frombuffer(data, np.uint8)
+        slot[1] = frame
+        slot[2] = time.perf_counter_ns()
+        slot[0] = sequence + 1
+
+        self._published += 1
+        self._state[1] = self._published
+
+    def close(self) -> None:
+        self._state[0] = 0
+        # the memory can be closed only when no arrays refer to it
+        del self._state, self._slots, self._images
+        self._memory.close(True)
+        print(f'SFW: {self._published} images published to "{self.name}"')
+
+class SharedFrameReader:
+    '''
+    Reads the latest image published by SharedFrameWriter. `read` copies the image out of the shared memory
+    and checks that the writer has not overwritten it meanwhile; an overwritten copy is dropped, and the previous image
+    is returned again. The memory is opened when the writer is running, and reopened if the writer restarts:
+
+        reader = SharedFrameReader('mirror_rear')
+        mirror.draw_image(cast(carla.Image, reader.read()))     # every frame
+    '''
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.dropped_count = 0      # the images overwritten while they were copied
+
+        self._memory: Optional[_Memory] = None
+        self._opened_at = 0.0
+        self._image: Optional[SharedImage] = None
+        self._published = 0
+
+        self._state: 'np.ndarray[Any, Any]'
+        self._slots: 'np.ndarray[Any, Any]'
+        self._images: 'np.ndarray[Any, Any]'
+        self._buffers: List['np.ndarray[Any, Any]'] = []
+        self._slot_count = 0
+        self._width = 0
+        self._height = 0
+
+    def read(self) -> Optional[SharedImage]:
+        '''The latest image, or the previous one if there is no new image, or None if nothing has been published yet'''
+        if self._memory is None and not self._open():
+            return self._image
+
+        if self._state[0] == 0:
+            print(f'SFR: the writer of "{self.name}" has closed')
+            self._close()
+            return self._image
+
+        published = int(self._state[1])
+        if published == self._published or published == 0:
+            return self._image
+
+        index = (published - 1) % self._slot_count
+        sequence = int(self._slots[index, 0])
+        if sequence % 2 == 1:
+            return self._image      # the writer has come round to this slot again
+
+        # two buffers, so that the previous image stays intact if this copy is dropped
+        buffer = self._buffers[0] if self._image is None or self._image.raw_data is not self._buffers[0] else self._buffers[1]
+        np.copyto(buffer, self._images[index])
+        frame = int(self._slots[index, 1])
+        timestamp_ns = int(self._slots[index, 2])
+
+        if int(self._slots[index, 0]) != sequence:
+            self.dropped_count += 1
+            return self._image
+
+        self._published = published
+        self._image = SharedImage(self._width, self._height, frame, timestamp_ns, buffer)
+        return self._image
+
+    def close(self) -> None:
+        if self._memory is not None:
+            self._close()
+        if self.dropped_count > 0:
+            print(f'SFR: {self.dropped_count} images of "{self.name}" were overwritten while copied')
+
+    # Internal
+
+    def _open(self) -> bool:
+        now = time.perf_counter()
+        if now - self._opened_at < REOPEN_INTERVAL:
+            return False
+        self._opened_at = now
+
+        try:
+            memory = _Memory(self.name, SLOTS_OFFSET, False)
+        except (FileNotFoundError, OSError):
+            return False
+
+        magic, version, slot_count, width, height, channels = META.unpack_from(memory.buf, 0)
+        if magic != MAGIC or version != VERSION or channels != CHANNELS:
+            memory.close()      # a blank mapping made by opening, or the memory of another version
+            return False
+
+        images_offset, image_size, size = _get_layout(slot_count, width, height)
+        if len(memory.buf) < size:
+            memory.close()
+            memory = _Memory(self.name, size, False)
+
+        buf = memory.buf
+        self._memory = memory
+        self._state = np.ndarray((2,), np.uint64, buf, STATE_OFFSET)
+        self._slots = np.ndarray((slot_count, SLOT_FIELDS), np.uint64, buf, SLOTS_OFFSET)
+        self._images = np.ndarray((slot_count, image_size), np.uint8, buf, images_offset)
+        self._slot_count = slot_count
+        self._width = width
+        self._height = height
+        self._published = 0
+
+        if len(self._buffers) == 0 or self._buffers[0].size != image_size:
+            self._buffers = [np.zeros(image_size, np.uint8), np.zeros(image_size, np.uint8)]
+            self._image = None
+
+        print(f'SFR: reading {width}x{height} images from "{self.name}"')
+        return True
+
+    def _close(self) -> None:
+        # the memory can be closed only when no arrays refer to it
+        del self._state, self._slots, self._images
+        if self._memory is not None:
+            self._memory.close()
+            self._memory = None
@@ -64,7 +64,7 @@ class SideMirror(Mirror):
             carla.Location(x = SideMirror.camera_offset.forward, y = cam_y, z = SideMirror.camera_offset.up),
             carla.Rotation(yaw = cam_rot)
         )
-        self.camera = self._make_camera(self.width, self.height, settings.fov, transform, vehicle) if vehicle is not None else None
+        self._set_camera(settings.fov, transform, vehicle)
 
     @staticmethod
     def set_camera_offset(vehicle_type: str):
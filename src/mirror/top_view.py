@@ -39,6 +39,6 @@ class TopViewMirror(Mirror):
             carla.Location(x = 0, y = 0, z = TopViewMirror.CAMERA_Z),
             carla.Rotation(pitch = TopViewMirror.CAMERA_PITCH, yaw = TopViewMirror.CAMERA_YAW)
         )
-        self.camera = self._make_camera(self.width, self.height, settings.fov, transform, vehicle) if vehicle is not None else None
+        self._set_camera(settings.fov, transform, vehicle)
 
     # Internal
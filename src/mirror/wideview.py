@@ -47,7 +47,7 @@ class WideviewMirror(Mirror):
             carla.Location(x = WideviewMirror.CAMERA_X, z = WideviewMirror.camera_z),
             carla.Rotation(pitch = pitch, yaw = 180)
         )
-        self.camera = self._make_camera(self.width, self.height, settings.fov, transform, vehicle) if vehicle is not None else None
+        self._set_camera(settings.fov, transform, vehicle)
 
     @staticmethod
     def set_camera_offset(vehicle_type: str):
@@ -0,0 +1,41 @@
+import time
+
+from collections import deque
+from typing import Callable, Deque, Optional, Tuple
+
+SAMPLE_COUNT = 8            # the estimate is taken from this many of the last samples
+
+class ClockSync:
+    '''
+    Estimates the offset of the primary mirror clock from the local clock, NTP-style.
+    A ping carries its send time t0, the server stamps its receive time t1 and the pong send time t2,
+    and t3 is the local time the pong is received:
+
+        offset = ((t1 - t0) + (t2 - t3)) / 2       # primary time = local time + offset
+        rtt = (t3 - t0) - (t2 - t1)
+
+    The sample with the shortest round trip of the last ones has waited the least in the queues,
+    so its offset is the estimate. The callback gets each sample's offset and round trip
+    followed by the estimated ones
+    '''
+    def __init__(self,
+                 clock: Callable[[], float] = time.perf_counter,
+                 cb: Optional[Callable[[float, float, float, float], None]] = None) -> None:
+        self.clock = clock
+        self.offset = 0.0
+        self.rtt: Optional[float] = None        # None until the first sample
+
+        self._cb = cb
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen = SAMPLE_COUNT)     # round trip, offset
+
+    def add_sample(self, t0: float, t1: float, t2: float, t3: float) -> None:
+        rtt = (t3 - t0) - (t2 - t1)
+        offset = ((t1 - t0) + (t2 - t3)) / 2
+        self._samples.append((rtt, offset))
+        self.rtt, self.offset = min(self._samples)
+
+        if self._cb:
+            self._cb(offset, rtt, self.offset, self.rtt)
+
+    def to_local(self, primary_time: float) -> float:
+        return primary_time - self.offset
@@ -0,0 +1,157 @@
+import struct
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+UPDATE_HEADER = struct.Struct('!QHHBBHB')   # frame id, width, height, scale, shift, tile size, is the last part of the frame
+TILE_HEADER = struct.Struct('!II')          # tile index, compressed length
+TILE_SIZE = 64                              # pixels of the scaled image
+COMPRESSION_LEVEL = 1
+QUALITY_LEVELS = [                          # scale, bits dropped from each color channel; the best first
+    (1, 0),
+    (1, 2),
+    (1, 3),
+    (2, 2),
+    (2, 3),
+    (2, 4),
+    (4, 4),
+]
+
+class StreamImage:
+    '''A decoded image, drawn by Mirror.draw_image like carla.Image'''
+    def __init__(self, width: int, height: int, frame: int, raw_data: 'np.ndarray[Any, Any]') -> None:
+        self.width = width
+        self.height = height
+        self.frame = frame
+        self.raw_data = raw_data
+
+class ImageUpdate:
+    '''The tiles of a frame that differ from the previous frame, or all tiles if the size or quality has changed'''
+    def __init__(self, frame: int, width: int, height: int, level: int, is_key: bool, tiles: Dict[int, bytes]) -> None:
+        self.frame = frame
+        self.width = width
+        self.height = height
+        self.level = level
+        self.is_key = is_key
+        self.tiles = tiles
+
+    def get_size(self) -> int:
+        return sum(len(x) for x in self.tiles.values())
+
+    def pack(self, tiles: Dict[int, bytes], indices: Iterable[int], is_last: bool) -> bytes:
+        '''A message with the given tiles of the latest content; a frame may be split into many messages'''
+        scale, shift = QUALITY_LEVELS[self.level]
+        parts = [UPDATE_HEADER.pack(self.frame, self.width, self.height, scale, shift, TILE_SIZE, is_last)]
+        for index in indices:
+            data = tiles[index]
+            parts.append(TILE_HEADER.pack(index, len(data)))
+            parts.append(data)
+        return b''.join(parts)
+
+def _get_grid(width: int, height: int, scale: int) -> Tuple[int, int, int, int]:
+    '''The size of the scaled image, and the number of tile rows and columns'''
+    scaled_width = (width + scale - 1) // scale
+    scaled_height = (height + scale - 1) // scale
+    return scaled_width, scaled_height, (scaled_height + TILE_SIZE - 1) // TILE_SIZE, (scaled_width + TILE_SIZE - 1) // TILE_SIZE
+
+class TileEncoder:
+    '''
+    Encodes the BGRA images of a mirror camera for streaming. The image is scaled down and the low bits
+    of the colors are dropped according to the quality level, and then it is split into tiles.
+    The pool threads compare the tiles with the previous image and compress the changed ones
+    in parallel (numpy and zlib release the GIL). The rows of a tile are stored as the differences
+    of the neighbouring pixels, which compress better
+    '''
+    def __init__(self, thread_count: int) -> None:
+        self._pool = ThreadPoolExecutor(thread_count, 'encoder')
+        self._reference: Optional['np.ndarray[Any, Any]'] = None    # the image the decoders have, scaled and quantized
+        self._level = -1
+
+    def encode(self, frame: int, width: int, height: int, data: Any, level: int) -> ImageUpdate:
+        scale, shift = QUALITY_LEVELS[level]
+        image = np.frombuffer(data, np.uint8).reshape(height, width, 4)
+        scaled = np.right_shift(image[::scale, ::scale, :3], shift)       # a new contiguous array
+
+        _, _, rows, cols = _get_grid(width, height, scale)
+        reference = self._reference
+        is_key = reference is None or reference.shape != scaled.shape or level != self._level
+        if is_key:
+            reference = None
+
+        self._reference = scaled
+        self._level = level
+
+        indices = range(rows * cols)
+        compressed = self._pool.map(lambda index: self._encode_tile(scaled, reference, index // cols, index % cols), indices)
+        tiles = { index: data for index, data in zip(indices, compressed) if data is not None }
+        return ImageUpdate(frame, width, height, level, is_key, tiles)
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+    # Internal
+
+    def _encode_tile(self, scaled: 'np.ndarray[Any, Any]', reference: Optional['np.ndarray[Any, Any]'], row: int, col: int) -> Optional[bytes]:
+        '''None if the tile has not changed'''
+        rows = slice(row * TILE_SIZE, (row + 1) * TILE_SIZE)
+        cols = slice(col * TILE_SIZE, (col + 1) * TILE_SIZE)
+        tile = scaled[rows, cols]
+        if reference is not None and np.array_equal(tile, reference[rows, cols]):
+            return None
+
+        filtered = tile.copy()
+        filtered[:, 1:] -= tile[:, :-1]         # wraps around, as uint8
+        return zlib.compress(filtered.tobytes(), COMPRESSION_LEVEL)
+
+class TileDecoder:
+    '''Applies the messages made by ImageUpdate.pack and makes the image when the last part of a frame has come'''
+    def __init__(self) -> None:
+        self._scaled: Optional['np.ndarray[Any, Any]'] = None
+        self._params: Tuple[int, ...] = ()
+
+    def decode(self, payload: bytes) -> Optional[StreamImage]:
+        '''Returns the image if the frame is complete'''
+        frame, width, height, scale, shift, tile_size, is_last = UPDATE_HEADER.unpack_from(payload, 0)
+        scaled_width, scaled_height, _, cols = _get_grid(width, height, scale)
+
+        # a new size or quality level comes with all tiles
+        params = (width, height, scale, shift, tile_size)
+        if self._scaled is None or params != self._params:
+            self._scaled = np.zeros((scaled_height, scaled_width, 3), np.uint8)
+            self._params = params
+
+        view = memoryview(payload)
+        offset = UPDATE_HEADER.size
+        while offset < len(payload):
+            index, length = TILE_HEADER.unpack_from(payload, offset)
+            offset += TILE_HEADER.size
+            row, col = index // cols, index % cols
+            tile = self._scaled[row * tile_size:(row + 1) * tile_size, col * tile_size:(col + 1) * tile_size]
+            filtered = np.frombuffer(zlib.decompress(view[offset:offset + length]), np.uint8).reshape(tile.shape)
+            np.cumsum(filtered, axis = 1, dtype = np.uint8, out = tile)
+            offset += length
+
+        if not is_last:
+            return None
+
+        return StreamImage(width, height, frame, self._make_image(width, height, scale, shift))
+
+    # Internal
+
+    def _make_image(self, width: int, height: int, scale: int, shift: int) -> 'np.ndarray[Any, Any]':
+        scaled = self._scaled if self._scaled is not None else np.zeros((0, 0, 3), np.uint8)
+        if shift > 0:
+            scaled = (scaled << shift) | (1 << (shift - 1))     # the middle of the dropped range
+
+        # each scaled pixel is broadcast to a square of pixels, the odd edges are cut off
+        scaled_height, scaled_width = scaled.shape[:2]
+        image = np.empty((scaled_height, scale, scaled_width, scale, 4), np.uint8)
+        image[..., :3] = scaled[:, None, :, None, :]
+        image[..., 3] = 255
+        image = image.reshape(scaled_height * scale, scaled_width * scale, 4)
+        if image.shape[0] != height or image.shape[1] != width:
+            image = np.ascontiguousarray(image[:height, :width])
+        return image.reshape(-1)
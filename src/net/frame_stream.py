@@ -0,0 +1,323 @@
+import asyncio
+import os
+import threading
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.net.frame_codec import QUALITY_LEVELS, ImageUpdate, StreamImage, TileDecoder, TileEncoder
+from src.net.framing import Frame, FrameProtocol, MessageType
+from src.net.io_runtime import IoRuntime
+
+PORT = 15556
+DEFAULT_BUDGET = 20.0               # Mbit/s
+INITIAL_QUALITY_LEVEL = 3
+QUALITY_INTERVAL = 1.0              # seconds between the quality adjustments
+RAISE_QUALITY_RATIO = 0.5           # the quality is raised if the stream uses less than this part of the budget
+RATE_MEMORY = 10.0                  # seconds; a better quality that exceeded the budget is not tried again within this time
+MAX_CLIENT_PENDING = 256 * 1024     # bytes not sent to a client yet; a client this far behind gets the latest tiles when it catches up
+MAX_MESSAGE_SIZE = 256 * 1024       # the images are split into messages of about this size, well below MAX_PENDING_BYTES
+RETRY_DELAY = 0.01                  # seconds before the tiles are sent again to a client that was behind
+RECONNECT_INTERVAL = 1.0
+CONNECT_TIMEOUT = 2.0
+
+class _Client:
+    def __init__(self, connection: FrameProtocol) -> None:
+        self.connection = connection
+        self.dirty: Set[int] = set()        # the tiles that have changed since they were sent to the client
+        self.skipped_count = 0             # the images the client has not got, as it was behind
+        self.is_retry_scheduled = False     # the client is behind
+
+class FrameStreamServer:
+    '''
+    Streams the images of a mirror camera to the remote viewers (see FrameStreamClient).
+    `publish` is called in the frame loop and returns at once: the images are encoded by TileEncoder
+    in a background thread, and if the encoding falls behind, only the latest image waits for it.
+    The server keeps the latest content of every tile, and each client has a set of the tiles changed since
+    they were sent to it. A client that does not keep up is skipped, and when it catches up it gets only
+    the latest content of the tiles it has missed. The quality level is lowered when the stream exceeds
+    the bandwidth budget or the clients fall behind, and raised when it uses a small part of the budget:
+
+        with FrameStreamServer() as server:
+            server.publish(frame, image.width, image.height, image.raw_data)     # every frame
+    '''
+    def __init__(self, port: int = PORT, budget: float = DEFAULT_BUDGET) -> None:
+        self.dropped_count = 0      # the images replaced by the next ones before they were encoded
+
+        self._port = port
+        self._budget = budget
+        self._level = INITIAL_QUALITY_LEVEL
+
+        self._runtime = IoRuntime.get()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Dict[FrameProtocol, _Client] = {}
+        self._seq = 0
+
+        # the latest image, as the clients should have it (I/O thread)
+        self._update: Optional[ImageUpdate] = None
+        self._tiles: Dict[int, bytes] = {}
+        self._congested_count = 0           # the images sent when all clients were behind
+
+        # encoding (the encoding thread)
+        self._encoder = TileEncoder(max(1, (os.cpu_count() or 2) - 1))
+        self._encoding_thread = ThreadPoolExecutor(1, 'stream')
+        self._lock = threading.Lock()
+        self._pending: Optional[Tuple[int, int, int, Any]] = None
+        self._is_encoding = False
+
+        self._encoded_count = 0
+        self._encoding_time = 0.0
+        self._encoded_bytes = 0
+        self._window_start = time.perf_counter()
+        self._window_bytes = 0
+        self._window_congested_count = 0
+        self._level_rates: Dict[int, Tuple[float, float]] = {}     # the last rate measured at each level and when
+
+    def __enter__(self) -> 'FrameStreamServer':
+        '''Raises OSError (socket.error) if the port is taken'''
+        self._server = self._runtime.run(self._start())
+        print(f'FSS: streaming on port {self._port}, {self._budget:.0f} Mbit/s at most')
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._encoding_thread.shutdown()
+        self._encoder.close()
+
+        if self._server:
+            self._runtime.run(self._close())
+            self._server = None
+
+        mean_time = self._encoding_time / self._encoded_count if self._encoded_count > 0 else 0.0
+        print(f'FSS: {self._encoded_count} images encoded in {mean_time * 1000:.1f} ms on average, {self.dropped_count} dropped, {self._encoded_bytes / 1e6:.1f} MB')
+
+    def publish(self, frame: int, width: int, height: int, data: Any) -> None:
+        '''The data are BGRA pixels, they must not change until the next image is published'''
+        if len(self._clients) == 0:
+            return      # the tiles stay as the clients will get them when they connect
+
+        with self._lock:
+            if self._pending is not None:
+                self.dropped_count += 1
+            self._pending = (frame, width, height, data)
+            if self._is_encoding:
+                return
+            self._is_encoding = True
+
+        self._encoding_thread.submit(self._encode_pending)
+
+    # Internal
+
+    async def _start(self) -> asyncio.AbstractServer:
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(lambda: FrameProtocol(self._on_connect, self._on_frame, self._on_disconnect), '0.0.0.0', self._port)
+
+    async def _close(self) -> None:
+        server = self._server
+        if server:
+            server.close()
+            for connection in list(self._clients):
+                connection.close()
+            await server.wait_closed()
+
+    def _encode_pending(self) -> None:
+        while True:
+            with self._lock:
+                if self._pending is None:
+                    self._is_encoding = False
+                    return
+                frame, width, height, data = self._pending
+                self._pending = None
+
+            started = time.perf_counter()
+            try:
+                update = self._encoder.encode(frame, width, height, data, self._level)
+            except Exception as err:
+                print(f'FSS: cannot encode the image: {err}')
+                continue
+
+            self._encoding_time += time.perf_counter() - started
+            self._encoded_count += 1
+
+            size = update.get_size()
+            self._encoded_bytes += size
+            if not update.is_key:
+                self._window_bytes += size      # a key image after a quality change would lower the quality further
+
+            self._adjust_quality()
+            self._runtime.post(self._send_update, update)
+
+    def _adjust_quality(self) -> None:
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed < QUALITY_INTERVAL:
+            return
+
+        rate = self._window_bytes * 8 / elapsed / 1e6
+        # a single viewer that does not keep up does not lower the quality for the others
+        congested_count = self._congested_count
+        is_behind = congested_count != self._window_congested_count
+
+        level = self._level
+        if (rate > self._budget or is_behind) and level < len(QUALITY_LEVELS) - 1:
+            level += 1
+        elif rate < self._budget * RAISE_QUALITY_RATIO and self._window_bytes > 0 and not is_behind and level > 0:
+            # one level up may take more than twice the bandwidth, so the levels do not alternate
+            better_rate, measured_at = self._level_rates.get(level - 1, (0.0, 0.0))
+            if better_rate <= self._budget or now - measured_at > RATE_MEMORY:
+                level -= 1
+
+        if self._window_bytes > 0:
+            self._level_rates[self._level] = (rate, now)
+
+        if level != self._level:
+            self._level = level
+            scale, shift = QUALITY_LEVELS[level]
+            print(f'FSS: quality level {level} (scale 1/{scale}, {8 - shift} bits), {rate:.1f} Mbit/s{", clients are behind" if is_behind else ""}')
+
+        self._window_start = now
+        self._window_bytes = 0
+        self._window_congested_count = congested_count
+
+    def _send_update(self, update: ImageUpdate) -> None:
+        if update.is_key:
+            self._tiles = dict(update.tiles)
+            for client in self._clients.values():
+                client.dirty = set(self._tiles)
+        else:
+            self._tiles.update(update.tiles)
+            for client in self._clients.values():
+                client.dirty.update(update.tiles)
+
+        self._update = update
+
+        behind_count = 0
+        for client in list(self._clients.values()):
+            if client.is_retry_scheduled:
+                client.skipped_count += 1
+                behind_count += 1
+            else:
+                self._flush(client)
+
+        if behind_count > 0 and behind_count == len(self._clients):
+            self._congested_count += 1
+
+    def _flush(self, client: _Client) -> None:
+        client.is_retry_scheduled = False
+        update = self._update
+        if update is None or len(client.dirty) == 0 or client.connection not in self._clients:
+            return
+
+        parts: List[List[int]] = [[]]
+        size = 0
+        for index in sorted(client.dirty):
+            if size > MAX_MESSAGE_SIZE:
+                parts.append([])
+                size = 0
+            parts[-1].append(index)
+            size += len(self._tiles[index])
+
+        for i, indices in enumerate(parts):
+            if client.connection.get_pending_size() > MAX_CLIENT_PENDING:
+                # the client gets the rest together with the tiles changed meanwhile
+                client.is_retry_scheduled = True
+                asyncio.get_event_loop().call_later(RETRY_DELAY, self._flush, client)
+                return
+
+            message = update.pack(self._tiles, indices, i == len(parts) - 1)
+            self._seq += 1
+            if not client.connection.send(Frame.pack(MessageType.IMAGE, self._seq, message)):
+                return
+            client.dirty.difference_update(indices)
+
+    def _on_connect(self, connection: FrameProtocol) -> None:
+        print(f'FSS: viewer {connection.peer} connected')
+        client = _Client(connection)
+        client.dirty = set(self._tiles)
+        self._clients[connection] = client
+        self._flush(client)
+
+    def _on_disconnect(self, connection: FrameProtocol) -> None:
+        client = self._clients.pop(connection, None)
+        if client:
+            print(f'FSS: viewer {connection.peer} disconnected, skipped {client.skipped_count} times')
+
+    def _on_frame(self, connection: FrameProtocol, type: MessageType, seq: int, payload: bytes) -> None:
+        pass        # the viewers do not send anything
+
+class FrameStreamClient:
+    '''
+    Receives the images of a mirror streamed by FrameStreamServer. The images are decoded in the I/O thread,
+    and `read` returns the latest one. The connection is made and remade in the background:
+
+        client = FrameStreamClient('192.168.1.10')
+        mirror.draw_image(cast(carla.Image, client.read()))     # every frame
+    '''
+    def __init__(self, host: str, port: int = PORT) -> None:
+        self.received_count = 0
+
+        self._host = host
+        self._port = port
+        self._runtime = IoRuntime.get()
+        self._connection: Optional[FrameProtocol] = None
+        self._connecting: Optional['Future[None]'] = None
+        self._connected_at = -RECONNECT_INTERVAL
+
+        self._decoder = TileDecoder()
+        self._image: Optional[StreamImage] = None       # replaced as a whole in the I/O thread
+        self._decoding_time = 0.0
+
+    def read(self) -> Optional[StreamImage]:
+        '''The latest image, or None if nothing has been received yet'''
+        if self._connection is None and (self._connecting is None or self._connecting.done()):
+            now = time.perf_counter()
+            if now - self._connected_at >= RECONNECT_INTERVAL:
+                self._connected_at = now
+                self._connecting = self._runtime.submit(self._connect())
+
+        return self._image
+
+    def close(self) -> None:
+        if self._connection:
+            self._runtime.run(self._close())
+
+        mean_time = self._decoding_time / self.received_count if self.received_count > 0 else 0.0
+        print(f'FSC: {self.received_count} images received, decoded in {mean_time * 1000:.1f} ms on average')
+
+    # Internal
+
+    async def _connect(self) -> None:
+        loop = asyncio.get_running_loop()
+        connect = loop.create_connection(lambda: FrameProtocol(self._on_connect, self._on_frame, self._on_disconnect), self._host, self._port)
+        try:
+            await asyncio.wait_for(connect, CONNECT_TIMEOUT)
+        except (OSError, asyncio.TimeoutError):
+            pass        # tried again later
+
+    async def _close(self) -> None:
+        if self._connection:
+            self._connection.close()
+
+    def _on_connect(self, connection: FrameProtocol) -> None:
+        print(f'FSC: connected to {self._host}:{self._port}')
+        self._connection = connection
+
+    def _on_disconnect(self, connection: FrameProtocol) -> None:
+        print(f'FSC: disconnected')
+        self._connection = None
+
+    def _on_frame(self, connection: FrameProtocol, type: MessageType, seq: int, payload: bytes) -> None:
+        if type != MessageType.IMAGE:
+            return
+
+        started = time.perf_counter()
+        try:
+            image = self._decoder.decode(payload)
+        except Exception as err:
+            print(f'FSC: cannot decode the image: {err}')
+            return
+
+        if image:
+            self._decoding_time += time.perf_counter() - started
+            self.received_count += 1
+            self._image = image
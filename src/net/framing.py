@@ -0,0 +1,181 @@
+import asyncio
+import socket
+import struct
+
+from enum import IntEnum
+from typing import Callable, List, Tuple, Optional, Any, cast
+
+HEADER = struct.Struct('!IHI')      # payload length, message type, sequence number
+INITIAL_BUFFER_SIZE = 64 * 1024
+MAX_PAYLOAD_SIZE = 16 * 1024 * 1024
+MAX_PENDING_BYTES = 1024 * 1024     # per connection: the frames to a peer that does not read them are dropped beyond this
+CLOCK_SAMPLE = struct.Struct('!ddd')   # PING: send time, offset and round trip estimated by the client; PONG: ping send time, receive time, pong send time
+
+class MessageType(IntEnum):
+    COMMAND = 1         # a command or a notification, no answer expected
+    REQUEST = 2         # a request, the answer has the same sequence number
+    ANSWER = 3
+    PING = 4            # a clock sample request (see ClockSync), answered in the I/O thread
+    PONG = 5
+    IMAGE = 6           # a part of a streamed mirror image (see FrameStreamServer)
+
+class FramingError(socket.error):
+    pass
+
+class Frame:
+    '''
+    A message on the mirror command channel: a header with the payload length, the message type
+    and the sequence number, followed by the payload. Frames can be concatenated and sent at once
+    '''
+    @staticmethod
+    def pack(type: MessageType, seq: int, payload: bytes) -> bytes:
+        return HEADER.pack(len(payload), type, seq & 0xFFFFFFFF) + payload
+
+class FrameParser:
+    '''
+    Splits the received bytes into frames. The socket reads directly into a reusable buffer,
+    and the payloads are memoryviews of the buffer, so they are valid only until the next receive:
+
+        parser = FrameParser()
+        while parser.receive(sock) > 0:
+            for type, seq, payload in parser.get_frames():
+                handle(type, seq, bytes(payload))
+    '''
+    def __init__(self) -> None:
+        self._buffer = bytearray(INITIAL_BUFFER_SIZE)
+        self._start = 0     # the first byte not parsed yet
+        self._end = 0       # the end of the received bytes
+
+    def receive(self, sock: socket.socket) -> int:
+        '''Returns the number of bytes received, 0 if the connection is closed. The socket exceptions are not caught'''
+        size = sock.recv_into(self.get_buffer())
+        self.buffer_updated(size)
+        return size
+
+    def get_buffer(self) -> memoryview:
+        '''The free part of the buffer to receive the bytes into'''
+        self._make_room()
+        return memoryview(self._buffer)[self._end:]
+
+    def buffer_updated(self, size: int) -> None:
+        self._end += size
+
+    def feed(self, data: bytes) -> None:
+        '''Adds the bytes received in another way'''
+        self._make_room(len(data))
+        self._buffer[self._end:self._end + len(data)] = data
+        self._end += len(data)
+
+    def get_frames(self) -> List[Tuple[MessageType, int, memoryview]]:
+        '''Returns the complete frames, the incomplete one stays in the buffer'''
+        frames: List[Tuple[MessageType, int, memoryview]] = []
+        view = memoryview(self._buffer)
+
+        while self._end - self._start >= HEADER.size:
+            length, type, seq = HEADER.unpack_from(self._buffer, self._start)
+            if length > MAX_PAYLOAD_SIZE:
+                raise FramingError(f'The message is too long: {length} bytes')
+
+            payload_start = self._start + HEADER.size
+            if self._end - payload_start < length:
+                break
+
+            try:
+                frames.append((MessageType(type), seq, view[payload_start:payload_start + length]))
+            except ValueError:
+                raise FramingError(f'Unknown message type: {type}')
+
+            self._start = payload_start + length
+
+        return frames
+
+    # Internal
+
+    def _make_room(self, size: int = 1) -> None:
+        # the bytearray is never resized, since the payloads given away may still refer to it
+        pending = self._end - self._start
+        if self._start > 0 and (pending == 0 or len(self._buffer) - self._end < max(size, HEADER.size)):
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+            self._start = 0
+            self._end = pending
+
+        required = self._get_required_size()
+        if len(self._buffer) - self._end < size or len(self._buffer) < required:
+            buffer = bytearray(max(len(self._buffer) * 2, required, self._end + size))
+            buffer[:pending] = self._buffer[self._start:self._end]
+            self._buffer = buffer
+            self._start = 0
+            self._end = pending
+
+    def _get_required_size(self) -> int:
+        # the whole frame must fit into the buffer
+        if self._end - self._start < HEADER.size:
+            return 0
+
+        length, _, _ = HEADER.unpack_from(self._buffer, self._start)
+        return HEADER.size + min(length, MAX_PAYLOAD_SIZE)
+
+class FrameProtocol(asyncio.BufferedProtocol):
+    '''
+    An asyncio connection exchanging frames. The transport receives the bytes directly into
+    the parser buffer, and the handlers are called in the I/O thread
+    '''
+    def __init__(self,
+                 on_connect: Callable[['FrameProtocol'], None],
+                 on_frame: Callable[['FrameProtocol', MessageType, int, bytes], None],
+                 on_disconnect: Callable[['FrameProtocol'], None]) -> None:
+        self.peer: Any = None
+
+        self._on_connect = on_connect
+        self._on_frame = on_frame
+        self._on_disconnect = on_disconnect
+
+        self._parser = FrameParser()
+        self._transport: Optional[asyncio.Transport] = None
+
+    def send(self, frame: bytes) -> bool:
+        '''Must be called in the I/O thread. Returns False if the peer is gone or does not read its frames'''
+        if self._transport is None or self._transport.is_closing():
+            return False
+
+        if self._transport.get_write_buffer_size() + len(frame) > MAX_PENDING_BYTES:
+            print(f'FRP: {self.peer} does not receive, {self._transport.get_write_buffer_size()} bytes are not sent yet')
+            return False
+
+        # the transport keeps the bytes the socket does not accept and sends them when it can
+        self._transport.write(frame)
+        return True
+
+    def get_pending_size(self) -> int:
+        '''The bytes written but not sent yet'''
+        return self._transport.get_write_buffer_size() if self._transport else 0
+
+    def close(self) -> None:
+        if self._transport:
+            self._transport.close()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = cast(asyncio.Transport, transport)
+        self.peer = transport.get_extra_info('peername')
+        self._on_connect(self)
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self._parser.get_buffer()
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self._parser.buffer_updated(nbytes)
+
+        try:
+            frames = self._parser.get_frames()
+        except FramingError as err:
+            print(f'FRP: {self.peer} {err}')
+            self.close()
+            return
+
+        # the payloads are copied, as they are handled later in the frame loop
+        for type, seq, payload in frames:
+            self._on_frame(self, type, seq, bytes(payload))
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self._transport = None
+        self._on_disconnect(self)
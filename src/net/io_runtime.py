@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Deque, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+class _Latency:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def __str__(self) -> str:
+        mean = self.total / self.count if self.count > 0 else 0.0
+        return f'{self.count} messages, delay mean {mean * 1000:.2f} ms, max {self.max * 1000:.2f} ms'
+
+    def add(self, delay: float) -> None:
+        self.count += 1
+        self.total += delay
+        if delay > self.max:
+            self.max = delay
+
+class IoRuntime:
+    '''
+    The only thread doing the network I/O: an asyncio loop hosting the command server or client
+    and the task screen server. The received messages are put to the inbox, and the frame loop
+    passes them to their handlers once per frame by calling `dispatch`. The messages to send are
+    put to the outbox, and the I/O thread is woken up once for all the messages posted before it runs.
+    Both are deques, so the threads never wait for each other. The time the messages spend
+    in the inbox and outbox is measured here:
+
+        runtime = IoRuntime.get()
+        runtime.post(connection.send, frame)    # any thread
+        ...
+        runtime.dispatch()                      # every frame
+    '''
+    _instance: Optional['IoRuntime'] = None
+    _instance_lock = threading.Lock()
+
+    @staticmethod
+    def get() -> 'IoRuntime':
+        '''The runtime is started when it is used for the first time'''
+        with IoRuntime._instance_lock:
+            if IoRuntime._instance is None:
+                IoRuntime._instance = IoRuntime()
+            return IoRuntime._instance
+
+    @staticmethod
+    def shutdown() -> None:
+        with IoRuntime._instance_lock:
+            if IoRuntime._instance is not None:
+                IoRuntime._instance._stop()
+                IoRuntime._instance = None
+
+    def __init__(self) -> None:
+        self.inbox_latency = _Latency()         # received -> dispatched
+        self.outbox_latency = _Latency()        # posted -> handed to the transport
+
+        self._inbox: Deque[Tuple[float, Callable[..., None], Tuple[Any, ...]]] = deque()
+        self._outbox: Deque[Tuple[float, Callable[..., Any], Tuple[Any, ...]]] = deque()
+        self._is_outbox_scheduled = False
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target = self._run, name = 'io', daemon = True)
+        self._thread.start()
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        '''Runs a coroutine in the I/O thread and waits for its result'''
+        return self.submit(coro).result(timeout)
+
+    def submit(self, coro: Awaitable[T]) -> 'Future[T]':
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)   # type: ignore
+
+    def receive(self, handler: Callable[..., None], *args: Any) -> None:
+        '''Called in the I/O thread: the handler is called with the args in the frame loop'''
+        self._inbox.append((time.perf_counter(), handler, args))
+
+    def dispatch(self) -> int:
+        '''Called in the frame loop: handles the received messages, returns their count'''
+        count = len(self._inbox)        # the messages received while dispatching wait for the next frame
+        now = time.perf_counter()
+        for _ in range(count):
+            timestamp, handler, args = self._inbox.popleft()
+            self.inbox_latency.add(now - timestamp)
+            try:
+                handler(*args)
+            except Exception as err:
+                print(f'IOR: {handler.__name__} failed: {err}')
+
+        return count
+
+    def post(self, action: Callable[..., Any], *args: Any) -> None:
+        '''Can be called in any thread: the action is called with the args in the I/O thread'''
+        self._outbox.append((time.perf_counter(), action, args))
+        if not self._is_outbox_scheduled:
+            self._is_outbox_scheduled = True
+            try:
+                self._loop.call_soon_threadsafe(self._send)
+            except RuntimeError:
+                pass        # the loop is closed
+
+    # Internal
+
+    def _run(self) -> None:
+        print('IOR: started')
+
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+        print(f'IOR: inbox {self.inbox_latency}')
+        print(f'IOR: outbox {self.outbox_latency}')
+        print('IOR: closed')
+
+    def _stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def _send(self) -> None:
+        # reset before draining, so that a message posted meanwhile schedules another call
+        self._is_outbox_scheduled = False
+
+        now = time.perf_counter()
+        while len(self._outbox) > 0:
+            timestamp, action, args = self._outbox.popleft()
+            self.outbox_latency.add(now - timestamp)
+            try:
+                action(*args)
+            except Exception as err:
+                print(f'IOR: {action.__name__} failed: {err}')
@@ -1,51 +1,138 @@
-from typing import Optional, Callable
+import asyncio
+import socket
 
+from typing import Optional, Callable, Dict
+
+from src.net.clock_sync import ClockSync, SAMPLE_COUNT
+from src.net.framing import CLOCK_SAMPLE, Frame, FrameProtocol, MessageType
+from src.net.io_runtime import IoRuntime
 from src.net.tcp_server import PORT
-from src.net.simple_socket_client import SimpleSocketClient
+
+CONNECT_TIMEOUT = 20.0
+REQUEST_TIMEOUT = 1.0
+PING_INTERVAL = 1.0
+INITIAL_PING_INTERVAL = 0.1     # until the first SAMPLE_COUNT samples are taken
 
 class TcpClient:
-    def __init__(self, host: str) -> None:
+    '''
+    Receives the commands of the primary mirror. The connection runs in IoRuntime, and the commands
+    are passed to the callback in the frame loop (see IoRuntime.dispatch). The answers to `request`
+    are matched to the requests by their sequence numbers. With ClockSync, the server clock
+    is pinged while connected, and the samples are added to it in the frame loop
+    '''
+    def __init__(self, host: str, clock_sync: Optional[ClockSync] = None) -> None:
         self._host = host
         self._cb: Optional[Callable[[str], None]] = None
+        self._clock_sync = clock_sync
+        self._pinger: Optional['asyncio.Future[None]'] = None
+
+        self._runtime = IoRuntime.get()
+        self._connection: Optional[FrameProtocol] = None
+        self._requests: Dict[int, 'asyncio.Future[bytes]'] = {}
+        self._seq = 0
 
-        socket_client = SimpleSocketClient(host, PORT)
-
-        @socket_client.on('message')
-        def on_message(message: bytes): # pyright: ignore[ reportUnusedFunction ]
-            request = message.decode().rstrip('\r\n')
-            print(f'TCC: message from server: {request}')
-            if self._cb:
-                self._cb(request)
-        
-        self._client = socket_client
-        
     def connect(self, cb: Callable[[str], None]) -> None:
+        '''Raises OSError or asyncio.TimeoutError if the server is not reached'''
         self._cb = cb
-        self._client.connect(timeout = 20.0)
+        self._runtime.run(self._connect())
         print(f'TCC: connected to {self._host}:{PORT}')
 
     def close(self) -> None:
-        self._client.disconnect()
-        print('TCC: disconnected')
+        if self._connection:
+            self._runtime.run(self._close())
+            print('TCC: disconnected')
 
     def send(self, data: str) -> None:
-        self._client.send(data.encode()) # if you don't need an answer
+        if self._connection:
+            self._runtime.post(self._connection.send, Frame.pack(MessageType.COMMAND, self._next_seq(), data.encode()))
 
     def request(self, req: str) -> Optional[str]:
+        '''Waits for the answer; returns None if it does not come in time'''
         print(f'TCC: sent {req}')
-        answer = self._client.ask(req.encode())
-        if answer is None:
+        try:
+            answer = self._runtime.run(self._request(self._next_seq(), req.encode()))
+        except (asyncio.TimeoutError, ConnectionError):
             return None
-        
-        answer = answer.decode().rstrip('\r\n')
-        print(f'TCC: got {answer}')
-        return answer
+
+        result = answer.decode()
+        print(f'TCC: got {result}')
+        return result
 
     @staticmethod
     def can_connect(host: str) -> bool:
         try:
-            return SimpleSocketClient.test_connection(host, PORT)
-        except:
+            with socket.create_connection((host, PORT), timeout = 2.0):
+                return True
+        except OSError:
             return False
-        
-        return True
\ No newline at end of file
+
+    # Internal
+
+    def _next_seq(self) -> int:
+        self._seq += 1
+        return self._seq
+
+    async def _connect(self) -> None:
+        loop = asyncio.get_running_loop()
+        connect = loop.create_connection(lambda: FrameProtocol(self._on_connect, self._on_frame, self._on_disconnect), self._host, PORT)
+        await asyncio.wait_for(connect, CONNECT_TIMEOUT)
+
+    async def _close(self) -> None:
+        if self._connection:
+            self._connection.close()
+
+    async def _request(self, seq: int, req: bytes) -> bytes:
+        if self._connection is None:
+            raise ConnectionError('not connected')
+
+        future: 'asyncio.Future[bytes]' = asyncio.get_running_loop().create_future()
+        self._requests[seq] = future
+        try:
+            self._connection.send(Frame.pack(MessageType.REQUEST, seq, req))
+            return await asyncio.wait_for(future, REQUEST_TIMEOUT)
+        finally:
+            self._requests.pop(seq, None)
+
+    async def _ping(self, connection: FrameProtocol, clock_sync: ClockSync) -> None:
+        count = 0
+        while True:
+            # the client's estimate goes along, so that the server knows the round trip as well
+            rtt = clock_sync.rtt if clock_sync.rtt is not None else -1.0
+            connection.send(Frame.pack(MessageType.PING, count, CLOCK_SAMPLE.pack(clock_sync.clock(), clock_sync.offset, rtt)))
+            count += 1
+            await asyncio.sleep(PING_INTERVAL if count >= SAMPLE_COUNT else INITIAL_PING_INTERVAL)
+
+    def _on_connect(self, connection: FrameProtocol) -> None:
+        self._connection = connection
+        if self._clock_sync:
+            self._pinger = asyncio.ensure_future(self._ping(connection, self._clock_sync))
+
+    def _on_disconnect(self, connection: FrameProtocol) -> None:
+        self._connection = None
+        if self._pinger:
+            self._pinger.cancel()
+            self._pinger = None
+
+        # the requests waiting for the answers fail at once
+        for future in self._requests.values():
+            if not future.done():
+                future.set_exception(ConnectionError('disconnected'))
+
+    def _on_frame(self, connection: FrameProtocol, type: MessageType, seq: int, payload: bytes) -> None:
+        if type == MessageType.ANSWER:
+            future = self._requests.get(seq)
+            if future and not future.done():
+                future.set_result(payload)
+        elif type == MessageType.PONG:
+            if self._clock_sync:
+                received = self._clock_sync.clock()
+                sent, server_received, server_sent = CLOCK_SAMPLE.unpack(payload)
+                self._runtime.receive(self._clock_sync.add_sample, sent, server_received, server_sent, received)
+        else:
+            self._runtime.receive(self._handle_message, payload)
+
+    def _handle_message(self, payload: bytes) -> None:
+        message = payload.decode()
+        print(f'TCC: message from server: {message}')
+        if self._cb:
+            self._cb(message)
@@ -1,64 +1,104 @@
-import threading
+import asyncio
+import time
 
-from typing import Optional, Callable, Set, Any
-from socket import socket
+from typing import Optional, Callable, Dict, Set
 
-from src.net.simple_socket_server import SimpleSocketServer
+from src.net.framing import CLOCK_SAMPLE, Frame, FrameProtocol, MessageType
+from src.net.io_runtime import IoRuntime
 
 PORT = 15554
 
 class TcpServer:
-    def __init__(self) -> None:
-        self._clients: Set[socket] = set()
-        self._cb: Optional[Callable[[str], None]]
-        
-        socket_server = SimpleSocketServer(port = PORT)
-
-        @socket_server.on('connect')
-        def on_connect(sock: socket, peer: Any): # pyright: ignore[ reportUnusedFunction ]
-            print(f'TCS: connection from {peer}')
-            self._clients.add(sock)
-            # socket_server.send(sock, bytes('What is your name?\r\n', 'utf-8'))
-
-        @socket_server.on('disconnect')
-        def on_disconnect(sock: socket, peer: Any): # pyright: ignore[ reportUnusedFunction ]
-            print(f'TCS: {peer} disconnected')
-            self._clients.remove(sock)
-
-        @socket_server.on('message')
-        def on_message(sock: socket, peer: Any, message: bytes): # pyright: ignore[ reportUnusedFunction ]
-            request = message.decode().rstrip('\r\n')
-            print(f'TCS: request from {peer}: {request}')
-            if self._cb:
-                self._cb(request)
-            
-        self._server = socket_server
-        self._thread: Optional[threading.Thread] = None
-        
-    def start(self, cb: Optional[Callable[[str], None]] = None) -> None:
+    '''
+    Sends the commands of the primary mirror to the secondary mirrors. The server runs in IoRuntime,
+    and the requests are passed to the callback in the frame loop (see IoRuntime.dispatch).
+    The clock pings of the clients are answered at once in the I/O thread with the times of the given clock,
+    and the round trips the clients report are kept to choose how far ahead the commands are scheduled
+    '''
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self._clock = clock
+        self._clients: Set[FrameProtocol] = set()
+        self._client_rtts: Dict[FrameProtocol, float] = {}
+        self._cb: Optional[Callable[[str], Optional[str]]] = None
+
+        self._runtime = IoRuntime.get()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._seq = 0
+
+    def start(self, cb: Optional[Callable[[str], Optional[str]]] = None) -> None:
+        '''Raises OSError (socket.error) if the port is taken'''
         self._cb = cb
-        self._server.initialize()
-        
-        if self._thread is None:
-            self._thread = threading.Thread(target = self._start)
-            self._thread.start()
-        
+
+        if self._server is None:
+            self._server = self._runtime.run(self._start())
+            print('TCS: started')
+
     def send(self, data: str) -> None:
-        if self._thread:
-            for client in self._clients:
-                self._server.send(client, data.encode())
-        
+        # the frames posted during a frame are written together when the I/O thread wakes up
+        if self._server:
+            frame = Frame.pack(MessageType.COMMAND, self._seq, data.encode())
+            self._seq += 1
+            self._runtime.post(self._send, frame)
+
+    def get_client_count(self) -> int:
+        return len(self._clients)
+
+    def get_max_rtt(self) -> float:
+        '''The longest round trip estimated by the clients, in seconds'''
+        return max(list(self._client_rtts.values()), default = 0.0)
+
     def close(self) -> None:
-        if self._thread:
-            self._server.server_socket.close()
-            self._thread.join()
-            self._thread = None
-            
+        if self._server:
+            self._runtime.run(self._close())
+            self._server = None
+            print('TCS: closed')
+
     # Internal
-            
-    def _start(self) -> None:
-        print('TCS: started')
 
-        self._server.run()
+    async def _start(self) -> asyncio.AbstractServer:
+        loop = asyncio.get_running_loop()
+        return await loop.create_server(lambda: FrameProtocol(self._on_connect, self._on_frame, self._on_disconnect), '0.0.0.0', PORT)
+
+    async def _close(self) -> None:
+        server = self._server
+        if server:
+            server.close()
+            for client in list(self._clients):
+                client.close()
+            await server.wait_closed()
+
+    def _send(self, frame: bytes) -> None:
+        for client in self._clients:
+            client.send(frame)
+
+    def _on_connect(self, client: FrameProtocol) -> None:
+        print(f'TCS: connection from {client.peer}')
+        self._clients.add(client)
+
+    def _on_disconnect(self, client: FrameProtocol) -> None:
+        print(f'TCS: {client.peer} disconnected')
+        self._clients.discard(client)
+        self._client_rtts.pop(client, None)
+
+    def _on_frame(self, client: FrameProtocol, type: MessageType, seq: int, payload: bytes) -> None:
+        if type == MessageType.PING:
+            self._answer_ping(client, seq, payload)
+        else:
+            self._runtime.receive(self._handle_request, client, type, seq, payload)
+
+    def _answer_ping(self, client: FrameProtocol, seq: int, payload: bytes) -> None:
+        received = self._clock()
+        sent, _, rtt = CLOCK_SAMPLE.unpack(payload)
+        if rtt >= 0.0:
+            self._client_rtts[client] = rtt
+
+        client.send(Frame.pack(MessageType.PONG, seq, CLOCK_SAMPLE.pack(sent, received, self._clock())))
 
-        print('TCS: closed')
+    def _handle_request(self, client: FrameProtocol, type: MessageType, seq: int, payload: bytes) -> None:
+        request = payload.decode()
+        print(f'TCS: request from {client.peer}: {request}')
+        if self._cb:
+            # the answer to a request sent by TcpClient.request has the sequence number of the request
+            answer = self._cb(request)
+            if type == MessageType.REQUEST and answer is not None:
+                self._runtime.post(client.send, Frame.pack(MessageType.ANSWER, seq, answer.encode()))
@@ -0,0 +1,198 @@
+import socket
+import struct
+import time
+
+from typing import Any, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    raise RuntimeError('numpy is not installed')
+
+from src.carla.lane import Lane
+from src.exp.session_clock import SessionClock
+
+MAGIC = b'MTEL'
+VERSION = 1
+DEFAULT_ADDRESS = '239.255.0.77:15557'      # a multicast group of the local network
+PORT = 15557
+MULTICAST_TTL = 1                           # the records do not leave the local network
+RECEIVE_BUFFER_SIZE = 1024 * 1024           # bytes; a reader reading once a second does not lose records
+LANES = [Lane.SAME, Lane.LEFT, Lane.RIGHT]  # the lane codes are the indices, -1 is no vehicle
+
+FLAG_FROZEN = 1             # the mirrors are frozen; the ego car fields repeat the last frame shown
+FLAG_HAS_EGO_CAR = 2        # the ego car fields are set
+
+# one record per datagram, little-endian, no padding: 80 bytes
+TELEMETRY_DTYPE = np.dtype([
+    ('magic', 'S4'),                # MAGIC
+    ('version', '<u2'),             # VERSION
+    ('size', '<u2'),                # bytes of the record; new fields are appended without a new VERSION, so a reader takes the first bytes it knows
+    ('seq', '<u4'),                 # counts the records, a gap is a lost record
+    ('flags', 'u1'),                # FLAG_FROZEN, FLAG_HAS_EGO_CAR
+    ('behind_lane', 'i1'),          # the lane of the nearest vehicle approaching from behind, as an index of LANES, or -1
+    ('reserved', '<u2'),
+    ('timestamp', '<f8'),           # seconds since the epoch, see SessionClock
+    ('perf_ns', '<u8'),             # time.perf_counter_ns of the mirror (QueryPerformanceCounter on Windows), the same for all processes of the PC
+    ('frame', '<i8'),               # CARLA frame id
+    ('sim_time', '<f8'),            # CARLA simulation time, seconds
+    ('speed', '<f4'),               # km/h
+    ('x', '<f4'),                   # CARLA world location, meters
+    ('y', '<f4'),
+    ('z', '<f4'),
+    ('pitch', '<f4'),               # degrees
+    ('yaw', '<f4'),
+    ('roll', '<f4'),
+    ('behind_distance', '<f4'),     # meters to the nearest vehicle approaching from behind, NaN if there is none
+])
+
+def parse_address(address: str) -> Tuple[str, int]:
+    '''HOST[:PORT]'''
+    host, _, port = address.partition(':')
+    return host, int(port) if port else PORT
+
+def is_multicast(host: str) -> bool:
+    try:
+        return 224 <= int(host.split('.')[0]) <= 239
+    except ValueError:
+        return False
+
+class TelemetryPublisher:
+    '''
+    Sends the state of the ego car and the traffic as one fixed-layout binary record (TELEMETRY_DTYPE)
+    per frame over UDP, to a multicast group or to a single host, such as 127.0.0.1 for other processes
+    on the PC (eye trackers, physiological recorders). The record is reused, and it is sent by a nonblocking
+    socket right in the frame loop: a record that cannot be sent is dropped rather than waited for.
+    The state is set after each CARLA tick, and the record is published every frame, also while frozen:
+
+        telemetry = TelemetryPublisher('239.255.0.77:15557')
+        telemetry.set_ego_car(frame, sim_time, speed, ego_car_snapshot.get_transform())
+        telemetry.set_vehicle_behind(distance, lane)
+        telemetry.publish(is_frozen)
+    '''
+    def __init__(self, address: str = DEFAULT_ADDRESS) -> None:
+        self.dropped_count = 0      # the records the socket did not take
+
+        self._address = parse_address(address)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        if is_multicast(self._address[0]):
+            self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
+
+        self._record = np.zeros((), TELEMETRY_DTYPE)
+        self._record['magic'] = MAGIC
+        self._record['version'] = VERSION
+        self._record['size'] = TELEMETRY_DTYPE.itemsize
+        self._record['behind_lane'] = -1
+        self._record['behind_distance'] = np.nan
+        self._flags = 0
+        self._seq = 0
+
+        print(f'TLM: publishing to {self._address[0]}:{self._address[1]}')
+
+    def set_ego_car(self, frame: int, sim_time: float, speed: float, transform: Any) -> None:
+        '''The transform is carla.Transform; the speed is km/h'''
+        record = self._record
+        location = transform.location
+        rotation = transform.rotation
+        record['frame'] = frame
+        record['sim_time'] = sim_time
+        record['speed'] = speed
+        record['x'] = location.x
+        record['y'] = location.y
+        record['z'] = location.z
+        record['pitch'] = rotation.pitch
+        record['yaw'] = rotation.yaw
+        record['roll'] = rotation.roll
+        self._flags |= FLAG_HAS_EGO_CAR
+
+    def set_vehicle_behind(self, distance: Optional[float], lane: Optional[str]) -> None:
+        '''None if there is no vehicle approaching from behind'''
+        self._record['behind_distance'] = distance if distance is not None else np.nan
+        self._record['behind_lane'] = LANES.index(lane) if lane in LANES else -1
+
+    def publish(self, is_frozen: bool) -> None:
+        record = self._record
+        offset_ns = SessionClock.now_ns()
+        record['seq'] = self._seq
+        record['flags'] = self._flags | (FLAG_FROZEN if is_frozen else 0)
+        record['timestamp'] = SessionClock.to_time(offset_ns)
+        record['perf_ns'] = time.perf_counter_ns()
+        self._seq += 1
+
+        try:
+            self._socket.sendto(record.tobytes(), self._address)
+        except OSError:
+            self.dropped_count += 1
+
+    def close(self) -> None:
+        self._socket.close()
+        print(f'TLM: {self._seq} records published, {self.dropped_count} dropped')
+
+class TelemetryReader:
+    '''
+    Receives the records of TelemetryPublisher. `read` returns the records received since the last call
+    as a structured array of TELEMETRY_DTYPE; a reader written in another language unpacks the same 80 bytes.
+    The records of an unknown magic or another VERSION are skipped, and the fields appended to a record
+    (a larger size) are ignored. Several readers may listen to a multicast group on one PC:
+
+        reader = TelemetryReader('239.255.0.77:15557')
+        records = reader.read(1.0)
+        speeds = records['speed']
+    '''
+    def __init__(self, address: str = DEFAULT_ADDRESS) -> None:
+        self.lost_count = 0         # the gaps in the record sequence numbers
+
+        host, port = parse_address(address)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+        if is_multicast(host):
+            self._socket.bind(('', port))
+            membership = struct.pack('4s4s', socket.inet_aton(host), socket.inet_aton('0.0.0.0'))
+            self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        else:
+            self._socket.bind((host, port))
+
+        self._next_seq: Optional[int] = None
+
+    def read(self, timeout: float = 0.0) -> Any:
+        '''Waits up to the timeout for the first record, and then returns all records that have arrived'''
+        records: List[bytes] = []
+        if timeout > 0:
+            self._socket.settimeout(timeout)
+        else:
+            self._socket.setblocking(False)
+
+        while True:
+            try:
+                data = self._socket.recv(65536)
+            except (BlockingIOError, socket.timeout):
+                break
+
+            record = self._unpack(data)
+            if record is not None:
+                records.append(record)
+            self._socket.setblocking(False)
+
+        return np.frombuffer(b''.join(records), TELEMETRY_DTYPE)
+
+    def close(self) -> None:
+        self._socket.close()
+
+    # Internal
+
+    def _unpack(self, data: bytes) -> Optional[bytes]:
+        size = TELEMETRY_DTYPE.itemsize
+        if len(data) < size or data[:4] != MAGIC:
+            return None
+
+        record = np.frombuffer(data[:size], TELEMETRY_DTYPE)[0]
+        if record['version'] != VERSION:
+            return None
+
+        seq = int(record['seq'])
+        if self._next_seq is not None and seq > self._next_seq:
+            self.lost_count += seq - self._next_seq
+        self._next_seq = seq + 1        # a restarted publisher begins from 0 again
+        return data[:size]
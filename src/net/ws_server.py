@@ -1,78 +1,93 @@
 import logging
-import queue
-import asyncio, threading
+import asyncio
 
-from websockets.exceptions import ConnectionClosedOK
-from websockets.server import serve, WebSocketServerProtocol
-from typing import Callable, Set, Optional, cast
+from websockets.exceptions import ConnectionClosed
+from websockets.server import serve, WebSocketServer, WebSocketServerProtocol
+from typing import Callable, Dict, Optional, cast
+
+from src.net.io_runtime import IoRuntime
+
+PORT = 15555
+MAX_CLIENT_QUEUE_SIZE = 64      # messages waiting for a client; a client that falls this far behind is disconnected
+CLOSE_TIMEOUT = 1.0             # seconds; a client that does not read would otherwise hold the server for the default 10 s
+
+class _Client:
+    def __init__(self, ws: WebSocketServerProtocol) -> None:
+        self.ws = ws
+        self.queue: 'asyncio.Queue[str]' = asyncio.Queue(MAX_CLIENT_QUEUE_SIZE)
 
 class WsServer:
+    '''
+    Runs the WebSocket server in IoRuntime. `send` hands the message over to the I/O thread,
+    and it puts the same message to the queue of each client. Each client has its own task sending
+    the messages, so a slow browser does not hold back the others. The requests are passed
+    to the callback in the frame loop (see IoRuntime.dispatch)
+    '''
     def __init__(self, cb: Callable[..., None]):
-        self._isRunning = True
         self._cb = cb
-        
-        self._requests: queue.Queue[str] = queue.Queue()
-        self._responses: queue.Queue[str] = queue.Queue()
-        
-        self._clients: Set[WebSocketServerProtocol] = set()
-        
-        self._thread = threading.Thread(target = self._start)
-        self._thread.start()
-        
+
+        self._clients: Dict[WebSocketServerProtocol, _Client] = {}
+        self._runtime = IoRuntime.get()
+        self._server: Optional[WebSocketServer] = None
+
+        try:
+            self._server = self._runtime.run(self._start())
+            print('WSS: started')
+        except Exception:
+            logging.exception('WsServer: start')
+
     def close(self) -> None:
-        self._isRunning = False
-        self._thread.join()
-        
+        if self._server:
+            self._runtime.run(self._close())
+            self._server = None
+            print('WSS: closed')
+
     def send(self, msg: str) -> None:
-        self._responses.put(msg)
+        if self._server:
+            self._runtime.post(self._broadcast, msg)
 
     # Internal
 
-    def _start(self) -> None:
-        print('WSS: started')
+    async def _start(self) -> WebSocketServer:
+        return await serve(self._client_connected, "0.0.0.0", PORT, close_timeout = CLOSE_TIMEOUT)
 
-        try:
-            asyncio.run(self._run_server())
-        except Exception:
-            logging.exception('start: asyncio.run')
+    async def _close(self) -> None:
+        server = cast(WebSocketServer, self._server)
+
+        # the clients are closed all at once rather than one after another
+        await asyncio.gather(*[ws.close() for ws in list(self._clients)], return_exceptions = True)
+
+        server.close()
+        await server.wait_closed()
+
+    def _broadcast(self, msg: str) -> None:
+        for client in list(self._clients.values()):
+            try:
+                client.queue.put_nowait(msg)
+            except asyncio.QueueFull:
+                print(f'WSS: client does not receive messages, disconnecting it')
+                self._clients.pop(client.ws, None)
+                asyncio.ensure_future(client.ws.close(1013, 'too many messages are not sent'))
+
+    async def _send_messages(self, client: _Client) -> None:
+        while True:
+            msg = await client.queue.get()
+            await client.ws.send(msg)
 
-        print('WSS: closed')
-        
     async def _client_connected(self, ws: WebSocketServerProtocol) -> None:
         print('WSS: client connected')
-        
-        self._clients.add(ws)
-        
-        while self._isRunning and not ws.closed:
-            message: Optional[str] = None
-            try:
-                message = cast(str, await ws.recv())
-            except ConnectionClosedOK:
-                pass
-            except:
-                logging.exception('_client_connected: await ws.recv()')
-        
-            if message:
-                self._requests.put(message)
-                
-        self._clients.discard(ws)
-        
+
+        client = _Client(ws)
+        self._clients[ws] = client
+        sender = asyncio.ensure_future(self._send_messages(client))
+
+        try:
+            async for message in ws:
+                self._runtime.receive(self._cb, cast(str, message))
+        except ConnectionClosed:
+            pass
+        finally:
+            self._clients.pop(ws, None)
+            sender.cancel()
+
         print('WSS: client diconnected')
-            
-    async def _run_server(self) -> None:
-        async with serve(self._client_connected, "0.0.0.0", 15555):
-            while self._isRunning:
-
-                while self._responses.qsize() > 0:
-                    msg = self._responses.get()
-                    for client in self._clients:
-                        await client.send(msg)
-
-                while self._requests.qsize() > 0:
-                    try:
-                        msg = self._requests.get()
-                        self._cb(msg)
-                    except:
-                        pass
-                    
-                await asyncio.sleep(0.1)
@@ -1,8 +1,9 @@
+import time
 import carla
 
 from typing import Optional, Tuple, cast
 
-from src.user_action import ActionType, Action, CarSpawningLocation
+from src.user_action import ActionType, Action, CarSpawningLocation, DriverTask
 # from src.winapi import Window
 
 from src.mirror.base import Mirror
@@ -10,10 +11,11 @@ from src.mirror.base import Mirror
 from src.carla.environment import CarlaEnvironment
 from src.carla.vehicle_factory import VehicleFactory
 from src.carla.controller import CarlaController
+from src.carla.actor_pool import ActorPool
+from src.carla.background_traffic import BackgroundTraffic
 
 from src.exp.logging import EventLogger
 
-TRAFFIC_COUNT = 0
 BLOCK_MIRROR_ON_CAR_APPROACHING_FROM_BEHIND = False
 BLOCK_MIRROR_WHEN_CAR_BEHIND_IS_AT_DISTANCE = 10
 
@@ -22,7 +24,8 @@ class Runner:
                  environment: CarlaEnvironment,
                  vehicle_factory: VehicleFactory,
                  ego_car: carla.Vehicle,
-                 mirror: Mirror) -> None:
+                 mirror: Mirror,
+                 traffic_count: int = 0) -> None:
         self.environment = environment
         self.vehicle_factory = vehicle_factory
         self.ego_car = ego_car
@@ -30,7 +33,12 @@ class Runner:
 
         self.world = self.vehicle_factory.world
         self.spectator = self.world.get_spectator()
-        self.controller = CarlaController(self.world)
+        
+        # vehicles approaching from behind and targets are reused rather than spawned in every trial
+        self.actor_pool = ActorPool(self.vehicle_factory)
+        self.actor_pool.fill(DriverTask.TARGETS.keys())
+        
+        self.controller = CarlaController(self.world, self.actor_pool)
         
         self.search_target: Optional[carla.Actor] = None
         
@@ -45,16 +53,19 @@ class Runner:
 
         self._logger = EventLogger('spawner')
         
+        self.traffic = BackgroundTraffic(self.world, self.vehicle_factory, traffic_count, self.actor_pool) if traffic_count > 0 else None
+        
     def make_step(self,
                   world_snapshot: carla.WorldSnapshot,
                   action: Optional[Action]) -> Tuple[carla.ActorSnapshot, Optional[carla.Actor]]:
         spawned: Optional[carla.Actor] = None
 
-        # create traffic at random moments/locations
-        # self.environment.add_traffic(self.vehicle_factory, TRAFFIC_COUNT)
-
         ego_car_snapshot = world_snapshot.find(self.ego_car.id)
 
+        # keep the background traffic around the ego car
+        if self.traffic:
+            self.traffic.tick(world_snapshot, ego_car_snapshot)
+
         # spectator is sitting in the car, and we have to move it manually as there is no way to bind it to the ego-car
         if self._spectator_is_driver:
             CarlaEnvironment.relocate_spectator(self.spectator, ego_car_snapshot)
@@ -118,6 +129,7 @@ class Runner:
                         world_snapshot: carla.WorldSnapshot,
                         ego_car_snapshot: carla.ActorSnapshot) -> Optional[carla.Actor]:
         spawned: Optional[carla.Actor] = None
+        start = time.perf_counter()
         
         if action.type == ActionType.SPAWN_TARGET:
             if isinstance(action.param, str):
@@ -184,5 +196,6 @@ class Runner:
             evt = str(action.type).split('.')[1].split('_')[1].lower()
             name = '_'.join(spawned.type_id.split('.')[1:])
             self._logger.log(evt, name)
+            print(f'RUN: {name} spawned in {1000 * (time.perf_counter() - start):.1f} ms')
                 
         return spawned
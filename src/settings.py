@@ -13,6 +13,8 @@ class MirrorType(Enum):
     TOPVIEW = 'topview'     # view from the top (not a mirror)
 
 class Settings:
+    _instance: Optional['Settings'] = None
+    
     def __init__(self) -> None:
         args = make_args()
         
@@ -36,6 +38,16 @@ class Settings:
         self.town: Optional[str] = args.map
         self.host: str = args.host
         self.primary_mirror_host: str = args.pm_host
+        self.traffic_count: int = args.traffic
+        self.hybrid_physics_radius: Optional[float] = args.hybrid_physics
+        self.tm_seed: Optional[int] = args.tm_seed
+        self.startup_profile = args.startup_profile == True
+        self.frames_to: Optional[str] = args.share
+        self.frames_from: Optional[str] = args.view
+        self.stream_port: Optional[int] = args.stream
+        self.stream_budget: float = args.stream_budget
+        self.stream_from: Optional[str] = args.view_stream
+        self.telemetry_to: Optional[str] = args.telemetry
 
         if self.size[0] == 0 or self.size[1] == 0:
             self.size = None
@@ -46,6 +58,13 @@ class Settings:
                 break
         else:
             self.type = MirrorType.LEFT
+    
+    @staticmethod
+    def get() -> 'Settings':
+        # the command line is parsed once, and then the settings are shared by all modules
+        if Settings._instance is None:
+            Settings._instance = Settings()
+        return Settings._instance
         
 def make_args():
     # _ w e _ _ y _ i _ _
@@ -158,6 +177,28 @@ def make_args():
         '--map',
         default=None,
         help='CARLA`s map ID')
+    argparser.add_argument(
+        '--traffic',
+        default=0,
+        type=int,
+        metavar='COUNT',
+        help='Number of background vehicles kept around the ego car (default: 0). \
+            Used by the primary mirror only')
+    argparser.add_argument(
+        '--hybrid-physics',
+        default=None,
+        const=50.0,
+        nargs='?',
+        type=float,
+        metavar='RADIUS',
+        help='Enables the hybrid physics of the traffic manager: vehicles further than RADIUS \
+            meters from the ego car are moved without physics (default: disabled, 50 m if no value is given)')
+    argparser.add_argument(
+        '--tm-seed',
+        default=None,
+        type=int,
+        help='Random seed of the traffic manager; the traffic is reproducible only when it is given (default: none, \
+            the traffic differs between the runs)')
     argparser.add_argument(
         '--host',
         default='localhost',
@@ -167,5 +208,51 @@ def make_args():
         default='localhost',
         help='IP of the PC running the primary mirror (default: localhost). \
             Used when launching secondary mirrors only')
+    argparser.add_argument(
+        '--startup-profile',
+        action='store_true',
+        help='Reports the import time of each module and the duration of each startup phase')
+    argparser.add_argument(
+        '--share',
+        default=None,
+        metavar='NAME',
+        help='Publishes the camera images of this mirror to the shared memory NAME, \
+            so that other mirrors on this PC can show them with --view NAME')
+    argparser.add_argument(
+        '--view',
+        default=None,
+        metavar='NAME',
+        help='Shows the images published by another mirror on this PC with --share NAME \
+            instead of connecting to CARLA. Use the same mirror type as the publishing mirror')
+    argparser.add_argument(
+        '--stream',
+        default=None,
+        const=15556,
+        nargs='?',
+        type=int,
+        metavar='PORT',
+        help='Streams the camera images of this mirror over TCP to the mirrors started with --view-stream \
+            (default: disabled, port 15556 if no value is given)')
+    argparser.add_argument(
+        '--stream-budget',
+        default=20.0,
+        type=float,
+        metavar='MBITS',
+        help='Bandwidth of the stream, Mbit/s (default: 20). The image quality is lowered to fit it')
+    argparser.add_argument(
+        '--view-stream',
+        default=None,
+        metavar='HOST[:PORT]',
+        help='Shows the images streamed by a mirror started with --stream on another PC \
+            instead of connecting to CARLA. Use the same mirror type as the streaming mirror')
+    argparser.add_argument(
+        '--telemetry',
+        default=None,
+        const='239.255.0.77:15557',
+        nargs='?',
+        metavar='HOST[:PORT]',
+        help='Publishes the ego car speed and pose, the nearest vehicle behind and the freeze state \
+            every frame over UDP to a multicast group or a local address, see telemetry.py. \
+            Used by the primary mirror only (default: disabled, 239.255.0.77:15557 if no value is given)')
     
     return argparser.parse_args()
@@ -1,8 +1,10 @@
+import builtins
 import os
 import sys
+import time
 
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, List, Tuple, Dict, Any
 
 
 @contextmanager         # allows using the function in 'with' statement
@@ -14,3 +16,71 @@ def suppress_stdout() -> Generator[None, None, None]:
             yield       # here the body of the external 'with' statement is executed
         finally:
             sys.stdout = old_stdout
+
+class StartupTimer:
+    '''
+    Measures the startup phases as the time between the consecutive marks:
+
+        timer = StartupTimer()
+        ...
+        timer.mark('world')
+        ...
+        timer.report()
+    '''
+    def __init__(self) -> None:
+        self._start = time.perf_counter()
+        self._last = self._start
+        self._phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self._phases.append((phase, now - self._last))
+        self._last = now
+
+    def report(self) -> None:
+        print('STT: startup time')
+        for phase, duration in self._phases:
+            print(f'STT:   {phase:<20} {1000 * duration:7.0f} ms')
+        print(f'STT:   {"total":<20} {1000 * (self._last - self._start):7.0f} ms')
+
+class ImportProfiler:
+    '''
+    Measures the time of the first import of each module, including the modules it imports itself.
+    It must be started before the app modules are imported:
+
+        profiler = ImportProfiler()
+        profiler.start()
+        from src.app import App
+        ...
+        profiler.stop()
+        profiler.report()
+    '''
+    REPORTED_MODULES = 25
+
+    def __init__(self) -> None:
+        self._import = builtins.__import__
+        self._durations: Dict[str, float] = dict()
+
+    def start(self) -> None:
+        builtins.__import__ = self._timed_import
+
+    def stop(self) -> None:
+        builtins.__import__ = self._import
+
+    def report(self) -> None:
+        durations = sorted(self._durations.items(), key = lambda x: x[1], reverse = True)
+        print(f'STT: import time of {len(durations)} modules, the slowest {ImportProfiler.REPORTED_MODULES}:')
+        for name, duration in durations[:ImportProfiler.REPORTED_MODULES]:
+            print(f'STT:   {name:<40} {1000 * duration:7.0f} ms')
+
+    # Internal
+
+    def _timed_import(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        if name in sys.modules:
+            return self._import(name, *args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            return self._import(name, *args, **kwargs)
+        finally:
+            self._durations.setdefault(name, time.perf_counter() - start)
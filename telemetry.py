@@ -0,0 +1,68 @@
+# =============================================================================
+# This script receives the telemetry of the primary mirror (started with
+# --telemetry) and prints the records as tab-separated text, one per frame,
+# or writes them to a file. It is also an example of a telemetry reader:
+# see TelemetryReader and TELEMETRY_DTYPE in src/net/telemetry.py for
+# the record layout
+# =============================================================================
+import argparse
+import sys
+
+from typing import Optional, TextIO
+
+from src.net.telemetry import DEFAULT_ADDRESS, FLAG_FROZEN, FLAG_HAS_EGO_CAR, LANES, TELEMETRY_DTYPE, TelemetryReader
+
+COLUMNS = [name for name in TELEMETRY_DTYPE.names if name not in ('magic', 'version', 'size', 'flags', 'reserved')]
+
+class Settings:
+    def __init__(self) -> None:
+        args = self._make_args()
+
+        self.address: str = args.address
+        self.output: Optional[str] = args.output
+
+    def _make_args(self):
+        argparser = argparse.ArgumentParser(
+            description='Prints the telemetry records of the primary mirror')
+        argparser.add_argument(
+            'address',
+            nargs='?',
+            default=DEFAULT_ADDRESS,
+            metavar='HOST[:PORT]',
+            help=f'Multicast group or local address the mirror publishes to (default: {DEFAULT_ADDRESS})')
+        argparser.add_argument(
+            '-o', '--output',
+            default=None,
+            help='Writes the records to this file instead of printing them')
+        return argparser.parse_args()
+
+def write_records(reader: TelemetryReader, output: TextIO) -> None:
+    output.write('\t'.join(COLUMNS + ['has_ego_car', 'is_frozen']) + '\n')
+
+    while True:
+        for record in reader.read(1.0):
+            values = [str(record[name]) for name in COLUMNS]
+            lane = int(record['behind_lane'])
+            values[COLUMNS.index('behind_lane')] = LANES[lane] if lane >= 0 else '-'
+            flags = int(record['flags'])
+            values += [str(int(flags & FLAG_HAS_EGO_CAR != 0)), str(int(flags & FLAG_FROZEN != 0))]
+            output.write('\t'.join(values) + '\n')
+
+def main():
+    settings = Settings()
+
+    reader = TelemetryReader(settings.address)
+    output = open(settings.output, 'w') if settings.output else sys.stdout
+    try:
+        write_records(reader, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        reader.close()
+        print(f'{reader.lost_count} records lost', file = sys.stderr)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print('Cancelled by user')
@@ -62,11 +62,14 @@ if __name__ == '__main__':
                 
             cars = [x for x in all_cars if x.id not in vehicles ]
             
-            for car in cars:
-                vehicle = cast(carla.Vehicle, car)
+            # vehicles spawned from a remote PC are registered in the local traffic manager all at once
+            factory.actor_batch.set_autopilot(cars)
+            
+            new_vehicles = [cast(carla.Vehicle, car) for car in cars]
+            factory.configure_traffic_vehicles(new_vehicles)
+            
+            for vehicle in new_vehicles:
                 vehicles[vehicle.id] = vehicle
-                factory.configure_traffic_vehicle(vehicle)
-                
                 print(f'Added {vehicle.type_id}')
                 
     except KeyboardInterrupt:
@@ -0,0 +1,56 @@
+# =============================================================================
+# This script converts the binary traffic logs written by the mirror
+# into the tab-separated text layout used before
+# =============================================================================
+import argparse
+import glob
+import os
+
+from typing import List
+
+from src.exp.logging import LOG_FOLDER
+from src.exp.traffic_log import TrafficLog
+
+class Settings:
+    def __init__(self) -> None:
+        args = self._make_args()
+        
+        self.files: List[str] = args.files
+        self.overwrite: bool = args.overwrite == True
+        
+    def _make_args(self):
+        argparser = argparse.ArgumentParser(
+            description='Converts the binary traffic logs to text')
+        argparser.add_argument(
+            'files',
+            nargs='*',
+            help=f'Binary traffic logs (default: all the logs in "{LOG_FOLDER}")')
+        argparser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Converts also the logs that have the text file already')
+        return argparser.parse_args()
+        
+def main():
+    settings = Settings()
+    
+    files = settings.files if len(settings.files) > 0 else sorted(glob.glob(f'{LOG_FOLDER}/traffic_*.bin'))
+    
+    for filename in files:
+        tsv_filename = f'{os.path.splitext(filename)[0]}.txt'
+        if os.path.exists(tsv_filename) and not settings.overwrite:
+            print(f'{tsv_filename} exists already')
+            continue
+        
+        try:
+            count = TrafficLog.to_tsv(filename, tsv_filename)
+        except Exception as ex:
+            print(f'{filename}: {ex}')
+        else:
+            print(f'{filename} => {tsv_filename}, {count} rows')
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print('Cancelled by user')
@@ -3,6 +3,8 @@ from typing import Callable, Optional, List, Set, Any, Tuple, Union, Iterator
 
 import carla_command
 
+command = carla_command
+
 class Actor:
     attributes: dict[str,Any]
     id: int
@@ -134,8 +136,8 @@ class CityObjectLabel(IntEnum):
     Any: int
 class Client:
     def __init__(self, host: str = '127.0.0.1', port: int = 2000, worker_threads: int = 0) -> None: ...
-    def apply_batch(self, commands: List[str]) -> None: ...
-    def apply_batch_sync(self, commands: List[str], due_tick_cue: bool = False) -> List[carla_command.Response]: ...
+    def apply_batch(self, commands: List[carla_command.Command]) -> None: ...
+    def apply_batch_sync(self, commands: List[carla_command.Command], due_tick_cue: bool = False) -> List[carla_command.Response]: ...
     def generate_opendrive_world(self,
                                  opendrive: str,
                                  parameters: OpendriveGenerationParameters = ..., # 2.0, 50.0, 1.0, 0.6, True, True)
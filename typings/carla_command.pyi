@@ -1,4 +1,30 @@
+from typing import Optional, Union
+
+import carla
+
 class Response:
     actor_id: int
     error: str
     def has_error(self) -> bool: ...
+class _FutureActor: ...
+FutureActor: _FutureActor
+ActorRef = Union[carla.Actor, int, _FutureActor]
+class Command:
+    def then(self, command: Command) -> Command: ...
+class SpawnActor(Command):
+    def __init__(self,
+                 blueprint: carla.ActorBlueprint,
+                 transform: carla.Transform,
+                 parent: Optional[ActorRef] = None) -> None: ...
+class DestroyActor(Command):
+    def __init__(self, actor: ActorRef) -> None: ...
+class SetAutopilot(Command):
+    def __init__(self, actor: ActorRef, enabled: bool, tm_port: int = 8000) -> None: ...
+class SetSimulatePhysics(Command):
+    def __init__(self, actor: ActorRef, enabled: bool) -> None: ...
+class ApplyTransform(Command):
+    def __init__(self, actor: ActorRef, transform: carla.Transform) -> None: ...
+class ApplyTargetVelocity(Command):
+    def __init__(self, actor: ActorRef, velocity: carla.Vector3D) -> None: ...
+class ApplyTargetAngularVelocity(Command):
+    def __init__(self, actor: ActorRef, angular_velocity: carla.Vector3D) -> None: ...